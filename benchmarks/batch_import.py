@@ -0,0 +1,140 @@
+"""Benchmark of the bulk batch import.
+
+Imports N batches (1000 by default, all stages filled in, so every row has
+four gravities, three volumes and four temperatures) with
+`brivo.brewery.importers` into a throw-away test database. It runs once
+with the measurement fields as they were before the parsers were
+precompiled, and once with the current fields. The parsing alone is
+timed separately on the same values.
+
+Run from the repository root:
+
+    DJANGO_SETTINGS_MODULE=config.settings.test python -m benchmarks.batch_import [N]
+"""
+import os
+import re
+import sys
+import time
+import timeit
+from unittest import mock
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.test")
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework import serializers as drf_serializers  # noqa: E402
+
+from benchmarks.recipe_import import make_user  # noqa: E402
+from brivo.brewery import importers  # noqa: E402
+from brivo.brewery.api import serializers  # noqa: E402
+from brivo.brewery.models import Batch, Recipe, Style  # noqa: E402
+
+
+def old_measurement_field_factory(mclass, munit):
+    """The measurement field as it was before `MeasurementParser`."""
+
+    class MeasurementField(drf_serializers.Field):
+        def to_internal_value(self, data):
+            units = mclass.UNITS.keys() | mclass.ALIAS.keys()
+            if str(mclass).split(".")[-1][:-2] == "Mass":
+                units = units | {"kg", "kilogram"}
+            pattern = re.compile(
+                r"^(?P<value>(\d+|\d+\.\d+))\s?(?P<unit>(%s))$" % "|".join(units)
+            )
+            match = pattern.match(data)
+            if match is None:
+                raise drf_serializers.ValidationError(
+                    "%s is not a valid %s" % (data, mclass.__name__)
+                )
+            kwargs = {match.group("unit").lower(): match.group("value")}
+            return mclass(**kwargs)
+
+    return MeasurementField
+
+
+def old_fields(serializer_class):
+    """Declared fields of the serializer with the old measurement fields."""
+    fields = dict(serializer_class._declared_fields)
+    for name, field in fields.items():
+        if type(field).__name__ == "MeasurementField":
+            fields[name] = old_measurement_field_factory(field.parser.mclass, None)(
+                required=False
+            )
+    return fields
+
+
+def make_rows(number):
+    row = {
+        "recipe": "benchmark",
+        "stage": "FINISHED",
+        "brewing_day": "2020-05-06",
+        "primary_fermentation_start_day": "2020-05-06",
+        "packaging_date": "2020-05-27",
+        "grain_temperature": "20.0 c",
+        "sparging_temperature": "78.0 c",
+        "gravity_before_boil": "10.5 plato",
+        "initial_gravity": "1.048 sg",
+        "wort_volume": "25 l",
+        "boil_loss": "2.5 l",
+        "primary_fermentation_temperature": "12 c",
+        "secondary_fermentation_temperature": "14 c",
+        "post_primary_gravity": "3.2 plato",
+        "end_gravity": "2.5 plato",
+        "beer_volume": "20 l",
+        "priming_temperature": "20 c",
+        "carbonation_type": "FORCED",
+        "carbonation_level": 2.4,
+    }
+    return [dict(row, name=f"Batch {i}") for i in range(number)]
+
+
+def measure(name, rows, username):
+    user = make_user(username)
+    Recipe.objects.create(name="benchmark", user=user, style=Style.objects.get())
+    start = time.perf_counter()
+    importers.import_batches(rows, user)
+    elapsed = time.perf_counter() - start
+    assert Batch.objects.filter(user=user).count() == len(rows)
+    print(f"{name:<14}{len(rows):>8}{elapsed:>12.2f}{len(rows) / elapsed:>12.1f}")
+    return elapsed
+
+
+def parse_values(fields, rows):
+    for row in rows:
+        for name, field in fields.items():
+            if name in row and type(field).__name__ == "MeasurementField":
+                field.to_internal_value(row[name])
+
+
+def main(number=1000):
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        Style.objects.create(name="Czech Pale Lager", category_id="3A", category="Czech Lager")
+        rows = make_rows(number)
+        before_fields = old_fields(serializers.BatchSerializer)
+        after_fields = serializers.BatchSerializer._declared_fields
+
+        print(f"{'parse':<14}{'batches':>8}{'time [s]':>12}{'batches/s':>12}")
+        times = {}
+        for name, fields in [("before", before_fields), ("after", after_fields)]:
+            elapsed = min(timeit.repeat(lambda: parse_values(fields, rows), number=1, repeat=3))
+            times[name] = elapsed
+            print(f"{name:<14}{len(rows):>8}{elapsed:>12.2f}{len(rows) / elapsed:>12.1f}")
+        print(f"speedup: {times['before'] / times['after']:.1f}x\n")
+
+        print(f"{'import':<14}{'batches':>8}{'time [s]':>12}{'batches/s':>12}")
+        with mock.patch.object(serializers.BatchSerializer, "_declared_fields", before_fields):
+            before = measure("before", rows, "before")
+        after = measure("after", rows, "after")
+        print(f"speedup: {before / after:.1f}x")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
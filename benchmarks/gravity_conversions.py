@@ -0,0 +1,54 @@
+"""Micro-benchmark of BeerGravity conversions.
+
+Compares the previous sympy based `sg` unit with the closed-form
+conversions used by `brivo.utils.measures.BeerGravity`.
+
+Run from the repository root:
+
+    python -m benchmarks.gravity_conversions
+"""
+import timeit
+
+from sympy import Symbol
+from measurement.base import MeasureBase
+
+from brivo.utils.measures import BeerGravity
+
+
+class SympyBeerGravity(MeasureBase):
+    """BeerGravity as it was defined before the closed-form conversions."""
+
+    SU = Symbol('Plato')
+    STANDARD_UNIT = 'plato'
+    UNITS = {
+        'plato': 1.0,
+        'sg': (SU / (258.6 - ((SU / 258.2) * 227.1))) + 1
+    }
+    ALIAS = {
+        'Plato': 'plato',
+        'Specific Gravity': 'sg',
+        'SG': 'sg'
+    }
+
+
+CASES = {
+    "BeerGravity(sg=...)": lambda cls: cls(sg=1.048),
+    "BeerGravity(plato=...).sg": lambda cls: cls(plato=12.0).sg,
+    "BeerGravity(sg=...).plato": lambda cls: cls(sg=1.048).plato,
+}
+
+
+def measure(func, cls, number):
+    return min(timeit.repeat(lambda: func(cls), number=number, repeat=5)) / number
+
+
+def main(number=2000):
+    print(f"{'conversion':<28}{'sympy [us]':>14}{'closed-form [us]':>20}{'speedup':>10}")
+    for name, func in CASES.items():
+        before = measure(func, SympyBeerGravity, number // 10)
+        after = measure(func, BeerGravity, number)
+        print(f"{name:<28}{before * 1e6:>14.2f}{after * 1e6:>20.2f}{before / after:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark of the recipe import.
+
+Imports N recipes (5000 by default, copies of the recipes used by the
+brewery tests) into a throw-away test database. It runs once row by row,
+like the import task did before, and once with `brivo.brewery.importers`.
+
+Run from the repository root:
+
+    DJANGO_SETTINGS_MODULE=config.settings.test python -m benchmarks.recipe_import [N]
+"""
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.test")
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from brivo.brewery import importers  # noqa: E402
+from brivo.brewery.api import serializers  # noqa: E402
+from brivo.brewery.models import Recipe, Style  # noqa: E402
+from brivo.users.models import User, UserBrewery, UserProfile  # noqa: E402
+from brivo.utils import functions  # noqa: E402
+
+DATA = Path(__file__).resolve().parent.parent.joinpath(
+    "brivo/brewery/tests/data/recipes_with_info.json"
+)
+
+
+def row_by_row_import(rows, username):
+    """The import as it was done before `brivo.brewery.importers`."""
+    for row in rows:
+        data = functions.clean_data(row)
+        user = User.objects.get(username=username)
+        style = Style.objects.filter(name__icontains=data["style"])
+        data["style"] = style[0].id
+        serializer = serializers.RecipeSerializer(data=data, user=user)
+        if not serializer.is_valid():
+            raise Exception(serializer.errors)
+        serializer.save()
+
+
+def make_rows(number):
+    with open(DATA) as fin:
+        recipes = json.load(fin)
+    for recipe in recipes:
+        recipe.pop("extra_info")
+        recipe["style"] = "pale lager"
+        recipe["name"] = "IPA"  # worst case for slugs
+    return [dict(recipes[i % len(recipes)]) for i in range(number)]
+
+
+def make_user(username):
+    user = User.objects.create(username=username, email=f"{username}@example.com")
+    UserProfile.objects.create(user=user)
+    UserBrewery.objects.create(user=user)
+    return user
+
+
+def measure(name, func, rows, username):
+    make_user(username)
+    start = time.perf_counter()
+    func(rows, username)
+    elapsed = time.perf_counter() - start
+    assert Recipe.objects.filter(user__username=username).count() == len(rows)
+    print(f"{name:<14}{len(rows):>8}{elapsed:>12.2f}{len(rows) / elapsed:>12.1f}")
+    return elapsed
+
+
+def main(number=5000):
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        Style.objects.create(name="Czech Pale Lager", category_id="3A", category="Czech Lager")
+        rows = make_rows(number)
+        print(f"{'import':<14}{'recipes':>8}{'time [s]':>12}{'recipes/s':>12}")
+        before = measure("row by row", row_by_row_import, rows, "before")
+        after = measure("importers", importers.import_recipes, rows, "after")
+        print(f"speedup: {before / after:.1f}x")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,61 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class KeysetPagination(CursorPagination):
+    page_size_query_param = "limit"
+    max_page_size = 1000
+    ordering = ("id",)
+
+
+class OptionalCursorPagination(LimitOffsetPagination):
+    """Limit/offset pagination with opt-in cursor (keyset) pagination.
+
+    Clients ask for it with `?pagination=cursor` and then follow the
+    `next`/`previous` links. Cursor pages run neither OFFSET nor COUNT.
+    Views set the order with `cursor_ordering`; it needs a matching
+    index and should end with a unique field.
+    """
+
+    cursor_query_param = "cursor"
+    mode_query_param = "pagination"
+
+    def __init__(self):
+        self.cursor_pagination = None
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.use_cursor(request):
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_pagination = KeysetPagination()
+        self.cursor_pagination.ordering = getattr(
+            view, "cursor_ordering", KeysetPagination.ordering
+        )
+        return self.cursor_pagination.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.mode_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Set to 'cursor' for cursor pagination.",
+                "schema": {"type": "string", "enum": ["cursor"]},
+            },
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+        ]
@@ -1,13 +1,23 @@
+import math
 import re
 from collections import OrderedDict
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import serializers
 from rest_framework.fields import empty
 
+import numpy as np
 from measurement.measures import Weight, Temperature, Volume
 
 from brivo.utils.functions import get_user_units
-from brivo.utils.measures import BeerColor, BeerGravity
+from brivo.utils.measures import (
+    BeerColor,
+    BeerGravity,
+    from_standard_function,
+    make_measure,
+    to_standard_function,
+)
 from brivo.brewery import models
 from brivo.users.api.serializers import UserNameSerializer
 
@@ -22,31 +32,109 @@ from rest_framework.fields import (  # NOQA # isort:skip
 from rest_framework.relations import Hyperlink, PKOnlyObject  # NOQA # isort:skip
 
 
+_NUMBER_REGEX = re.compile(r"^\d+(?:\.\d+)?$")
+
+
+class MeasurementParser:
+    """Parse "<number> <unit>" strings to measures of `mclass`.
+
+    Unit names, their conversions to the standard unit and the pattern
+    are built once per measurement class, see `get_measurement_parser`.
+    """
+
+    def __init__(self, mclass):
+        self.mclass = mclass
+        names = mclass.UNITS.keys() | mclass.ALIAS.keys()
+        if mclass.__name__ == "Mass":
+            names = names | {"kg", "kilogram"}
+        self.units = {}
+        converters = {}
+        for name in names:
+            # resolve aliases like MeasureBase does
+            unit = mclass(**{name.lower(): 0})._default_unit
+            if unit not in converters:
+                converters[unit] = to_standard_function(mclass, unit)
+            self.units[name] = (unit, converters[unit])
+        self.pattern = re.compile(
+            r"^(?P<value>\d+(?:\.\d+)?)\s?(?P<unit>%s)$"
+            % "|".join(re.escape(name) for name in sorted(names))
+        )
+
+    def measure(self, value, name):
+        """Return measure of `value` in the unit called `name`."""
+        try:
+            unit, to_standard = self.units[name]
+        except KeyError:
+            return self.mclass(**{name: value})
+        return make_measure(self.mclass, unit, to_standard(float(value)))
+
+    def parse(self, data):
+        """Return the measure of a "<number> <unit>" string, None if not valid."""
+        match = self.pattern.match(data)
+        if match is None:
+            return None
+        return self.measure(match.group("value"), match.group("unit"))
+
+    def standard(self, data, unit=None):
+        """Return the standard value of a "<number> <unit>" string.
+
+        Numbers without a unit are in `unit`. Returns None if not valid,
+        no measure is created.
+        """
+        number = to_number(data)
+        if number is not None:
+            if unit is None:
+                return None
+            if unit not in self.units:
+                return self.mclass(**{unit: number}).standard
+            return self.units[unit][1](float(number))
+        match = self.pattern.match(data) if isinstance(data, str) else None
+        if match is None:
+            return None
+        return self.units[match.group("unit")][1](float(match.group("value")))
+
+
+def to_number(data):
+    """Return a non-negative number given without a unit, None otherwise."""
+    if isinstance(data, str):
+        return float(data) if _NUMBER_REGEX.match(data) is not None else None
+    if isinstance(data, (int, float)) and not isinstance(data, bool):
+        if 0 <= data < math.inf:
+            return data
+    return None
+
+
+_parsers = {}
+
+
+def get_measurement_parser(mclass):
+    try:
+        return _parsers[mclass]
+    except KeyError:
+        return _parsers.setdefault(mclass, MeasurementParser(mclass))
+
+
 def measurement_field_factory(mclass, munit):
     class MeasurementField(serializers.Field):
+        parser = get_measurement_parser(mclass)
+
         def to_representation(self, obj):
             unit = get_user_units(self.root.user)[munit]
             value = getattr(obj, unit)
             return f"{value} {unit}"
 
         def to_internal_value(self, data):
-            units = mclass.UNITS.keys() | mclass.ALIAS.keys()
-            if str(mclass).split(".")[-1][:-2] == "Mass":
-                units = units | {"kg", "kilogram"}
-            pattern = re.compile(
-                r"^(?P<value>(\d+|\d+\.\d+))\s?(?P<unit>(%s))$" % "|".join(units)
-            )
-            try:
-                match = pattern.match(data)
-            except Exception as exp:
-                print(data)
-                raise exp
-            if match is None:
+            # numbers without a unit are in the units of the user
+            number = to_number(data)
+            user = getattr(self.root, "user", None)
+            if number is not None and user is not None:
+                return self.parser.measure(number, get_user_units(user)[munit])
+            measure = self.parser.parse(data) if isinstance(data, str) else None
+            if measure is None:
                 raise serializers.ValidationError(
                     "%s is not a valid %s" % (data, mclass.__name__)
                 )
-            kwargs = {match.group("unit").lower(): match.group("value")}
-            return mclass(**kwargs)
+            return measure
 
         # def get_attribute(self, obj):
         #     return obj
@@ -57,7 +145,32 @@ def measurement_field_factory(mclass, munit):
 class CustomSerializer(serializers.ModelSerializer):
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop("user", None)
+        fields = kwargs.pop("fields", None)
+        expand = kwargs.pop("expand", None)
         super().__init__(*args, **kwargs)
+        if fields is not None or expand is not None:
+            self.select_fields(fields, expand)
+
+    def select_fields(self, fields=None, expand=None):
+        """Keep only the requested fields (sparse fieldsets).
+
+        `fields` are the names of fields to show, by default all but
+        `Meta.expandable_fields` once `expand` is given. Fields named in
+        `expand` are shown as well. Sources of removed fields (e.g.
+        calculated metrics or nested ingredients) are never read.
+        """
+        expandable = getattr(self.Meta, "expandable_fields", ())
+        if fields is None:
+            fields = [name for name in self.fields if name not in expandable]
+        wanted = set(fields) | set(expand or ())
+        unknown = wanted - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError(
+                {"fields": f"Unknown fields: {', '.join(sorted(unknown))}"}
+            )
+        for name in list(self.fields):
+            if name not in wanted:
+                self.fields.pop(name)
 
     # Add user also to ListSerializer
     @classmethod
@@ -128,7 +241,8 @@ class FermentableSerializer(CustomSerializer):
         read_only_fields = ["created_at", "updated_at", "slug"]
 
     def to_representation(self, instance):
-        self.fields["country"] = CountrySerializer(read_only=True)
+        if "country" in self.fields:
+            self.fields["country"] = CountrySerializer(read_only=True)
         return super(FermentableSerializer, self).to_representation(instance)
 
 
@@ -156,7 +270,8 @@ class HopSerializer(CustomSerializer):
         read_only_fields = ["created_at", "updated_at", "slug"]
 
     def to_representation(self, instance):
-        self.fields["country"] = CountrySerializer(read_only=True)
+        if "country" in self.fields:
+            self.fields["country"] = CountrySerializer(read_only=True)
         return super(HopSerializer, self).to_representation(instance)
 
 
@@ -236,31 +351,31 @@ class RecipeSerializer(CustomSerializer):
     mash_steps = MashStepSerializer(many=True)
     expected_beer_volume = measurement_field_factory(Volume, "volume_units")()
     initial_volume = measurement_field_factory(Volume, "volume_units")(
-        source="get_initial_volume", read_only=True
+        source="get_metrics.initial_volume", read_only=True
     )
     boil_volume = measurement_field_factory(Volume, "volume_units")(
-        source="get_boil_volume", read_only=True
+        source="get_metrics.boil_volume", read_only=True
     )
     preboil_gravity = measurement_field_factory(BeerGravity, "gravity_units")(
-        source="get_preboil_gravity", read_only=True
+        source="get_metrics.preboil_gravity", read_only=True
     )
     primary_volume = measurement_field_factory(Volume, "volume_units")(
-        source="get_primary_volume", read_only=True
+        source="get_metrics.primary_volume", read_only=True
     )
     secondary_volume = measurement_field_factory(Volume, "volume_units")(
-        source="get_secondary_volume", read_only=True
+        source="get_metrics.secondary_volume", read_only=True
     )
     color = measurement_field_factory(BeerColor, "color_units")(
-        source="get_color", read_only=True
+        source="get_metrics.color", read_only=True
     )
     gravity = measurement_field_factory(BeerGravity, "gravity_units")(
-        source="get_gravity", read_only=True
+        source="get_metrics.gravity", read_only=True
     )
     bitterness_ratio = serializers.DecimalField(
-        5, 1, source="get_bitterness_ratio", read_only=True
+        5, 1, source="get_metrics.bitterness_ratio", read_only=True
     )
-    abv = serializers.DecimalField(5, 1, source="get_abv", read_only=True)
-    ibu = serializers.DecimalField(5, 1, source="get_ibu", read_only=True)
+    abv = serializers.DecimalField(5, 1, source="get_metrics.abv", read_only=True)
+    ibu = serializers.DecimalField(5, 1, source="get_metrics.ibu", read_only=True)
 
     class Meta:
         model = models.Recipe
@@ -297,8 +412,13 @@ class RecipeSerializer(CustomSerializer):
             "bitterness_ratio",
         ]
         read_only_fields = ["id" "created_at", "updated_at"]
+        expandable_fields = ["fermentables", "hops", "yeasts", "extras", "mash_steps"]
 
     def create(self, validated_data):
+        with models.defer_metrics_update():
+            return self._create(validated_data)
+
+    def _create(self, validated_data):
         fermentables_data = validated_data.pop("fermentables", [])
         hops_data = validated_data.pop("hops", [])
         yeasts_data = validated_data.pop("yeasts", [])
@@ -306,52 +426,53 @@ class RecipeSerializer(CustomSerializer):
         mash_steps_data = validated_data.pop("mash_steps", [])
         validated_data["user"] = self.user
         recipe = models.Recipe.objects.create(**validated_data)
-        for fermentable_data in fermentables_data:
-            fermentable_data["recipe"] = recipe
-            models.IngredientFermentable.objects.create(**fermentable_data)
-        for hop_data in hops_data:
-            hop_data["recipe"] = recipe
-            models.IngredientHop.objects.create(**hop_data)
-        for yeast_data in yeasts_data:
-            yeast_data["recipe"] = recipe
-            models.IngredientYeast.objects.create(**yeast_data)
-        for extra_data in extras_data:
-            extra_data["recipe"] = recipe
-            models.IngredientExtra.objects.create(**extra_data)
-        for mash_step_data in mash_steps_data:
-            mash_step_data["recipe"] = recipe
-            models.MashStep.objects.create(**mash_step_data)
+        self._create_ingredients(recipe, fermentables_data, models.IngredientFermentable)
+        self._create_ingredients(recipe, hops_data, models.IngredientHop)
+        self._create_ingredients(recipe, yeasts_data, models.IngredientYeast)
+        self._create_ingredients(recipe, extras_data, models.IngredientExtra)
+        self._create_ingredients(recipe, mash_steps_data, models.MashStep)
+        # bulk writes send no signals
+        models.schedule_metrics_update(recipe)
         return recipe
 
-    def _update_ingredient(self, instance, data, attr, iclass):
+    def _create_ingredients(self, instance, data, iclass):
+        items = []
+        for item_data in data:
+            item_data.pop("id", None)
+            items.append(iclass(recipe=instance, **item_data))
+        models.bulk_create_with_slugs(iclass, items)
 
-        item_ids = [item["id"] for item in data]  # if "id" in item]
-        # Delete items not included in the request
-        for item in getattr(instance, attr).all():
-            if item.id not in item_ids:
-                item.delete()
-        # Create or update page instances that are in the request
+    def _update_ingredient(self, instance, data, attr, iclass):
+        existing = {item.id: item for item in iclass.objects.filter(recipe=instance)}
+        new_items = []
+        changed_items = []
+        changed_fields = set()
         for item_data in data:
-            item_data.update({"recipe": instance})
-            if "id" in item_data:
-                obj_id = item_data.pop("id")
-                if obj_id is not empty:
-                    try:
-                        obj = iclass.objects.get(id=obj_id, recipe=instance)
-                        for field, value in item_data.items():
-                            setattr(obj, field, value)
-                        obj.save(update_fields=item_data.keys())
-                    except iclass.DoesNotExist:
-                        item = iclass(**item_data)
-                        item.save()
-                else:
-                    item = iclass(**item_data)
-                    item.save()
-            else:
-                item = iclass(**item_data)
-                item.save()
+            obj = existing.pop(item_data.pop("id", empty), None)
+            if obj is None:
+                new_items.append(item_data)
+                continue
+            for field, value in item_data.items():
+                setattr(obj, field, value)
+            changed_fields.update(item_data.keys())
+            changed_items.append(obj)
+        # Delete items not included in the request
+        if existing:
+            iclass.objects.filter(pk__in=existing.keys()).delete()
+        if changed_items and changed_fields:
+            now = timezone.now()
+            for obj in changed_items:
+                obj.updated_at = now
+            iclass.objects.bulk_update(
+                changed_items, list(changed_fields) + ["updated_at"]
+            )
+        self._create_ingredients(instance, new_items, iclass)
 
     def update(self, instance, validated_data):
+        with models.defer_metrics_update():
+            return self._update(instance, validated_data)
+
+    def _update(self, instance, validated_data):
         if "fermentables" in validated_data:
             fermentables_data = validated_data.pop("fermentables")
             self._update_ingredient(
@@ -381,6 +502,8 @@ class RecipeSerializer(CustomSerializer):
         for field, value in validated_data.items():
             setattr(instance, field, value)
         instance.save(update_fields=validated_data.keys())
+        # bulk writes send no signals
+        models.schedule_metrics_update(instance)
         return instance
 
 
@@ -392,6 +515,149 @@ class RecipeReadSerializer(RecipeSerializer):
         fields = RecipeSerializer.Meta.fields + ["user"]
 
 
+class RecipeExportSerializer(RecipeSerializer):
+    """Recipe with ingredients, without calculated metrics, as imported."""
+
+    initial_volume = None
+    boil_volume = None
+    preboil_gravity = None
+    primary_volume = None
+    secondary_volume = None
+    color = None
+    gravity = None
+    bitterness_ratio = None
+    abv = None
+    ibu = None
+
+    class Meta(RecipeSerializer.Meta):
+        fields = [
+            field
+            for field in RecipeSerializer.Meta.fields
+            if field not in models.Recipe.METRICS_FIELDS + [
+                "initial_volume",
+                "primary_volume",
+                "secondary_volume",
+                "gravity",
+            ]
+        ]
+
+
+class RecipeListSerializer(RecipeReadSerializer):
+    """Read serializer using the stored recipe metrics."""
+
+    initial_volume = measurement_field_factory(Volume, "volume_units")(
+        source="get_stored_metrics.initial_volume", read_only=True
+    )
+    boil_volume = measurement_field_factory(Volume, "volume_units")(
+        source="get_stored_metrics.boil_volume", read_only=True
+    )
+    preboil_gravity = measurement_field_factory(BeerGravity, "gravity_units")(
+        source="get_stored_metrics.preboil_gravity", read_only=True
+    )
+    primary_volume = measurement_field_factory(Volume, "volume_units")(
+        source="get_stored_metrics.primary_volume", read_only=True
+    )
+    secondary_volume = measurement_field_factory(Volume, "volume_units")(
+        source="get_stored_metrics.secondary_volume", read_only=True
+    )
+    color = measurement_field_factory(BeerColor, "color_units")(
+        source="get_stored_metrics.color", read_only=True
+    )
+    gravity = measurement_field_factory(BeerGravity, "gravity_units")(
+        source="get_stored_metrics.gravity", read_only=True
+    )
+    bitterness_ratio = serializers.DecimalField(
+        5, 1, source="get_stored_metrics.bitterness_ratio", read_only=True
+    )
+    abv = serializers.DecimalField(
+        5, 1, source="get_stored_metrics.abv", read_only=True
+    )
+    ibu = serializers.DecimalField(
+        5, 1, source="get_stored_metrics.ibu", read_only=True
+    )
+
+
+class RecipeCalculationSerializer(RecipeSerializer):
+    """Recipe definition, which is not saved, and its calculated metrics.
+
+    Ingredients are only read, the response shows the batch info and
+    the metrics (see `calculate`).
+    """
+
+    fermentables = IngredientFermentableSerializer(
+        many=True, write_only=True, required=False
+    )
+    hops = IngredientHopSerializer(many=True, write_only=True, required=False)
+    yeasts = IngredientYeastSerializer(many=True, write_only=True, required=False)
+    extras = None
+    mash_steps = None
+    final_gravity = measurement_field_factory(BeerGravity, "gravity_units")(
+        source="get_metrics.final_gravity", read_only=True
+    )
+
+    INGREDIENTS = {
+        "fermentables": models.IngredientFermentable,
+        "hops": models.IngredientHop,
+        "yeasts": models.IngredientYeast,
+    }
+
+    class Meta(RecipeSerializer.Meta):
+        fields = [
+            "name",
+            "expected_beer_volume",
+            "fermentables",
+            "hops",
+            "yeasts",
+            "evaporation_rate",
+            "boil_loss",
+            "trub_loss",
+            "dry_hopping_loss",
+            "mash_efficiency",
+            "initial_volume",
+            "boil_volume",
+            "preboil_gravity",
+            "primary_volume",
+            "secondary_volume",
+            "color",
+            "gravity",
+            "final_gravity",
+            "abv",
+            "ibu",
+            "bitterness_ratio",
+        ]
+        extra_kwargs = {"name": {"required": False}}
+
+    def validate_expected_beer_volume(self, value):
+        # metrics are divided by the volume
+        if value.standard <= 0:
+            raise serializers.ValidationError("Ensure this value is greater than 0.")
+        return value
+
+    @classmethod
+    def calculate(cls, validated_data):
+        """Return unsaved recipes of the validated data, with their metrics.
+
+        Metrics of all recipes are calculated in one pass with
+        `RecipeCalculator.calculate_many`, nothing is read from the
+        database.
+        """
+        recipes = []
+        calculators = []
+        for data in validated_data:
+            data = dict(data)
+            ingredients = {
+                attr: [iclass(**item) for item in data.pop(attr, [])]
+                for attr, iclass in cls.INGREDIENTS.items()
+            }
+            recipe = models.Recipe(**data)
+            recipes.append(recipe)
+            calculators.append(models.RecipeCalculator(recipe, **ingredients))
+        metrics = models.RecipeCalculator.calculate_many(calculators)
+        for recipe, recipe_metrics in zip(recipes, metrics):
+            recipe._metrics = recipe_metrics
+        return recipes
+
+
 class BatchSerializer(CustomSerializer):
     grain_temperature = measurement_field_factory(Temperature, "temperature_units")()
     sparging_temperature = measurement_field_factory(Temperature, "temperature_units")()
@@ -430,28 +696,16 @@ class BatchSerializer(CustomSerializer):
         for field in required_fields:
             if field not in data:
                 errors[field] = f"This field is required for stage <= {data['stage']}"
-        data["batch_number"] = self._get_batch_number(data.get("batch_number", 1))
         if len(errors) > 0:
             raise serializers.ValidationError(errors)
         return data
 
     def create(self, validated_data):
         validated_data["user"] = self.user
-        return super(BatchSerializer, self).create(validated_data)
-
-    def _get_batch_number(self, number=None):
-        batches = models.Batch.objects.filter(user=self.user).order_by(
-            "-batch_number"
+        validated_data["batch_number"] = models.Batch.allocate_batch_number(
+            self.user, validated_data.get("batch_number", 1)
         )
-        if number not in [b.batch_number for b in batches]:
-            return number
-        if len(batches) > 0:
-            num = batches[0].batch_number
-            return num + 1
-        else:
-            # this is the first batch ever
-            return 1
-
+        return super(BatchSerializer, self).create(validated_data)
 
     def _get_batch_required_fields(self, data):
         fields = ["recipe", "stage"]
@@ -489,6 +743,16 @@ class BatchSerializer(CustomSerializer):
         return fields
 
 
+class BatchExportSerializer(BatchSerializer):
+    """Batch without empty fields, as imported."""
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        return OrderedDict(
+            (field, value) for field, value in data.items() if value is not None
+        )
+
+
 class BatchInitSerializer(CustomSerializer):
     class Meta:
         model = models.Batch
@@ -659,6 +923,140 @@ class BatchPackagingSerializer(CustomSerializer):
         return data
 
 
+class FermentationReadingListSerializer(serializers.ListSerializer):
+    """Readings of a batch, validated in bulk.
+
+    Rows are parsed straight to standard values by the measurement
+    parsers, the fields of the child run only for rows which do not
+    parse, to report their errors. The readings are saved by
+    `timeseries.append`.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or not data:
+            return super().to_internal_value(data)
+        units = get_user_units(self.user)
+        readings = []
+        errors = []
+        for item in data:
+            reading = self.child.parse(item, units)
+            if reading is None:
+                try:
+                    reading = self.child.to_standard(self.child.run_validation(item))
+                except serializers.ValidationError as exc:
+                    errors.append(exc.detail)
+                    continue
+            readings.append(reading)
+            errors.append({})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return readings
+
+
+class FermentationReadingSerializer(serializers.Serializer):
+    """Reading of a digital hydrometer, see `BatchViewSet.readings`."""
+
+    sample_time = serializers.DateTimeField()
+    gravity = measurement_field_factory(BeerGravity, "gravity_units")()
+    beer_temperature = measurement_field_factory(Temperature, "temperature_units")(
+        required=False
+    )
+    ambient_temperature = measurement_field_factory(
+        Temperature, "temperature_units"
+    )(required=False)
+
+    MEASURES = {
+        "gravity": (BeerGravity, "gravity_units"),
+        "beer_temperature": (Temperature, "temperature_units"),
+        "ambient_temperature": (Temperature, "temperature_units"),
+    }
+
+    class Meta:
+        list_serializer_class = FermentationReadingListSerializer
+
+    def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop("user", None)
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        lserializer = super().many_init(*args, **kwargs)
+        lserializer.user = lserializer.child.user
+        return lserializer
+
+    def parse(self, data, units):
+        """Return standard values of a reading, None if it does not parse."""
+        if not isinstance(data, dict):
+            return None
+        try:
+            sample_time = parse_datetime(data.get("sample_time"))
+        except (TypeError, ValueError):
+            return None
+        if sample_time is None:
+            return None
+        reading = {
+            "sample_time": self.fields["sample_time"].enforce_timezone(sample_time)
+        }
+        for name, (mclass, munit) in self.MEASURES.items():
+            if name not in data and not self.fields[name].required:
+                continue
+            parser = get_measurement_parser(mclass)
+            value = parser.standard(data.get(name), units[munit])
+            if value is None:
+                return None
+            reading[name] = value
+        return reading
+
+    def to_standard(self, data):
+        """Return the validated data with standard values of measures."""
+        reading = dict(data)
+        for name in self.MEASURES:
+            if name in reading:
+                reading[name] = reading[name].standard
+        return reading
+
+
+class FermentationSeriesSerializer(serializers.Serializer):
+    """Time range of fermentation readings, and their columns.
+
+    Validates the query of readings or rollups, the columns returned by
+    `timeseries.get_series` are shown in the units of the user.
+    """
+
+    resolution = serializers.ChoiceField(["raw", "hour", "day"], default="raw")
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+
+    MEASURES = FermentationReadingSerializer.MEASURES
+
+    def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop("user", None)
+        super().__init__(*args, **kwargs)
+
+    def to_representation(self, columns):
+        units = get_user_units(self.user)
+        data = {
+            "units": {
+                "gravity": units["gravity_units"],
+                "temperature": units["temperature_units"],
+            },
+            "time": np.datetime_as_string(
+                columns["time"].astype("datetime64[s]"), timezone="UTC"
+            ).tolist(),
+        }
+        for name, values in columns.items():
+            if name == "time":
+                continue
+            if name.endswith("_count"):
+                data[name] = values.tolist()
+                continue
+            measure = name[:-4] if name.endswith(("_min", "_max")) else name
+            mclass, munit = self.MEASURES[measure]
+            values = np.round(from_standard_function(mclass, units[munit])(values), 3)
+            data[name] = [None if value != value else value for value in values.tolist()]
+        return data
+
+
 class BeerPrimingCalculatorRequestSerializer(serializers.Serializer):
     priming_temperature = measurement_field_factory(
         Temperature, "temperature_units"
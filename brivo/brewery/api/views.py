@@ -1,3 +1,7 @@
+from functools import partial
+
+from django.conf import settings
+from django.db.models import QuerySet
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.mixins import (
@@ -13,7 +17,7 @@ from rest_framework.viewsets import GenericViewSet, ViewSet
 from rest_framework.permissions import IsAdminUser, SAFE_METHODS, IsAuthenticated
 from drf_spectacular.utils import extend_schema
 
-from brivo.brewery import models
+from brivo.brewery import catalog, conditional, models, timeseries
 from brivo.brewery.api import serializers
 from brivo.utils import functions
 
@@ -34,7 +38,7 @@ class IsOwnerOrReadOnly(IsAuthenticated):
             return True
 
         # Write permissions are only allowed to the owner of the snippet.
-        return self.has_permission(request, view) and obj.user == request.user
+        return self.has_permission(request, view) and obj.user_id == request.user.pk
 
 
 class AddUserMixin:
@@ -45,7 +49,160 @@ class AddUserMixin:
         return serializer_class(*args, **kwargs)
 
 
+class SparseFieldsMixin:
+    """Show only the fields listed in `?fields=` (and `?expand=`).
+
+    The lists are passed to the serializer (see
+    `CustomSerializer.select_fields`), the queryset joins and prefetches
+    only the relations of the shown fields.
+    """
+
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    def get_requested_fields(self):
+        """Return (fields, expand) requested, None for missing parameters."""
+        if self.request.method not in SAFE_METHODS:
+            return None, None
+        return tuple(
+            [name.strip() for name in value.split(",") if name.strip()]
+            if value is not None
+            else None
+            for value in (
+                self.request.query_params.get("fields"),
+                self.request.query_params.get("expand"),
+            )
+        )
+
+    def get_shown_fields(self):
+        """Names of the fields in the response, None if not known."""
+        if self.request.method not in SAFE_METHODS:
+            return None
+        return set(self.get_serializer().fields)
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.get_requested_fields()
+        kwargs.setdefault("fields", fields)
+        kwargs.setdefault("expand", expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # the catalog lists are served from tuples
+        if self.action in ("list", "retrieve") and isinstance(queryset, QuerySet):
+            queryset = self.optimize_queryset(queryset)
+        return queryset
+
+    def optimize_queryset(self, queryset):
+        shown = self.get_shown_fields()
+        if shown is None:
+            return queryset
+        select = [name for name in self.select_related_fields if name in shown]
+        prefetch = [name for name in self.prefetch_related_fields if name in shown]
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+class ConditionalRetrieveMixin:
+    """Answer retrieve of an unchanged object with 304 Not Modified.
+
+    The validators are read with one query, before the object is
+    fetched and serialized (see `brivo.brewery.conditional`).
+    """
+
+    def get_etag_parts(self):
+        """Other data than the object shown in the response."""
+        return ()
+
+    def get_validators(self):
+        """Return (etag, last modified) of the object, None if not found."""
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            updated_at = (
+                self.get_queryset()
+                .filter(pk=pk)
+                .values_list("updated_at", flat=True)
+                .first()
+            )
+        except ValueError:
+            return None
+        if updated_at is None:
+            return None
+        etag = conditional.make_etag(
+            self.request,
+            self.get_queryset().model._meta.label_lower,
+            self.request.get_full_path(),
+            updated_at,
+            *self.get_etag_parts(),
+        )
+        return etag, updated_at
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        if validators is None:
+            return super().retrieve(request, *args, **kwargs)
+        return conditional.conditional_response(
+            request, partial(super().retrieve, request, *args, **kwargs), *validators
+        )
+
+
+class CatalogMixin:
+    """Read reference data from the per-process catalog snapshot.
+
+    Lists and single objects are served without queries while the
+    snapshot is current. Cursor pages need a queryset and writes need
+    fresh objects, those use the database. Reads are validated with the
+    catalog version (ETag), unchanged data is answered with 304.
+    """
+
+    def list(self, request, *args, **kwargs):
+        etag = conditional.catalog_etag(
+            request, self.queryset.model, request.get_full_path()
+        )
+        if etag is None:
+            return super().list(request, *args, **kwargs)
+        return conditional.conditional_response(
+            request, partial(super().list, request, *args, **kwargs), etag
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        obj = self.get_object()
+        etag = conditional.catalog_etag(request, self.queryset.model, obj.pk)
+        if etag is None:
+            return super().retrieve(request, *args, **kwargs)
+        return conditional.conditional_response(
+            request,
+            partial(super().retrieve, request, *args, **kwargs),
+            etag,
+            obj.updated_at,
+        )
+
+    def get_queryset(self):
+        use_cursor = getattr(self.paginator, "use_cursor", None)
+        if self.action == "list" and not (use_cursor and use_cursor(self.request)):
+            return catalog.get_objects(self.queryset.model)
+        return super().get_queryset()
+
+    def get_object(self):
+        if self.action == "retrieve":
+            snapshot = catalog.get_snapshot(self.queryset.model)
+            try:
+                pk = int(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+            except ValueError:
+                pk = None
+            if snapshot is not None and pk in snapshot.by_pk:
+                obj = snapshot.by_pk[pk]
+                self.check_object_permissions(self.request, obj)
+                return obj
+        return super().get_object()
+
+
 class FermentableViewSet(
+    CatalogMixin,
+    SparseFieldsMixin,
     AddUserMixin,
     RetrieveModelMixin,
     ListModelMixin,
@@ -58,9 +215,12 @@ class FermentableViewSet(
     queryset = models.Fermentable.objects.all()
     lookup_field = "id"
     permission_classes = (IsAdminUserOrReadOnly,)
+    select_related_fields = ("country",)
 
 
 class ExtraViewSet(
+    CatalogMixin,
+    SparseFieldsMixin,
     AddUserMixin,
     RetrieveModelMixin,
     ListModelMixin,
@@ -76,6 +236,8 @@ class ExtraViewSet(
 
 
 class YeastViewSet(
+    CatalogMixin,
+    SparseFieldsMixin,
     AddUserMixin,
     RetrieveModelMixin,
     ListModelMixin,
@@ -91,6 +253,8 @@ class YeastViewSet(
 
 
 class HopViewSet(
+    CatalogMixin,
+    SparseFieldsMixin,
     AddUserMixin,
     RetrieveModelMixin,
     ListModelMixin,
@@ -103,9 +267,13 @@ class HopViewSet(
     queryset = models.Hop.objects.all()
     lookup_field = "id"
     permission_classes = (IsAdminUserOrReadOnly,)
+    select_related_fields = ("country",)
+    prefetch_related_fields = ("substitute",)
 
 
 class StyleViewSet(
+    CatalogMixin,
+    SparseFieldsMixin,
     AddUserMixin,
     RetrieveModelMixin,
     ListModelMixin,
@@ -118,9 +286,12 @@ class StyleViewSet(
     queryset = models.Style.objects.all()
     lookup_field = "id"
     permission_classes = (IsAdminUserOrReadOnly,)
+    prefetch_related_fields = ("tags",)
 
 
 class RecipeViewSet(
+    ConditionalRetrieveMixin,
+    SparseFieldsMixin,
     AddUserMixin,
     RetrieveModelMixin,
     ListModelMixin,
@@ -133,9 +304,16 @@ class RecipeViewSet(
     queryset = models.Recipe.objects.all()
     permission_classes = (IsOwnerOrReadOnly,)
     lookup_field = "id"
+    cursor_ordering = ("updated_at", "id")
+    select_related_fields = ("style", "user")
+    prefetch_related_fields = serializers.RecipeSerializer.Meta.expandable_fields
 
     def get_queryset(self):
-        return models.Recipe.objects.filter(user=self.request.user)
+        return super().get_queryset().filter(user=self.request.user)
+
+    def get_etag_parts(self):
+        # the style is shown by name
+        return (catalog.get_version(models.Style),)
 
     def create(self, request, *args, **kwargs):
         request.data.update({"user": request.user.id})
@@ -146,18 +324,16 @@ class RecipeViewSet(
         return super(RecipeViewSet, self).update(request, *args, **kwargs)
 
     def get_serializer_class(self):
+        if self.action == "list":
+            return serializers.RecipeListSerializer
         if self.request.method in ["GET"]:
             return serializers.RecipeReadSerializer
         return serializers.RecipeSerializer
 
-    def get_serializer(self, *args, **kwargs):
-        serializer_class = self.get_serializer_class()
-        kwargs["context"] = self.get_serializer_context()
-        kwargs["user"] = self.request.user
-        return serializer_class(*args, **kwargs)
-
 
 class BatchViewSet(
+    ConditionalRetrieveMixin,
+    SparseFieldsMixin,
     AddUserMixin,
     ListModelMixin,
     RetrieveModelMixin,
@@ -167,9 +343,10 @@ class BatchViewSet(
     queryset = models.Batch.objects.all()
     permission_classes = (IsOwnerOrReadOnly,)
     lookup_field = "id"
+    cursor_ordering = ("updated_at", "id")
 
     def get_queryset(self):
-        return models.Batch.objects.filter(user=self.request.user)
+        return super().get_queryset().filter(user=self.request.user)
 
     def create(self, request, *args, **kwargs):
         request.data.update({"user": request.user.id})
@@ -188,6 +365,8 @@ class BatchViewSet(
             return serializers.BatchSecondarySerializer
         elif self.action == "packaging":
             return serializers.BatchPackagingSerializer
+        elif self.action == "readings":
+            return serializers.FermentationReadingSerializer
         else:
             return serializers.BatchSerializer
 
@@ -252,6 +431,45 @@ class BatchViewSet(
     def packaging(self, request, id=None):
         return self._get_stage_or_update(request=request, id=id)
 
+    @extend_schema(
+        request=serializers.FermentationReadingSerializer(many=True),
+        parameters=[serializers.FermentationSeriesSerializer],
+        responses=None,
+    )
+    @action(methods=["get", "post"], detail=True)
+    def readings(self, request, id=None):
+        """
+        Get fermentation readings or their hourly or daily rollups in a time
+        range, or add readings of a digital hydrometer to the batch
+        """
+        batch = self.get_object()
+        if request.method == "GET":
+            query = serializers.FermentationSeriesSerializer(
+                data=request.query_params, user=request.user
+            )
+            if not query.is_valid():
+                return Response(query.errors, status=400)
+            columns = timeseries.get_series(
+                batch,
+                resolution=query.validated_data["resolution"].upper(),
+                start=query.validated_data.get("start"),
+                end=query.validated_data.get("end"),
+            )
+            return Response(query.to_representation(columns))
+        max_readings = settings.BREWERY_MAX_FERMENTATION_READINGS
+        if isinstance(request.data, list) and len(request.data) > max_readings:
+            return Response(
+                {"non_field_errors": [f"At most {max_readings} readings are allowed."]},
+                status=400,
+            )
+        serializer = serializers.FermentationReadingSerializer(
+            data=request.data, many=True, user=request.user
+        )
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        count = timeseries.append(batch, serializer.validated_data)
+        return Response({"count": count}, status=201)
+
     @action(methods=["post"], detail=True)
     def finish(self, request, id=None):
         sc = self.get_serializer_class()
@@ -277,6 +495,8 @@ class BeerCalculatorViewSet(AddUserMixin, ViewSet):
     def get_serializer_class(self):
         if self.action == "priming":
             return serializers.BeerPrimingCalculatorRequestSerializer
+        elif self.action == "recipes":
+            return serializers.RecipeCalculationSerializer
         else:
             return serializers.BeerPrimingCalculatorRequestSerializer
 
@@ -309,3 +529,30 @@ class BeerCalculatorViewSet(AddUserMixin, ViewSet):
         res_ser.is_valid()
         return Response(res_ser.data)
 
+    @extend_schema(
+        request=serializers.RecipeCalculationSerializer(many=True),
+        responses=serializers.RecipeCalculationSerializer(many=True),
+    )
+    @action(methods=["post"], detail=False)
+    def recipes(self, request, format=None):
+        """
+        Get metrics of a list of recipes, which are not saved
+        """
+        max_recipes = settings.BREWERY_CALCULATOR_MAX_RECIPES
+        if isinstance(request.data, list) and len(request.data) > max_recipes:
+            return Response(
+                {"non_field_errors": [f"At most {max_recipes} recipes are allowed."]},
+                status=400,
+            )
+        serializer = serializers.RecipeCalculationSerializer(
+            data=request.data, many=True, user=request.user
+        )
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        recipes = serializers.RecipeCalculationSerializer.calculate(
+            serializer.validated_data
+        )
+        res_ser = serializers.RecipeCalculationSerializer(
+            recipes, many=True, user=request.user
+        )
+        return Response(res_ser.data)
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class BrewConfig(AppConfig):
     name = 'brivo.brewery'
+
+    def ready(self):
+        try:
+            import brivo.brewery.signals  # noqa F401
+        except ImportError:
+            pass
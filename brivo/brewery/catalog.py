@@ -0,0 +1,233 @@
+"""
+Per-process cache of the reference data (fermentables, hops, yeasts,
+extras and styles).
+
+Every process keeps a snapshot of each catalog: a tuple of all its rows,
+read with the related objects used by views and serializers. A snapshot
+is tagged with the catalog version, a counter kept in the Django cache,
+so it is shared by all processes. Saves and deletes bump the version
+(see `brivo.brewery.signals`) and the next read of an outdated snapshot
+reloads it. A request then costs one cache read instead of queries.
+
+Snapshots are shared between requests and threads, objects in them
+must not be modified. Without a working cache the catalogs are always
+read from the database.
+"""
+import random
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from operator import ge, gt, le, lt
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Model
+from django_filters.constants import EMPTY_VALUES
+
+from brivo.brewery import models
+
+
+CATALOG_MODELS = (
+    models.Fermentable,
+    models.Hop,
+    models.Yeast,
+    models.Extra,
+    models.Style,
+)
+
+# Related objects loaded with the snapshot
+RELATED = {
+    models.Fermentable: (("country",), ()),
+    models.Hop: (("country",), ("substitute",)),
+    models.Style: ((), ("tags",)),
+}
+
+# Catalogs showing other models
+DEPENDENT = {
+    models.Country: (models.Fermentable, models.Hop),
+    models.Tag: (models.Style,),
+}
+
+VERSION_KEY = "brewery:catalog:{}:version"
+
+Snapshot = namedtuple("Snapshot", ["version", "objects", "by_pk"])
+
+_snapshots = {}
+
+_invalidation_state = threading.local()
+
+
+def _version_key(model):
+    return VERSION_KEY.format(model._meta.label_lower)
+
+
+def get_version(model):
+    """Return current version of the catalog, None if cache is not available."""
+    key = _version_key(model)
+    version = cache.get(key)
+    if version is None:
+        # Random start, so a counter lost by the cache does not repeat
+        # versions of existing snapshots
+        cache.add(key, random.randrange(2 ** 31), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(model):
+    key = _version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, random.randrange(2 ** 31), timeout=None)
+
+
+def _bump_catalog(catalog):
+    bump_version(catalog)
+    transaction.on_commit(lambda: bump_version(catalog))
+
+
+def invalidate(model):
+    """Outdate snapshots of the catalog (and catalogs showing the model).
+
+    The version is bumped again on commit, as other processes could
+    reload the snapshot before the change is visible to them. Inside
+    `defer_invalidation` catalogs are only outdated at its end.
+    """
+    pending = getattr(_invalidation_state, "pending", None)
+    for catalog in DEPENDENT.get(model, (model,)):
+        if pending is not None:
+            pending.add(catalog)
+        else:
+            _bump_catalog(catalog)
+
+
+@contextmanager
+def defer_invalidation():
+    """Outdate all catalogs changed in the block once, at its end."""
+    if getattr(_invalidation_state, "pending", None) is not None:
+        # nested, the outermost block does the invalidation
+        yield
+        return
+    _invalidation_state.pending = set()
+    try:
+        yield
+    finally:
+        pending, _invalidation_state.pending = _invalidation_state.pending, None
+    for catalog in sorted(pending, key=lambda model: model._meta.label):
+        _bump_catalog(catalog)
+
+
+def get_queryset(model):
+    select, prefetch = RELATED.get(model, ((), ()))
+    return model.objects.select_related(*select).prefetch_related(*prefetch).order_by(
+        "pk"
+    )
+
+
+def get_snapshot(model):
+    """Return current snapshot of the catalog, None if cache is not available."""
+    version = get_version(model)
+    if version is None:
+        return None
+    snapshot = _snapshots.get(model)
+    if snapshot is None or snapshot.version != version:
+        objects = tuple(get_queryset(model))
+        snapshot = Snapshot(version, objects, {obj.pk: obj for obj in objects})
+        _snapshots[model] = snapshot
+    return snapshot
+
+
+def get_objects(model):
+    """Return all objects of the catalog, ordered by pk."""
+    snapshot = get_snapshot(model)
+    if snapshot is None:
+        return tuple(get_queryset(model))
+    return snapshot.objects
+
+
+def search(model, query):
+    """Catalog objects with `query` in name, like `name__icontains`."""
+    query = query.lower()
+    return [obj for obj in get_objects(model) if query in obj.name.lower()]
+
+
+def _contains(value, query):
+    return query.lower() in str(value).lower()
+
+
+def _iexact(value, query):
+    return str(value).lower() == str(query).lower()
+
+
+def _exact(value, query):
+    return value == query
+
+
+LOOKUPS = {
+    "exact": _exact,
+    "iexact": _iexact,
+    "icontains": _contains,
+    "gt": gt,
+    "gte": ge,
+    "lt": lt,
+    "lte": le,
+}
+
+
+def _matches(lookup, value, query):
+    # NULL matches no lookup in SQL
+    return value is not None and lookup(value, query)
+
+
+def _filter_value(field, obj):
+    value = getattr(obj, field.attname)
+    if field.is_relation or value is None:
+        return value
+    # compare values as stored, e.g. measurements in standard units
+    return field.get_prep_value(value)
+
+
+def filter_objects(filterset, objects):
+    """Apply a valid FilterSet of simple lookups to catalog objects.
+
+    Return None if some filter can't be applied in memory.
+    """
+    model = filterset._meta.model
+    for name, query in filterset.form.cleaned_data.items():
+        if query in EMPTY_VALUES:
+            continue
+        filter_ = filterset.filters[name]
+        if (
+            filter_.method is not None
+            or filter_.exclude
+            or "__" in filter_.field_name
+            or filter_.lookup_expr not in LOOKUPS
+        ):
+            return None
+        field = model._meta.get_field(filter_.field_name)
+        if field.many_to_many or field.one_to_many:
+            return None
+        if isinstance(query, Model):
+            query = query.pk
+        objects = [
+            obj
+            for obj in objects
+            if _matches(LOOKUPS[filter_.lookup_expr], _filter_value(field, obj), query)
+        ]
+    return list(objects)
+
+
+def filter_catalog(filterset_class, data):
+    """Return catalog objects matching the filters in `data`.
+
+    Served from the snapshot when possible, otherwise filtered queryset.
+    """
+    model = filterset_class._meta.model
+    filterset = filterset_class(data, queryset=get_queryset(model))
+    if filterset.is_valid():
+        snapshot = get_snapshot(model)
+        if snapshot is not None:
+            objects = filter_objects(filterset, snapshot.objects)
+            if objects is not None:
+                return objects
+    return filterset.qs
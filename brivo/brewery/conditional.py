@@ -0,0 +1,59 @@
+"""
+Conditional GET (ETag / Last-Modified) of recipes, batches and catalogs.
+
+Validators are derived from `updated_at` of the object (a recipe is
+touched when its ingredients change, see `Recipe.update_metrics`) or
+from the catalog version, plus everything else the response depends on:
+the unit settings and the language of the user. A client sending the
+current validators gets 304 before the object is serialized or
+rendered.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language
+
+from brivo.brewery import catalog
+from brivo.utils.functions import get_unit_preferences
+
+
+def make_etag(request, *parts):
+    """Return strong ETag of the parts, for the user of the request."""
+    user = request.user
+    units = get_unit_preferences(user) if user.is_authenticated else None
+    key = repr((parts, tuple(units or ()), get_language()))
+    return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+
+def object_etag(request, obj, *parts):
+    return make_etag(request, obj._meta.label_lower, obj.pk, obj.updated_at, *parts)
+
+
+def catalog_etag(request, model, *parts):
+    """ETag of data read from the catalog, None without a working cache."""
+    version = catalog.get_version(model)
+    if version is None:
+        return None
+    return make_etag(request, model._meta.label_lower, version, *parts)
+
+
+def conditional_response(request, get_response, etag=None, last_modified=None):
+    """Return 304 if the client has the current version, else `get_response()`.
+
+    Successful responses get the validators, and must be revalidated by
+    the client every time.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if response is None:
+        response = get_response()
+    if request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+        if etag and not response.has_header("ETag"):
+            response["ETag"] = etag
+        if timestamp and not response.has_header("Last-Modified"):
+            response["Last-Modified"] = http_date(timestamp)
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
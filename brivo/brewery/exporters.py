@@ -0,0 +1,89 @@
+"""
+Streaming export of recipes and batches (to JSON or BeerXML).
+
+Rows are read a chunk at a time, related objects are prefetched per
+chunk, and the document is generated piece by piece, so neither the
+rows nor the output are ever held in memory as a whole. The JSON format
+is the one read by `brivo.brewery.importers`.
+"""
+import json
+from xml.etree import ElementTree
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from brivo.brewery import models
+from brivo.brewery.api import serializers
+from brivo.brewery.importers import chunks
+from brivo.utils import functions
+
+
+EXPORT_CHUNK_SIZE = settings.BREWERY_EXPORT_CHUNK_SIZE
+
+RECIPE_PREFETCH = ("fermentables", "hops", "yeasts", "extras", "mash_steps")
+
+
+def iter_chunks(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of objects of the queryset, ordered by pk.
+
+    `QuerySet.iterator()` does not apply `prefetch_related`, so only the
+    primary keys are streamed with it and every chunk of rows is fetched
+    with the prefetches of the queryset.
+    """
+    pks = (
+        queryset.order_by("pk")
+        .values_list("pk", flat=True)
+        .iterator(chunk_size=chunk_size)
+    )
+    for chunk in chunks(pks, chunk_size):
+        yield list(queryset.filter(pk__in=chunk).order_by("pk"))
+
+
+def iter_json(queryset, serializer_class, user, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the JSON list of the serialized queryset, chunk by chunk."""
+    yield "["
+    separator = ""
+    for chunk in iter_chunks(queryset, chunk_size):
+        for row in serializer_class(chunk, many=True, user=user).data:
+            yield separator + json.dumps(row, cls=JSONEncoder)
+            separator = ","
+    yield "]"
+
+
+def iter_beerxml(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the BeerXML document of the recipes, recipe by recipe."""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<RECIPES>\n'
+    for chunk in iter_chunks(queryset, chunk_size):
+        for recipe in chunk:
+            node = functions.recipe_to_beerxml(recipe)
+            yield ElementTree.tostring(node, encoding="unicode") + "\n"
+    yield "</RECIPES>\n"
+
+
+def get_recipes(user):
+    return (
+        models.Recipe.objects.filter(user=user)
+        .select_related("user", "style")
+        .prefetch_related(*RECIPE_PREFETCH)
+    )
+
+
+def get_batches(user):
+    return models.Batch.objects.filter(user=user)
+
+
+def export_recipes(user, filetype, chunk_size=EXPORT_CHUNK_SIZE):
+    """Return generator of the user's recipes in the `filetype` format."""
+    recipes = get_recipes(user)
+    if filetype == "beerxml":
+        return iter_beerxml(recipes, chunk_size)
+    return iter_json(
+        recipes, serializers.RecipeExportSerializer, user, chunk_size
+    )
+
+
+def export_batches(user, chunk_size=EXPORT_CHUNK_SIZE):
+    """Return generator of the user's batches in JSON."""
+    return iter_json(
+        get_batches(user), serializers.BatchExportSerializer, user, chunk_size
+    )
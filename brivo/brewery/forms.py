@@ -24,6 +24,7 @@ from crispy_forms.layout import (
 )
 
 from measurement.measures import Volume, Weight, Temperature
+from brivo.utils.functions import get_unit_preferences
 from brivo.utils.measures import BeerColor, BeerGravity
 from brivo.brewery.measurement_forms import MeasurementField
 from brivo.brewery import layouts
@@ -388,10 +389,10 @@ class BaseBatchForm(BSModalModelForm):
             volume_unit_choices,
             temp_unit_choices,
             gravity_unit_choices,
-        ) = _get_unit_choices(self.request.user.profile)
+        ) = _get_unit_choices(get_unit_preferences(self.request.user))
 
         if "recipe" in self.fields:
-            grav_unit = self.request.user.profile.gravity_units.lower()
+            grav_unit = get_unit_preferences(self.request.user).gravity_units.lower()
             if grav_unit == "plato":
                 prec = 1
                 un = "°P"
@@ -791,6 +792,19 @@ class BaseBatchForm(BSModalModelForm):
                 ),
             )
 
+    def clean_batch_number(self):
+        number = self.cleaned_data.get("batch_number")
+        if (
+            number is not None
+            and models.Batch.objects.filter(
+                user=self.request.user, batch_number=number
+            )
+            .exclude(pk=self.instance.pk)
+            .exists()
+        ):
+            raise ValidationError(_("You already have a batch with this number."))
+        return number
+
 
 class FermentationCheckModelForm(BSModalModelForm):
     def __init__(self, *args, **kwargs):
@@ -799,7 +813,7 @@ class FermentationCheckModelForm(BSModalModelForm):
             volume_unit_choices,
             temp_unit_choices,
             gravity_unit_choices,
-        ) = _get_unit_choices(self.request.user.profile)
+        ) = _get_unit_choices(get_unit_preferences(self.request.user))
         self.fields.update(
             {
                 "beer_temperature": MeasurementField(
@@ -843,8 +857,8 @@ class FermentableModelForm(BSModalModelForm):
                     measurement=BeerColor,
                     unit_choices=(
                         (
-                            self.request.user.profile.color_units.lower(),
-                            self.request.user.profile.color_units.lower(),
+                            get_unit_preferences(self.request.user).color_units.lower(),
+                            get_unit_preferences(self.request.user).color_units.lower(),
                         ),
                     ),
                 )
@@ -865,13 +879,13 @@ class HopModelForm(BSModalModelForm):
 class YeastModelForm(BSModalModelForm):
     def __init__(self, *args, **kwargs):
         super(YeastModelForm, self).__init__(*args, **kwargs)
-        if self.request.user.profile.general_units == "METRIC":
+        if get_unit_preferences(self.request.user).general_units == "METRIC":
             unit_choices = (("c", "c"),)
-        elif self.request.user.profile.general_units == "IMPERIAL":
+        elif get_unit_preferences(self.request.user).general_units == "IMPERIAL":
             unit_choices = (("f", "f"),)
         else:
             raise ValueError(
-                f"No unit choice {self.request.user.profile.general_units}"
+                f"No unit choice {get_unit_preferences(self.request.user).general_units}"
             )
         self.fields.update(
             {
@@ -902,8 +916,8 @@ class ExtraModelForm(BSModalModelForm):
 class StyleModelForm(BSModalModelForm):
     def __init__(self, *args, **kwargs):
         super(StyleModelForm, self).__init__(*args, **kwargs)
-        user_color_unit = self.request.user.profile.color_units.lower()
-        user_gravity_unit = self.request.user.profile.gravity_units.lower()
+        user_color_unit = get_unit_preferences(self.request.user).color_units.lower()
+        user_gravity_unit = get_unit_preferences(self.request.user).gravity_units.lower()
         self.fields.update(
             {
                 "color_min": MeasurementField(
@@ -946,13 +960,13 @@ class StyleModelForm(BSModalModelForm):
 
 class IngredientFermentableForm(PopRequestMixin, ModelForm):
     def add_user_restrictions_to_field(self, request):
-        if request.user.profile.general_units == "METRIC":
+        if get_unit_preferences(request.user).general_units == "METRIC":
             unit_choices = (("kg", "kg"),)
-        elif request.user.profile.general_units == "IMPERIAL":
+        elif get_unit_preferences(request.user).general_units == "IMPERIAL":
             unit_choices = (("lb", "lb"),)
         else:
-            raise ValueError(f"No unit choice {request.user.profile.general_units}")
-        user_color_unit = request.user.profile.color_units.lower()
+            raise ValueError(f"No unit choice {get_unit_preferences(request.user).general_units}")
+        user_color_unit = get_unit_preferences(request.user).color_units.lower()
         color_choices = ((user_color_unit, user_color_unit),)
         self.fields.update(
             {
@@ -983,12 +997,12 @@ IngredientFermentableFormSet = inlineformset_factory(
 
 class IngredientHopForm(PopRequestMixin, ModelForm):
     def add_user_restrictions_to_field(self, request):
-        if request.user.profile.general_units == "METRIC":
+        if get_unit_preferences(request.user).general_units == "METRIC":
             unit_choices = (("g", "g"),)
-        elif request.user.profile.general_units == "IMPERIAL":
+        elif get_unit_preferences(request.user).general_units == "IMPERIAL":
             unit_choices = (("oz", "oz"),)
         else:
-            raise ValueError(f"No unit choice {request.user.profile.general_units}")
+            raise ValueError(f"No unit choice {get_unit_preferences(request.user).general_units}")
         time_choices = (("MINUTE", "minute"), ("DAY", "day"))
         self.fields.update(
             {
@@ -1017,12 +1031,12 @@ IngredientHopFormSet = inlineformset_factory(
 
 class IngredientYeastForm(PopRequestMixin, ModelForm):
     def add_user_restrictions_to_field(self, request):
-        if request.user.profile.general_units == "METRIC":
+        if get_unit_preferences(request.user).general_units == "METRIC":
             unit_choices = (("g", "g"),)
-        elif request.user.profile.general_units == "IMPERIAL":
+        elif get_unit_preferences(request.user).general_units == "IMPERIAL":
             unit_choices = (("oz", "oz"),)
         else:
-            raise ValueError(f"No unit choice {request.user.profile.general_units}")
+            raise ValueError(f"No unit choice {get_unit_preferences(request.user).general_units}")
         self.fields.update(
             {
                 "amount": MeasurementField(
@@ -1049,12 +1063,12 @@ IngredientYeastFormSet = inlineformset_factory(
 
 class IngredientExtraForm(PopRequestMixin, ModelForm):
     def add_user_restrictions_to_field(self, request):
-        if request.user.profile.general_units == "METRIC":
+        if get_unit_preferences(request.user).general_units == "METRIC":
             unit_choices = (("g", "g"),)
-        elif request.user.profile.general_units == "IMPERIAL":
+        elif get_unit_preferences(request.user).general_units == "IMPERIAL":
             unit_choices = (("oz", "oz"),)
         else:
-            raise ValueError(f"No unit choice {request.user.profile.general_units}")
+            raise ValueError(f"No unit choice {get_unit_preferences(request.user).general_units}")
         self.fields.update(
             {
                 "amount": MeasurementField(
@@ -1081,12 +1095,12 @@ IngredientExtraFormSet = inlineformset_factory(
 
 class MashStepForm(PopRequestMixin, ModelForm):
     def add_user_restrictions_to_field(self, request):
-        if request.user.profile.general_units == "METRIC":
+        if get_unit_preferences(request.user).general_units == "METRIC":
             unit_choices = (("c", "c"),)
-        elif request.user.profile.general_units == "IMPERIAL":
+        elif get_unit_preferences(request.user).general_units == "IMPERIAL":
             unit_choices = (("f", "f"),)
         else:
-            raise ValueError(f"No unit choice {request.user.profile.general_units}")
+            raise ValueError(f"No unit choice {get_unit_preferences(request.user).general_units}")
         self.fields.update(
             {
                 "temperature": MeasurementField(
@@ -1181,13 +1195,13 @@ hop_info_stats = """
 class RecipeModelForm(BSModalModelForm):
     def __init__(self, *args, **kwargs):
         super(RecipeModelForm, self).__init__(*args, **kwargs)
-        if self.request.user.profile.general_units == "METRIC":
+        if get_unit_preferences(self.request.user).general_units == "METRIC":
             unit_choices = (("l", "l"),)
-        elif self.request.user.profile.general_units == "IMPERIAL":
+        elif get_unit_preferences(self.request.user).general_units == "IMPERIAL":
             unit_choices = (("us_g", "us_g"),)
         else:
             raise ValueError(
-                f"No unit choice {self.request.user.profile.general_units}"
+                f"No unit choice {get_unit_preferences(self.request.user).general_units}"
             )
         self.fields.update(
             {
@@ -0,0 +1,233 @@
+"""
+Chunked import of recipes and batches (rows parsed from JSON or BeerXML).
+
+Users, styles and recipes referenced by the rows are resolved once per
+import. Rows are validated a chunk at a time and every chunk is written
+in one transaction with bulk inserts. A chunk with an invalid row is not
+written and the import stops, chunks before it stay imported.
+"""
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from brivo.brewery import catalog, models
+from brivo.brewery.api import serializers
+from brivo.users.models import User
+from brivo.utils import functions
+
+
+IMPORT_CHUNK_SIZE = settings.BREWERY_IMPORT_CHUNK_SIZE
+
+RECIPE_INGREDIENTS = {
+    "fermentables": models.IngredientFermentable,
+    "hops": models.IngredientHop,
+    "yeasts": models.IngredientYeast,
+    "extras": models.IngredientExtra,
+    "mash_steps": models.MashStep,
+}
+
+
+def chunks(rows, size):
+    """Split rows (any iterable, e.g. a generator) into lists of `size`."""
+    rows = iter(rows)
+    chunk = list(islice(rows, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(rows, size))
+
+
+def get_user(user):
+    if isinstance(user, User):
+        return user
+    return User.objects.get(username=user)
+
+
+class StyleMap:
+    """Resolve a style pk or (part of) name/category id to a style pk.
+
+    Styles are read from the catalog. Names are matched like
+    `name__icontains`, then `category_id__icontains`, returning the first
+    style by pk.
+    """
+
+    def __init__(self):
+        self.styles = [
+            (style.pk, style.name.lower(), style.category_id.lower())
+            for style in catalog.get_objects(models.Style)
+        ]
+        self.pks = {style[0] for style in self.styles}
+        self.cache = {}
+
+    def resolve(self, value):
+        if value not in self.cache:
+            self.cache[value] = self._find(value)
+        return self.cache[value]
+
+    def _find(self, value):
+        if not isinstance(value, str):
+            return value if value in self.pks else None
+        value = value.lower()
+        for column in (1, 2):
+            for style in self.styles:
+                if value in style[column]:
+                    return style[0]
+        return None
+
+
+class RecipeMap:
+    """Resolve a recipe pk or (part of) name to a recipe pk.
+
+    Each distinct value is looked up only once per import.
+    """
+
+    def __init__(self):
+        self.cache = {}
+
+    def resolve(self, value):
+        if value not in self.cache:
+            if isinstance(value, str):  # this is probably name not pk
+                recipes = models.Recipe.objects.filter(name__icontains=value)
+            else:
+                recipes = models.Recipe.objects.filter(pk=value)
+            self.cache[value] = recipes.order_by("pk").values_list(
+                "pk", flat=True
+            ).first()
+        return self.cache[value]
+
+
+class ThrottledProgress:
+    """Forward progress to a celery_progress `ProgressRecorder`, at most
+    once per `interval` seconds (and always for the last item)."""
+
+    def __init__(self, recorder, total, interval=1.0):
+        self.recorder = recorder
+        self.total = total
+        self.interval = interval
+        self.last_update = None
+
+    def set_progress(self, current, description=""):
+        now = time.monotonic()
+        if (
+            current < self.total
+            and self.last_update is not None
+            and now - self.last_update < self.interval
+        ):
+            return
+        self.last_update = now
+        self.recorder.set_progress(current, self.total, description)
+
+
+class FileProgress:
+    """Report the read position in a file, for rows streamed from it.
+
+    The number of rows is not known up front, so `progress` is expected
+    to be created with the file size as its total.
+    """
+
+    def __init__(self, progress, fileobj):
+        self.progress = progress
+        self.fileobj = fileobj
+
+    def set_progress(self, current, description=""):
+        self.progress.set_progress(self.fileobj.tell(), description)
+
+
+def _validate(rows, serializer_class, user, resolve):
+    # one list serializer for the chunk, so fields are built only once
+    data = [resolve(functions.clean_data(row)) for row in rows]
+    serializer = serializer_class(data=data, many=True, user=user)
+    if not serializer.is_valid():
+        raise Exception([errors for errors in serializer.errors if errors])
+    return serializer.validated_data
+
+
+def import_recipe_chunk(rows, user, styles):
+    """Validate and save one chunk of recipe rows, return the recipes."""
+
+    def resolve(data):
+        style = styles.resolve(data["style"])
+        if style is None:
+            raise Exception(
+                f"Did not fount a syle '{data['style']}' for '{data['name']}'"
+            )
+        data["style"] = style
+        return data
+
+    validated = _validate(rows, serializers.RecipeSerializer, user, resolve)
+    with transaction.atomic(), models.defer_metrics_update():
+        ingredients = [
+            {attr: data.pop(attr, []) for attr in RECIPE_INGREDIENTS}
+            for data in validated
+        ]
+        recipes = models.bulk_create_with_slugs(
+            models.Recipe,
+            [models.Recipe(user=user, **data) for data in validated],
+            need_pks=True,
+        )
+        for attr, iclass in RECIPE_INGREDIENTS.items():
+            items = []
+            for recipe, recipe_ingredients in zip(recipes, ingredients):
+                for item_data in recipe_ingredients[attr]:
+                    item_data.pop("id", None)
+                    items.append(iclass(recipe=recipe, **item_data))
+            models.bulk_create_with_slugs(iclass, items)
+        # bulk writes send no signals
+        for recipe in recipes:
+            models.schedule_metrics_update(recipe.pk)
+    return recipes
+
+
+def import_batch_chunk(rows, user, recipes):
+    """Validate and save one chunk of batch rows, return the batches."""
+
+    def resolve(data):
+        recipe = recipes.resolve(data["recipe"])
+        if recipe is None:
+            raise Exception(
+                f"Did not fount a recipe '{data['recipe']}' for '{data['name']}'"
+            )
+        data["recipe"] = recipe
+        return data
+
+    validated = _validate(rows, serializers.BatchSerializer, user, resolve)
+    with transaction.atomic():
+        numbers = models.Batch.allocate_batch_numbers(
+            user, [data.get("batch_number", 1) for data in validated]
+        )
+        batches = []
+        for data, number in zip(validated, numbers):
+            data["batch_number"] = number
+            data.pop("user", None)
+            batches.append(models.Batch(user=user, **data))
+        return models.bulk_create_with_slugs(models.Batch, batches)
+
+
+def import_recipes(rows, user, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """Import recipe rows for the user, return the number of imported rows.
+
+    `rows` may be a generator, it is consumed a chunk at a time.
+    """
+    user = get_user(user)
+    styles = StyleMap()
+    uploaded = 0
+    for chunk in chunks(rows, chunk_size):
+        import_recipe_chunk(chunk, user, styles)
+        uploaded += len(chunk)
+        if progress is not None:
+            progress.set_progress(uploaded, f"Uploaded {chunk[-1]['name']}")
+    return uploaded
+
+
+def import_batches(rows, user, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """Import batch rows for the user, return the number of imported rows."""
+    user = get_user(user)
+    recipes = RecipeMap()
+    uploaded = 0
+    for chunk in chunks(rows, chunk_size):
+        import_batch_chunk(chunk, user, recipes)
+        uploaded += len(chunk)
+        if progress is not None:
+            progress.set_progress(uploaded, f"Uploaded {chunk[-1]['name']}")
+    return uploaded
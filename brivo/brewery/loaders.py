@@ -0,0 +1,268 @@
+"""
+Bulk loader of the reference data (countries, fermentables, styles, hops,
+yeasts and extras) from the JSON files in `management/commands/data`.
+
+Rows are deduplicated in memory by a natural key and matched against the
+rows already in the database, so every model is read once. Countries,
+tags and hop substitutes are resolved from dictionaries. Everything is
+written in one transaction with bulk queries, except new fermentables,
+hops, yeasts and extras: they use multi-table inheritance and are saved
+one by one (see `models.bulk_create_with_slugs`).
+"""
+import json
+import os
+import re
+
+from django.db import connection, transaction
+from django.utils import timezone
+from measurement.measures import Temperature
+
+from brivo.brewery import catalog, models
+from brivo.utils.measures import BeerColor, BeerGravity
+
+
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "management", "commands", "data"
+)
+
+_FLOAT_REGEX = re.compile(r"^-?(?:\d+())?(?:\.\d*())?(?:e-?\d+())?(?:\2|\1\3)$")
+_INT_REGEX = re.compile(r"^(?<![\d.])[0-9]+(?![\d.])$")
+
+
+def _convert_type(data):
+    """Check and convert the type of variable"""
+
+    if _FLOAT_REGEX.match(data) is not None:  # Floats
+        return float(data)
+    elif _INT_REGEX.match(data) is not None:  # Integers
+        return int(data)
+    elif data == "True" or data == "true":
+        return True
+    elif data == "False" or data == "false":
+        return False
+    else:
+        return str(data)  # The rest is string
+
+
+def _clean_data(data):
+    new_data = {}
+    for k, v in data.items():
+        if v == "" or v == "-":
+            continue
+        new_data[k] = _convert_type(str(v))
+    return new_data
+
+
+def _split(value):
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+class LoadResult:
+    def __init__(self, name):
+        self.name = name
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+
+
+class CatalogLoader:
+    """Load the reference data files into the database.
+
+    Rows already in the database are matched by natural key. All of them
+    are updated from the files, or with `incremental` only those whose
+    values differ. Rows with a key seen before in the same file are
+    skipped.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, chunk_size=500, incremental=False):
+        self.data_dir = data_dir
+        self.chunk_size = chunk_size
+        self.incremental = incremental
+        self.results = []
+        self.warnings = []
+
+    def read(self, filename):
+        with open(os.path.join(self.data_dir, filename)) as fin:
+            return [_clean_data(row) for row in json.load(fin)]
+
+    def load(self):
+        # rows saved one by one outdate the catalogs once, at the end
+        with transaction.atomic(), catalog.defer_invalidation():
+            self.countries = self.load_countries()
+            self.load_fermentables()
+            self.load_styles()
+            self.load_hops()
+            self.load_yeasts()
+            self.load_extras()
+            # bulk written rows send no signals
+            for model in catalog.CATALOG_MODELS:
+                catalog.invalidate(model)
+        return self.results
+
+    def upsert(self, model, rows, key):
+        """Create and update `model` rows, return all objects by key."""
+        result = LoadResult(model.__name__)
+        existing = {}
+        for obj in model.objects.order_by("pk"):
+            existing.setdefault(self._key(obj, key), obj)
+        seen = set()
+        new = []
+        changed = []
+        changed_fields = set()
+        for kwargs in rows:
+            obj = model(**kwargs)
+            obj_key = self._key(obj, key)
+            if obj_key in seen:
+                continue
+            seen.add(obj_key)
+            if obj_key not in existing:
+                new.append(obj)
+                continue
+            old = existing[obj_key]
+            fields = [model._meta.get_field(name) for name in kwargs]
+            if self.incremental:
+                fields = [
+                    field
+                    for field in fields
+                    if self._db_value(field, obj) != self._db_value(field, old)
+                ]
+            if not fields:
+                result.unchanged += 1
+                continue
+            for field in fields:
+                setattr(old, field.attname, getattr(obj, field.attname))
+                changed_fields.add(field.name)
+            changed.append(old)
+
+        if new:
+            models.bulk_create_with_slugs(model, new, batch_size=self.chunk_size)
+            existing = {}
+            for obj in model.objects.order_by("pk"):
+                existing.setdefault(self._key(obj, key), obj)
+        if changed:
+            # bulk_update does not touch auto_now fields
+            now = timezone.now()
+            for obj in changed:
+                obj.updated_at = now
+            model.objects.bulk_update(
+                changed,
+                sorted(changed_fields) + ["updated_at"],
+                batch_size=self.chunk_size,
+            )
+        result.created = len(new)
+        result.updated = len(changed)
+        self.results.append(result)
+        return existing
+
+    def add_relations(self, field, relations):
+        """Add missing (instance pk, related pk) rows to m2m `field`."""
+        through = field.remote_field.through
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        existing = set(
+            through.objects.values_list(f"{source}_id", f"{target}_id")
+        )
+        through.objects.bulk_create(
+            [
+                through(**{f"{source}_id": a, f"{target}_id": b})
+                for a, b in sorted(relations - existing)
+            ],
+            batch_size=self.chunk_size,
+            ignore_conflicts=True,
+        )
+
+    def load_countries(self):
+        countries = self.upsert(
+            models.Country, self.read("countries.json"), ("code",)
+        )
+        self.countries_by_name = {
+            country.name: country for country in countries.values()
+        }
+        return {key[0]: country for key, country in countries.items()}
+
+    def get_country(self, row, countries):
+        try:
+            return countries[row["country"]]
+        except KeyError:
+            raise ValueError(
+                f"Unknown country {row['country']} of {row['name']}"
+            ) from None
+
+    def load_fermentables(self):
+        rows = self.read("fermentables.json")
+        for row in rows:
+            if row.get("country"):
+                row["country"] = self.get_country(row, self.countries)
+            if row.get("color"):
+                row["color"] = BeerColor(srm=row["color"])
+        self.upsert(models.Fermentable, rows, ("name", "country_id"))
+
+    def load_styles(self):
+        rows = self.read("styles.json")
+        style_tags = {}
+        for row in rows:
+            for grv in ["og_min", "og_max", "fg_min", "fg_max"]:
+                if row.get(grv):
+                    row[grv] = BeerGravity(sg=row[grv])
+            for clr in ["color_min", "color_max"]:
+                if row.get(clr):
+                    row[clr] = BeerColor(srm=row[clr])
+            style_tags.setdefault(row["name"], _split(str(row.pop("tags", ""))))
+        tag_rows = [
+            {"name": name}
+            for name in sorted({tag for tags in style_tags.values() for tag in tags})
+        ]
+        tags = self.upsert(models.Tag, tag_rows, ("name",))
+        styles = self.upsert(models.Style, rows, ("name",))
+        self.add_relations(
+            models.Style._meta.get_field("tags"),
+            {
+                (styles[(style,)].pk, tags[(tag,)].pk)
+                for style, names in style_tags.items()
+                for tag in names
+            },
+        )
+
+    def load_hops(self):
+        rows = self.read("hops.json")
+        hop_substitutes = {}
+        for row in rows:
+            if row.get("country"):
+                row["country"] = self.get_country(row, self.countries_by_name)
+            row["alpha_acids"] = (row["alpha_max"] + row["alpha_min"]) / 2.0
+            hop_substitutes.setdefault(
+                row["name"], _split(str(row.pop("substitute", "")))
+            )
+        hops = self.upsert(models.Hop, rows, ("name",))
+        relations = set()
+        for name, substitutes in hop_substitutes.items():
+            not_found = [sub for sub in substitutes if (sub,) not in hops]
+            if not_found:
+                self.warnings.append(
+                    f"Could not find all substitute hops of {name}: {not_found}"
+                )
+            relations |= {
+                (hops[(name,)].pk, hops[(sub,)].pk)
+                for sub in substitutes
+                if (sub,) in hops
+            }
+        self.add_relations(models.Hop._meta.get_field("substitute"), relations)
+
+    def load_yeasts(self):
+        rows = self.read("yeasts.json")
+        for row in rows:
+            for temp in ["temp_min", "temp_max"]:
+                if row.get(temp):
+                    row[temp] = Temperature(celsius=row[temp])
+        self.upsert(models.Yeast, rows, ("name", "lab"))
+
+    def load_extras(self):
+        self.upsert(models.Extra, self.read("extras.json"), ("name",))
+
+    @staticmethod
+    def _key(obj, key):
+        return tuple(getattr(obj, attname) for attname in key)
+
+    @staticmethod
+    def _db_value(field, obj):
+        return field.get_db_prep_save(getattr(obj, field.attname), connection)
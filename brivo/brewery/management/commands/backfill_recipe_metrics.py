@@ -0,0 +1,45 @@
+from django.core.management import BaseCommand
+
+from brivo.brewery import models
+
+
+class Command(BaseCommand):
+    """Django command to fill the stored metrics of existing recipes"""
+
+    help = "Calculate and store metrics (OG, FG, ABV, IBU...) of recipes in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of recipes loaded and updated at once.",
+        )
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Only update recipes without stored metrics.",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        queryset = models.Recipe.objects.order_by("pk")
+        if options["missing"]:
+            queryset = queryset.filter(og__isnull=True)
+        total = 0
+        last_pk = 0
+        while True:
+            recipes = list(
+                queryset.filter(pk__gt=last_pk).prefetch_related(
+                    "fermentables", "hops", "yeasts"
+                )[:chunk_size]
+            )
+            if not recipes:
+                break
+            for recipe in recipes:
+                recipe.update_metrics(commit=False)
+            models.Recipe.objects.bulk_update(recipes, models.Recipe.METRICS_FIELDS)
+            total += len(recipes)
+            last_pk = recipes[-1].pk
+            self.stdout.write(f"Updated {total} recipes")
+        self.stdout.write(self.style.SUCCESS(f"Successfully updated {total} recipes"))
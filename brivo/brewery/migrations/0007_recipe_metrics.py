@@ -0,0 +1,56 @@
+# Generated by Django 3.0.12 on 2026-10-18 08:55
+
+import brivo.brewery.fields
+import brivo.utils.measures
+from django.db import migrations, models
+import measurement.measures.volume
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brewery', '0006_auto_20211019_1531'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='abv',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='ABV'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='bitterness_ratio',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Bitterness Ratio'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='boil_volume',
+            field=brivo.brewery.fields.VolumeField(blank=True, editable=False, measurement=measurement.measures.volume.Volume, null=True, verbose_name='Boil Volume'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='color',
+            field=brivo.brewery.fields.BeerColorField(blank=True, editable=False, measurement=brivo.utils.measures.BeerColor, null=True, verbose_name='Color'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fg',
+            field=brivo.brewery.fields.BeerGravityField(blank=True, editable=False, measurement=brivo.utils.measures.BeerGravity, null=True, verbose_name='Final Gravity'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ibu',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='IBU'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='og',
+            field=brivo.brewery.fields.BeerGravityField(blank=True, editable=False, measurement=brivo.utils.measures.BeerGravity, null=True, verbose_name='Original Gravity'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='preboil_gravity',
+            field=brivo.brewery.fields.BeerGravityField(blank=True, editable=False, measurement=brivo.utils.measures.BeerGravity, null=True, verbose_name='Pre-boil Gravity'),
+        ),
+    ]
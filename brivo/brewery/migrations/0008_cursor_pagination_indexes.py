@@ -0,0 +1,21 @@
+# Generated by Django 3.0.12 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brewery', '0007_recipe_metrics'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='batch',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='batch_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='recipe_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.0.12 on 2026-10-18 09:01
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def renumber_and_count_batches(apps, schema_editor):
+    """Give duplicated batch numbers the next free number and fill the
+    per user batch counters."""
+    Batch = apps.get_model("brewery", "Batch")
+    UserBrewery = apps.get_model("users", "UserBrewery")
+    user_ids = Batch.objects.values_list("user_id", flat=True).distinct()
+    for user_id in user_ids:
+        batches = Batch.objects.filter(user_id=user_id)
+        last = batches.aggregate(Max("batch_number"))["batch_number__max"] or 0
+        seen = set()
+        for batch in batches.exclude(batch_number=None).order_by("created_at", "pk"):
+            if batch.batch_number in seen:
+                last += 1
+                batch.batch_number = last
+                batch.save(update_fields=["batch_number"])
+            seen.add(batch.batch_number)
+        UserBrewery.objects.filter(user_id=user_id).update(last_batch_number=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brewery', '0008_cursor_pagination_indexes'),
+        ('users', '0002_userbrewery_last_batch_number'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_and_count_batches, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='batch',
+            constraint=models.UniqueConstraint(fields=('user', 'batch_number'), name='unique_user_batch_number'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.0.12 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+def delete_user_batch_checks(apps, schema_editor):
+    """Per-user schedules are replaced by one sweep (see tasks.py)."""
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(
+        task="brivo.brewery.tasks.check_fermenting_batches"
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brewery', '0009_unique_batch_number'),
+        ('django_celery_beat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='batch',
+            index=models.Index(fields=['primary_fermentation_start_day', 'stage'], name='batch_fermentation_start_idx'),
+        ),
+        migrations.RunPython(delete_user_batch_checks, migrations.RunPython.noop),
+    ]
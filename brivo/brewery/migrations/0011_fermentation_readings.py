@@ -0,0 +1,22 @@
+# Generated by Django 3.0.12 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brewery', '0010_fermentation_reminders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fermentationcheck',
+            name='sample_time',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Sample Time'),
+        ),
+        migrations.AddConstraint(
+            model_name='fermentationcheck',
+            constraint=models.UniqueConstraint(fields=('batch', 'sample_time'), name='unique_batch_sample_time'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.0.12 on 2026-10-18 10:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brewery', '0011_fermentation_readings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadingChunk',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('RAW', 'Raw'), ('HOUR', 'Hour'), ('DAY', 'Day')], max_length=10, verbose_name='Resolution')),
+                ('start', models.DateTimeField(verbose_name='Start')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Count')),
+                ('data', models.BinaryField(default=bytes, verbose_name='Data')),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reading_chunks', to='brewery.Batch', verbose_name='Batch')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='readingchunk',
+            constraint=models.UniqueConstraint(fields=('batch', 'resolution', 'start'), name='unique_reading_chunk'),
+        ),
+    ]
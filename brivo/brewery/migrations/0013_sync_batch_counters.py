@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import Max, OuterRef, Subquery
+
+
+def sync_batch_counters(apps, schema_editor):
+    """Move the batch counters above numbers which were edited by hand."""
+    Batch = apps.get_model("brewery", "Batch")
+    UserBrewery = apps.get_model("users", "UserBrewery")
+    highest = (
+        Batch.objects.filter(user_id=OuterRef("user_id"))
+        .values("user_id")
+        .annotate(highest=Max("batch_number"))
+        .values("highest")
+    )
+    for brewery in UserBrewery.objects.annotate(highest=Subquery(highest)):
+        if brewery.highest is not None and brewery.highest > brewery.last_batch_number:
+            brewery.last_batch_number = brewery.highest
+            brewery.save(update_fields=["last_batch_number"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brewery', '0012_reading_chunks'),
+        ('users', '0002_userbrewery_last_batch_number'),
+    ]
+
+    operations = [
+        migrations.RunPython(sync_batch_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,132 @@
+import datetime
+
+import numpy as np
+from django.db import migrations
+
+# Frozen copy of the chunk format of `brivo.brewery.timeseries`, so
+# later changes of the module do not change this migration.
+VALUES = ("gravity", "beer_temperature", "ambient_temperature")
+WINDOWS = {"RAW": 24 * 3600, "HOUR": 7 * 24 * 3600, "DAY": 364 * 24 * 3600}
+BUCKETS = {"HOUR": 3600, "DAY": 24 * 3600}
+ROLLUP_FIELDS = (("count", "<u4"), ("sum", "<f8"), ("min", "<f4"), ("max", "<f4"))
+
+
+def _fields(resolution):
+    if resolution == "RAW":
+        return [(name, "<f4") for name in VALUES]
+    return [
+        (f"{name}_{field}", dtype) for name in VALUES for field, dtype in ROLLUP_FIELDS
+    ]
+
+
+PACKED = {
+    resolution: np.dtype([("time", "<u4")] + _fields(resolution))
+    for resolution in WINDOWS
+}
+RECORDS = {
+    resolution: np.dtype(
+        [("time", "<i8")] + [(name, "<f8") for name, _ in _fields(resolution)]
+    )
+    for resolution in WINDOWS
+}
+
+
+def _datetime(timestamp):
+    return datetime.datetime.fromtimestamp(int(timestamp), tz=datetime.timezone.utc)
+
+
+def _unpack(data, start, resolution):
+    records = np.frombuffer(data, dtype=PACKED[resolution]).astype(RECORDS[resolution])
+    records["time"] += int(start.timestamp())
+    return records
+
+
+def _pack(records, start, resolution):
+    records = records.copy()
+    records["time"] -= start
+    return records.astype(PACKED[resolution]).tobytes()
+
+
+def _rollup(raw, resolution):
+    times, index = np.unique(
+        raw["time"] - raw["time"] % BUCKETS[resolution], return_inverse=True
+    )
+    records = np.zeros(len(times), RECORDS[resolution])
+    records["time"] = times
+    for name in VALUES:
+        known = ~np.isnan(raw[name])
+        records[f"{name}_count"] = np.bincount(index, weights=known, minlength=len(times))
+        records[f"{name}_sum"] = np.bincount(
+            index, weights=np.where(known, raw[name], 0.0), minlength=len(times)
+        )
+        for field, ufunc in (("min", np.fmin), ("max", np.fmax)):
+            column = np.full(len(times), np.nan)
+            ufunc.at(column, index, raw[name])
+            records[f"{name}_{field}"] = column
+    return records
+
+
+def _chunks(ReadingChunk, batch_id, resolution, records):
+    window = WINDOWS[resolution]
+    starts = records["time"] - records["time"] % window
+    for start in np.unique(starts).tolist():
+        chunk_records = records[starts == start]
+        yield ReadingChunk(
+            batch_id=batch_id,
+            resolution=resolution,
+            start=_datetime(start),
+            count=len(chunk_records),
+            data=_pack(chunk_records, start, resolution),
+        )
+
+
+def move_readings(apps, schema_editor):
+    """Move readings stored as fermentation checks to the reading chunks.
+
+    Readings of a batch are merged with its stored readings (those win
+    at the same time), then all chunks of the batch are written again.
+    """
+    FermentationCheck = apps.get_model("brewery", "FermentationCheck")
+    ReadingChunk = apps.get_model("brewery", "ReadingChunk")
+    checks = FermentationCheck.objects.filter(sample_time__isnull=False)
+    batch_ids = checks.values_list("batch_id", flat=True).distinct()
+    for batch_id in list(batch_ids):
+        batch_checks = list(checks.filter(batch_id=batch_id))
+        new = np.zeros(len(batch_checks), RECORDS["RAW"])
+        new["time"] = [int(check.sample_time.timestamp()) for check in batch_checks]
+        for name in VALUES:
+            new[name] = [
+                getattr(check, name).standard
+                if getattr(check, name) is not None
+                else np.nan
+                for check in batch_checks
+            ]
+        chunks = ReadingChunk.objects.filter(batch_id=batch_id, resolution="RAW")
+        stored = [_unpack(chunk.data, chunk.start, "RAW") for chunk in chunks]
+        raw = np.concatenate(stored + [new])
+        # first record of a time, stored readings come first
+        raw = raw[np.unique(raw["time"], return_index=True)[1]]
+        ReadingChunk.objects.filter(batch_id=batch_id).delete()
+        ReadingChunk.objects.bulk_create(
+            [
+                chunk
+                for resolution, records in [
+                    ("RAW", raw),
+                    ("HOUR", _rollup(raw, "HOUR")),
+                    ("DAY", _rollup(raw, "DAY")),
+                ]
+                for chunk in _chunks(ReadingChunk, batch_id, resolution, records)
+            ]
+        )
+    checks.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brewery', '0013_sync_batch_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_readings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.0.12 on 2026-10-18 10:34
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brewery', '0014_move_readings_to_chunks'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='fermentationcheck',
+            name='unique_batch_sample_time',
+        ),
+        migrations.RemoveField(
+            model_name='fermentationcheck',
+            name='sample_time',
+        ),
+    ]
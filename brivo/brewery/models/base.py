@@ -1,4 +1,7 @@
-from django.db import models
+import re
+
+from django.db import connection, models
+from django.db.models import Q
 from django.db.models.base import ModelBase
 from django.utils.encoding import smart_str
 from django.utils.translation import gettext_lazy as _
@@ -39,40 +42,126 @@ def slugify(text, entities=True, decimal=True, hexadecimal=True, max_length=0,
         word_boundary, separator, save_order, stopwords))
 
 
+def _slug_regex(slug, max_length, separator):
+    """Match the slug and its numbered variants (see `_free_slug`) only."""
+    # numbered variants of long slugs are cut to fit up to 10 digits
+    bases = sorted({slug[:max(max_length - len(separator) - digits, 0)]
+                    for digits in range(1, 11)})
+    return r"^({}|({}){}[0-9]+)$".format(
+        re.escape(slug), "|".join(re.escape(base) for base in bases),
+        re.escape(separator))
+
+
+def _taken_slugs(queryset, slug_field, regexes):
+    """Fetch the slugs matching any of the regexes in one query."""
+    query = Q()
+    for regex in regexes:
+        query |= Q(**{"{}__regex".format(slug_field): regex})
+    return set(queryset.filter(query).values_list(slug_field, flat=True))
+
+
+def _free_slug(slug, taken, start_no, max_length, separator):
+    """Return the first free slug and the counter to continue from."""
+    new_slug = slug
+    counter = start_no
+    while new_slug in taken:
+        suffix = "{}{}".format(separator, counter)
+        new_slug = "{}{}".format(slug[:max_length - len(suffix)], suffix)
+        counter += 1
+    return new_slug, counter
+
+
+def _slug_queryset(model, filter_dict, slug_field, max_length):
+    queryset = model.objects.all()
+    if filter_dict:
+        queryset = queryset.filter(**filter_dict)
+    # The slug max_length cannot be bigger than the max length of the field
+    slug_field_max_length = model._meta.get_field(slug_field).max_length
+    if not max_length or max_length > slug_field_max_length:
+        max_length = slug_field_max_length
+    return queryset, max_length
+
+
 def uuslug(s, instance, entities=True, decimal=True, hexadecimal=True,
            slug_field='slug', filter_dict=None, start_no=1, max_length=0,
            word_boundary=False, separator='-', save_order=False, stopwords=()):
-    """ This method tries a little harder than django's django.template.defaultfilters.slugify. """
+    """ This method tries a little harder than django's django.template.defaultfilters.slugify.
+
+    All colliding slugs are fetched with a single query and the next
+    free suffix is picked in memory.
+    """
 
     if isinstance(instance, ModelBase):
         raise Exception("You must pass an instance to uuslug, not a model.")
 
-    queryset = instance.__class__.objects.all()
-    if filter_dict:
-        queryset = queryset.filter(**filter_dict)
+    queryset, max_length = _slug_queryset(
+        instance.__class__, filter_dict, slug_field, max_length)
     if instance.pk:
         queryset = queryset.exclude(pk=instance.pk)
 
-    # The slug max_length cannot be bigger than the max length of the field
-    slug_field_max_length = instance._meta.get_field(slug_field).max_length
-    if not max_length or max_length > slug_field_max_length:
-        max_length = slug_field_max_length
-
     slug = slugify(s, entities=entities, decimal=decimal, hexadecimal=hexadecimal,
                    max_length=max_length, word_boundary=word_boundary, separator=separator,
                    save_order=save_order, stopwords=stopwords)
 
-    new_slug = slug
-    counter = start_no
-    while queryset.filter(**{slug_field: new_slug}).exists():
-        if len(slug) + len(separator) + len(str(counter)) > max_length:
-            slug = slug[:max_length - len(slug) - len(separator) - len(str(counter))]
-        new_slug = "{}{}{}".format(slug, separator, counter)
-        counter += 1
-
-    return new_slug
+    taken = _taken_slugs(queryset, slug_field, [_slug_regex(slug, max_length, separator)])
+    return _free_slug(slug, taken, start_no, max_length, separator)[0]
+
+
+def bulk_uuslug(instances, source_field='name', slug_field='slug', filter_dict=None,
+                start_no=1, max_length=0, separator='-', chunk_size=200, **kwargs):
+    """Assign unique slugs to unsaved instances of one model, e.g. before `bulk_create`.
+
+    Instances which already have a slug are left alone. Slugs are unique
+    against the database and within the list. Colliding slugs are fetched
+    with one query per `chunk_size` distinct slugs.
+    """
+    instances = [i for i in instances if not getattr(i, slug_field)]
+    if not instances:
+        return instances
+    queryset, max_length = _slug_queryset(
+        instances[0].__class__, filter_dict, slug_field, max_length)
+
+    slugs = [
+        slugify(getattr(instance, source_field), max_length=max_length,
+                separator=separator, **kwargs)
+        for instance in instances
+    ]
+    regexes = sorted({_slug_regex(slug, max_length, separator) for slug in slugs})
+    taken = set()
+    for i in range(0, len(regexes), chunk_size):
+        taken |= _taken_slugs(queryset, slug_field, regexes[i:i + chunk_size])
+
+    # taken slugs only grow, so each slug continues from its last counter
+    counters = {}
+    for instance, slug in zip(instances, slugs):
+        new_slug, counters[slug] = _free_slug(
+            slug, taken, counters.get(slug, start_no), max_length, separator)
+        taken.add(new_slug)
+        setattr(instance, slug_field, new_slug)
+    return instances
 ###########################################################################################
 
+
+def bulk_create_with_slugs(model, objs, need_pks=False, batch_size=None):
+    """Create new instances with unique slugs in as few queries as possible.
+
+    Django can't bulk create multi-table inherited models and only some
+    databases return primary keys from bulk inserts. Those are saved one
+    by one, with slugs already set. Bulk created instances send no signals.
+    """
+    objs = list(objs)
+    if not objs:
+        return objs
+    bulk_uuslug(objs)
+    if model._meta.parents or (
+        need_pks and not connection.features.can_return_rows_from_bulk_insert
+    ):
+        for obj in objs:
+            obj.save()
+        return objs
+    return model.objects.bulk_create(objs, batch_size=batch_size)
+
+
 class BaseModel(ClusterableModel):
     """Base model for all beer related models"""
 
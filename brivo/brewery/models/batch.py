@@ -1,6 +1,7 @@
 import datetime
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Max
 from django.utils.translation import gettext_lazy as _
 
 
@@ -8,11 +9,20 @@ from brivo.brewery.models import BaseModel, VOLUME_UNITS
 from brivo.utils.measures import BeerGravity
 from brivo.brewery.fields import TemperatureField, BeerGravityField, VolumeField
 from brivo.utils import functions
+from brivo.users.models import UserBrewery
 
 from modelcluster.fields import ParentalKey
 
 
-__all__ = ("Batch", "FermentationCheck", "BATCH_STAGE_ORDER", "BATCH_STAGES", "SUGAR_TYPE")
+__all__ = (
+    "Batch",
+    "FermentationCheck",
+    "ReadingChunk",
+    "BATCH_STAGE_ORDER",
+    "BATCH_STAGES",
+    "READING_RESOLUTIONS",
+    "SUGAR_TYPE",
+)
 
 
 BATCH_STAGES = (
@@ -33,6 +43,7 @@ SUGAR_TYPE = (
     ("TABLE_SUGAR", _("Table Sugar")),
     ("DRY_EXTRACT", _("Dry Extract"))
 )
+READING_RESOLUTIONS = (("RAW", _("Raw")), ("HOUR", _("Hour")), ("DAY", _("Day")))
 
 class FermentationCheck(BaseModel):
     batch = ParentalKey(
@@ -158,8 +169,101 @@ class Batch(BaseModel):
 
     hidden_fields = ["stage"]
 
+    class Meta(BaseModel.Meta):
+        indexes = [
+            # API cursor pagination (see api.pagination)
+            models.Index(
+                fields=["user", "updated_at", "id"], name="batch_user_updated_idx"
+            ),
+            # fermentation reminders (see tasks.get_fermentation_reminders)
+            models.Index(
+                fields=["primary_fermentation_start_day", "stage"],
+                name="batch_fermentation_start_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "batch_number"], name="unique_user_batch_number"
+            ),
+        ]
+
+    @classmethod
+    def allocate_batch_number(cls, user, number=None):
+        """Return a batch number for a new batch of the user.
+
+        `number` is used if the user does not have it yet, otherwise the
+        next number of the counter on `UserBrewery`. The counter row stays
+        locked until the surrounding transaction ends, so concurrent
+        creates get distinct numbers.
+        """
+        return cls.allocate_batch_numbers(user, [number])[0]
+
+    @classmethod
+    def allocate_batch_numbers(cls, user, numbers):
+        """Return batch numbers for several new batches of the user at once.
+
+        See `allocate_batch_number`, `None` asks for the next number.
+        """
+        with transaction.atomic():
+            brewery = UserBrewery.objects.select_for_update().filter(user=user).first()
+            if brewery is None:
+                brewery = UserBrewery.objects.create(
+                    user=user, last_batch_number=cls._max_batch_number(user)
+                )
+            requested = {number for number in numbers if number is not None}
+            taken = set()
+            if requested:
+                taken = set(
+                    cls.objects.filter(
+                        user=user, batch_number__in=requested
+                    ).values_list("batch_number", flat=True)
+                )
+            # the counter is above all numbers of the user (see `save`)
+            last = brewery.last_batch_number
+            allocated = []
+            for number in numbers:
+                if number is None or number in taken:
+                    last += 1
+                    number = last
+                last = max(last, number)
+                taken.add(number)
+                allocated.append(number)
+            if last != brewery.last_batch_number:
+                UserBrewery.objects.filter(pk=brewery.pk).update(
+                    last_batch_number=F("last_batch_number")
+                    + (last - brewery.last_batch_number)
+                )
+            return allocated
+
+    @classmethod
+    def _max_batch_number(cls, user):
+        result = cls.objects.filter(user=user).aggregate(Max("batch_number"))
+        return result["batch_number__max"] or 0
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # `save` moves the counter only if the number changed
+        instance._saved_batch_number = instance.__dict__.get("batch_number")
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        number = self.batch_number
+        if (
+            number is not None
+            and number != getattr(self, "_saved_batch_number", None)
+            and (update_fields is None or "batch_number" in update_fields)
+        ):
+            # numbers set by hand move the counter up
+            UserBrewery.objects.filter(
+                user_id=self.user_id, last_batch_number__lt=number
+            ).update(last_batch_number=number)
+        self._saved_batch_number = number
+
     def get_hex_color(self):
-        return self.recipe.get_hex_color()
+        return self.recipe.get_stored_metrics().hex_color
 
     def get_size_with_trub_loss(self):
         pass
@@ -277,4 +381,31 @@ class Batch(BaseModel):
             return ndays
         else:
             return 0
-        
\ No newline at end of file
+        
+
+class ReadingChunk(models.Model):
+    """Fermentation readings of a batch in a time window, or their rollups.
+
+    Values are packed in arrays, see `brivo.brewery.timeseries`.
+    """
+
+    batch = models.ForeignKey(
+        "brewery.Batch",
+        verbose_name=_("Batch"),
+        on_delete=models.CASCADE,
+        related_name="reading_chunks",
+    )
+    resolution = models.CharField(
+        _("Resolution"), max_length=10, choices=READING_RESOLUTIONS
+    )
+    start = models.DateTimeField(_("Start"))
+    count = models.PositiveIntegerField(_("Count"), default=0)
+    data = models.BinaryField(_("Data"), default=bytes)
+
+    class Meta:
+        app_label = "brewery"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["batch", "resolution", "start"], name="unique_reading_chunk"
+            ),
+        ]
@@ -1,18 +1,38 @@
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
 from brivo.brewery.models import BaseModel, VOLUME_UNITS
 from brivo.utils import functions
-from brivo.utils.measures import BeerColor, BeerGravity
-from brivo.brewery.fields import VolumeField
-
+from brivo.utils.measures import (
+    BeerColor,
+    BeerGravity,
+    make_measure,
+    to_standard_function,
+)
+from brivo.brewery.fields import BeerColorField, BeerGravityField, VolumeField
+
+import numpy as np
 from modelcluster.fields import ParentalKey
 from measurement.measures import Volume, Weight
 
+from brivo.utils import vectorized
+
 
-__all__ = ("Recipe",)
+__all__ = (
+    "Recipe",
+    "RecipeCalculator",
+    "RecipeMetrics",
+    "defer_metrics_update",
+    "schedule_metrics_update",
+    "update_recipes_metrics",
+)
 
 
 RECIPE_TYPE = [
@@ -76,6 +96,138 @@ class Recipe(BaseModel):
     note = models.TextField(_("Note"), max_length=1000, blank=True)
     is_public = models.BooleanField(_("Public"), default=True)
 
+    # Calculated metrics, stored for list views (see `update_metrics`)
+    og = BeerGravityField(
+        verbose_name=_("Original Gravity"), null=True, blank=True, editable=False
+    )
+    fg = BeerGravityField(
+        verbose_name=_("Final Gravity"), null=True, blank=True, editable=False
+    )
+    preboil_gravity = BeerGravityField(
+        verbose_name=_("Pre-boil Gravity"), null=True, blank=True, editable=False
+    )
+    abv = models.FloatField(_("ABV"), null=True, blank=True, editable=False)
+    ibu = models.FloatField(_("IBU"), null=True, blank=True, editable=False)
+    bitterness_ratio = models.FloatField(
+        _("Bitterness Ratio"), null=True, blank=True, editable=False
+    )
+    color = BeerColorField(
+        verbose_name=_("Color"), null=True, blank=True, editable=False
+    )
+    boil_volume = VolumeField(
+        verbose_name=_("Boil Volume"),
+        unit_choices=VOLUME_UNITS,
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    METRICS_FIELDS = [
+        "og",
+        "fg",
+        "preboil_gravity",
+        "abv",
+        "ibu",
+        "bitterness_ratio",
+        "color",
+        "boil_volume",
+    ]
+
+    class Meta(BaseModel.Meta):
+        indexes = [
+            # API cursor pagination (see api.pagination)
+            models.Index(
+                fields=["user", "updated_at", "id"], name="recipe_user_updated_idx"
+            ),
+        ]
+
+    def get_metrics(self):
+        """Return all calculated metrics, computing them once per instance."""
+        if getattr(self, "_metrics", None) is None:
+            self._metrics = RecipeCalculator(self).calculate()
+        return self._metrics
+
+    def clear_metrics(self):
+        self._metrics = None
+        self._stored_metrics = None
+
+    def update_metrics(self, commit=True, touch=False):
+        """Recalculate the stored metric columns.
+
+        The columns are written with a queryset update, so `updated_at`
+        is not touched (unless `touch`, for changed ingredients) and no
+        save signals are sent.
+        """
+        self.clear_metrics()
+        try:
+            metrics = self.get_metrics()
+        except ArithmeticError:
+            # e.g. zero expected beer volume
+            values = {field: None for field in self.METRICS_FIELDS}
+        else:
+            values = {
+                "og": metrics.gravity,
+                "fg": metrics.final_gravity,
+                "preboil_gravity": metrics.preboil_gravity,
+                "abv": metrics.abv,
+                "ibu": metrics.ibu,
+                "bitterness_ratio": metrics.bitterness_ratio,
+                "color": metrics.color,
+                "boil_volume": metrics.boil_volume,
+            }
+        if touch:
+            values["updated_at"] = timezone.now()
+        for field, value in values.items():
+            setattr(self, field, value)
+        if commit:
+            Recipe.objects.filter(pk=self.pk).update(**values)
+
+    def get_stored_metrics(self):
+        """Return metrics read from the stored columns.
+
+        Only the volumes, which need no ingredients, are calculated (once
+        per instance). Falls back to `get_metrics` if the columns were not
+        filled yet.
+        """
+        if self.og is None:
+            return self.get_metrics()
+        if getattr(self, "_stored_metrics", None) is None:
+            self._stored_metrics = self._read_stored_metrics()
+        return self._stored_metrics
+
+    def _read_stored_metrics(self):
+        volumes = RecipeCalculator(self).get_volumes()
+        try:
+            max_attenuation = 1 - self.fg.plato / self.og.plato
+        except ZeroDivisionError:
+            max_attenuation = None
+        return RecipeMetrics(
+            initial_volume=Volume(l=volumes["initial_volume"]),
+            boil_volume=self.boil_volume,
+            primary_volume=Volume(l=volumes["primary_volume"]),
+            secondary_volume=Volume(l=volumes["secondary_volume"]),
+            grain_sugars=None,
+            other_sugars=None,
+            preboil_gravity=self.preboil_gravity,
+            gravity=self.og,
+            final_gravity=self.fg,
+            max_attenuation=max_attenuation,
+            color=self.color,
+            hex_color=functions.get_hex_color_from_srm(self.color.srm),
+            abv=self.abv,
+            ibu=self.ibu,
+            bitterness_ratio=self.bitterness_ratio,
+        )
+
+    def save(self, *args, **kwargs):
+        self.clear_metrics()
+        return super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        # Cascaded ingredient deletes must not recalculate a removed recipe
+        with defer_metrics_update():
+            return super().delete(*args, **kwargs)
+
     def get_boil_loss_volume(self):
         return self.expected_beer_volume * (float(self.boil_loss) / 100.0)
 
@@ -86,137 +238,59 @@ class Recipe(BaseModel):
         return self.expected_beer_volume * (float(self.dry_hopping_loss) / 100.0)
 
     def get_initial_volume(self):
-        boil_loss = self.get_boil_loss_volume()
-        trub_loss = self.get_trub_loss_volume()
-        dry_hopping_loss = self.get_dry_hopping_loss_volume()
-        volume = self.expected_beer_volume + boil_loss + trub_loss + dry_hopping_loss
-        return volume
+        return self.get_metrics().initial_volume
 
     def get_boil_volume(self):
-        initial_volume = self.get_initial_volume()
-        volume = initial_volume + (
-            initial_volume * (float(self.evaporation_rate) / 100.0)
-        )
-        return volume
+        return self.get_metrics().boil_volume
 
     def get_preboil_gravity(self):
-        eff = float(self.mash_efficiency)
-        grain_sugars = self.get_grain_sugars().kg * eff
-        other_sugars = self.get_other_sugars().kg * 100.0
-        grain_gravity = grain_sugars / (
-            self.get_boil_volume().l - grain_sugars / 145.0 + grain_sugars / 100.0
-        )
-        other_gravity = other_sugars / (
-            self.get_boil_volume().l - other_sugars / 145.0 + other_sugars / 100.0
-        )
-        # print(f"{self.name} [{self.get_boil_volume().l}] - Grain gravity: {grain_gravity}, Other gravity: {other_gravity}, {eff}")
-        return BeerGravity(plato=(grain_gravity + other_gravity))
+        return self.get_metrics().preboil_gravity
 
     def get_primary_volume(self):
-        volume = self.expected_beer_volume.l
-        trub_loss = volume * (float(self.trub_loss) / 100.0)
-        dry_hopping_loss = volume * (float(self.dry_hopping_loss) / 100.0)
-        volume = volume + trub_loss + dry_hopping_loss
-        return Volume(l=volume)
+        return self.get_metrics().primary_volume
 
     def get_secondary_volume(self):
-        volume = self.expected_beer_volume.l
-        dry_hopping_loss = volume * (float(self.dry_hopping_loss) / 100.0)
-        volume = volume + dry_hopping_loss
-        return Volume(l=volume)
+        return self.get_metrics().secondary_volume
 
     def get_color(self):
-        added_colors = []
-        for fermentable in self.fermentables.all():
-            if fermentable.color.srm > 0 and fermentable.amount.kg > 0:
-                added_colors.append(
-                    functions.calculate_mcu(
-                        color=fermentable.color.srm,
-                        weigth=fermentable.amount.kg,
-                        volume=self.expected_beer_volume.l,
-                    )
-                )
-        return BeerColor(srm=functions.morey_equation(sum(added_colors)))
+        return self.get_metrics().color
 
     def get_hex_color(self):
-        return functions.get_hex_color_from_srm(self.get_color().srm)
+        return self.get_metrics().hex_color
 
     def get_volume_unit(self):
-        if self.user.profile.general_units.lower() == "metric":
+        if functions.get_unit_preferences(self.user).general_units.lower() == "metric":
             return "l"
         else:
             return "us_g"
 
     def get_max_attenuation(self):
-        min_val = 101
-        for yeast in self.yeasts.all():
-            if yeast.attenuation < min_val:
-                min_val = yeast.attenuation
-        if min_val > 100:
-            min_val = 75.0
-        return float(min_val) / 100
+        return self.get_metrics().max_attenuation
 
     def get_final_gravity(self):
-        return BeerGravity(plato=self.get_gravity().plato * (1 - self.get_max_attenuation()))
+        return self.get_metrics().final_gravity
 
     def get_abv(self):
-        return functions.get_abv(self.get_gravity().sg, self.get_final_gravity().sg)
+        return self.get_metrics().abv
 
     def get_fermentable_sugar(self, fermentable):
         sugar = fermentable.amount.kg * float(fermentable.extraction) / 100.0
         return Weight(kg=sugar)
 
     def get_grain_sugars(self):
-        sugars = Weight(kg=0.0)
-        for fermentable in self.fermentables.all():
-            if fermentable.type != "GRAIN":
-                continue
-            sugars += self.get_fermentable_sugar(fermentable)
-        return Weight(kg=sugars.kg)
+        return self.get_metrics().grain_sugars
 
     def get_other_sugars(self):
-        sugars = Weight(kg=0.0)
-        for fermentable in self.fermentables.all():
-            if fermentable.type == "GRAIN":
-                continue
-            sugars += self.get_fermentable_sugar(fermentable)
-        return Weight(kg=sugars.kg)
+        return self.get_metrics().other_sugars
 
     def get_gravity(self):
-        eff = float(self.mash_efficiency)
-        grain_sugars = self.get_grain_sugars().kg * eff
-        other_sugars = self.get_other_sugars().kg * 100.0
-        grain_gravity = grain_sugars / (
-            self.get_initial_volume().l - grain_sugars / 145.0 + grain_sugars / 100.0
-        )
-        other_gravity = other_sugars / (
-            self.get_initial_volume().l - other_sugars / 145.0 + other_sugars / 100.0
-        )
-        # print(f"{self.name} [{self.get_initial_volume().l}] - Grain gravity: {grain_gravity}, Other gravity: {other_gravity}, {eff}")
-        return BeerGravity(plato=(grain_gravity + other_gravity))
+        return self.get_metrics().gravity
 
     def get_ibu(self):
-        added_ibus = []
-        for hop in self.hops.all():
-            if hop.use in ["BOIL", "AROMA", "FIRST WORT", "WHIRLPOOL"]:
-                if hop.amount.g > 0 and hop.time > 0 and hop.alpha_acids > 0:
-                    added_ibus.append(
-                        functions.calculate_ibu_tinseth(
-                            og=self.get_gravity().sg,
-                            time=float(hop.time),
-                            type="PELLETS",
-                            alpha=float(hop.alpha_acids),
-                            weight=hop.amount.g,
-                            volume=self.get_initial_volume().l,
-                        )
-                    )
-        return sum(added_ibus)
+        return self.get_metrics().ibu
 
     def get_bitterness_ratio(self):
-        try:
-            return self.get_ibu() / ((float(self.get_gravity().sg) - 1) * 1e3)
-        except ZeroDivisionError:
-            return None
+        return self.get_metrics().bitterness_ratio
 
     def get_mash_size(self):
         pass
@@ -226,3 +300,314 @@ class Recipe(BaseModel):
 
     def __str__(self):
         return f"{self.pk}. {self.name}"
+
+
+RecipeMetrics = namedtuple(
+    "RecipeMetrics",
+    [
+        "initial_volume",
+        "boil_volume",
+        "primary_volume",
+        "secondary_volume",
+        "grain_sugars",
+        "other_sugars",
+        "preboil_gravity",
+        "gravity",
+        "final_gravity",
+        "max_attenuation",
+        "color",
+        "hex_color",
+        "abv",
+        "ibu",
+        "bitterness_ratio",
+    ],
+)
+
+
+class RecipeCalculator:
+    """Calculate all recipe metrics in a single pass.
+
+    Fermentables, hops and yeasts are read once (from the prefetch cache
+    if available) when `calculate` is called. They can also be given
+    explicitly, e.g. for unsaved recipes. The formulas work on plain
+    numbers (`calculate_values`), so values which are not model
+    instances can be calculated as well.
+    """
+
+    IBU_HOP_USES = ["BOIL", "AROMA", "FIRST WORT", "WHIRLPOOL"]
+
+    def __init__(self, recipe, fermentables=None, hops=None, yeasts=None):
+        self.recipe = recipe
+        self.fermentables = fermentables
+        self.hops = hops
+        self.yeasts = yeasts
+
+    def load_ingredients(self):
+        if self.fermentables is None:
+            self.fermentables = list(self.recipe.fermentables.all())
+        if self.hops is None:
+            self.hops = list(self.recipe.hops.all())
+        if self.yeasts is None:
+            self.yeasts = list(self.recipe.yeasts.all())
+
+    # batch values in percent, besides `volume` in liters
+    PERCENT_VALUES = [
+        "boil_loss",
+        "trub_loss",
+        "dry_hopping_loss",
+        "evaporation_rate",
+        "mash_efficiency",
+    ]
+
+    @staticmethod
+    def _volumes(volume, boil_loss, trub_loss, dry_hopping_loss, evaporation_rate):
+        """Return volumes in liters, of numbers or arrays of recipes."""
+        boil_loss = volume * (boil_loss / 100.0)
+        trub_loss = volume * (trub_loss / 100.0)
+        dry_hopping_loss = volume * (dry_hopping_loss / 100.0)
+        initial_volume = volume + boil_loss + trub_loss + dry_hopping_loss
+        boil_volume = initial_volume + (initial_volume * (evaporation_rate / 100.0))
+        return {
+            "initial_volume": initial_volume,
+            "boil_volume": boil_volume,
+            "primary_volume": volume + trub_loss + dry_hopping_loss,
+            "secondary_volume": volume + dry_hopping_loss,
+        }
+
+    def get_volumes(self):
+        recipe = self.recipe
+        return self._volumes(
+            recipe.expected_beer_volume.l,
+            float(recipe.boil_loss),
+            float(recipe.trub_loss),
+            float(recipe.dry_hopping_loss),
+            float(recipe.evaporation_rate),
+        )
+
+    def get_values(self):
+        """Return the plain values of the recipe, see `calculate_values`."""
+        self.load_ingredients()
+        recipe = self.recipe
+        values = {"volume": recipe.expected_beer_volume.l}
+        for name in self.PERCENT_VALUES:
+            values[name] = float(getattr(recipe, name))
+        values["fermentables"] = [
+            (f.amount.kg, float(f.extraction), f.type == "GRAIN", f.color.srm)
+            for f in self.fermentables
+        ]
+        values["hops"] = [
+            (h.amount.g, float(h.alpha_acids), float(h.time), h.use)
+            for h in self.hops
+        ]
+        values["yeasts"] = [float(y.attenuation) for y in self.yeasts]
+        return values
+
+    def calculate(self):
+        return self.calculate_values([self.get_values()])[0]
+
+    @classmethod
+    def calculate_many(cls, calculators):
+        """Calculate metrics of many recipes in one vectorized pass.
+
+        Returns list of `RecipeMetrics` in the order of `calculators`.
+        """
+        return cls.calculate_values(
+            [calculator.get_values() for calculator in calculators]
+        )
+
+    @classmethod
+    @np.errstate(divide="raise", invalid="raise")
+    def calculate_values(cls, recipes):
+        """Calculate metrics of recipes given as plain numbers.
+
+        Every recipe is a dict of `volume` (liters), the values of
+        `PERCENT_VALUES` and the ingredients: `fermentables` as (kg,
+        extraction, is grain, SRM), `hops` as (grams, alpha acids, time,
+        use) and `yeasts` as attenuation. Ingredients of all recipes are
+        put in arrays and the formulas are applied once (see
+        `brivo.utils.vectorized`). Returns list of `RecipeMetrics` in the
+        order of `recipes`. Raises `FloatingPointError` (an
+        `ArithmeticError`, like the scalar formulas) if a metric of a
+        recipe can not be calculated, e.g. for zero expected beer volume.
+        """
+        count = len(recipes)
+        if not count:
+            return []
+
+        def column(name):
+            return np.array([float(r[name]) for r in recipes])
+
+        volume = column("volume")
+        volumes = cls._volumes(
+            volume,
+            column("boil_loss"),
+            column("trub_loss"),
+            column("dry_hopping_loss"),
+            column("evaporation_rate"),
+        )
+        initial_volume = volumes["initial_volume"]
+        boil_volume = volumes["boil_volume"]
+
+        def ingredients(kind, *columns):
+            """Recipe index and values of `columns` of all ingredients."""
+            items = [
+                (index, item)
+                for index, recipe in enumerate(recipes)
+                for item in recipe[kind]
+            ]
+            return [np.array([index for index, item in items], dtype=int)] + [
+                np.array([get(item) for index, item in items], dtype=float)
+                for get in columns
+            ]
+
+        def total(index, values):
+            return np.bincount(index, weights=values, minlength=count)
+
+        f_index, f_kg, f_extraction, f_grain, f_srm = ingredients(
+            "fermentables",
+            lambda f: f[0],
+            lambda f: f[1],
+            lambda f: f[2],
+            lambda f: f[3],
+        )
+        sugar = f_kg * f_extraction / 100.0
+        grain_sugars = total(f_index, sugar * f_grain)
+        other_sugars = total(f_index, sugar * (1 - f_grain))
+
+        def gravity(grain_sugars, other_sugars, volume):
+            return grain_sugars / (
+                volume - grain_sugars / 145.0 + grain_sugars / 100.0
+            ) + other_sugars / (volume - other_sugars / 145.0 + other_sugars / 100.0)
+
+        eff = column("mash_efficiency")
+        preboil_gravity = gravity(grain_sugars * eff, other_sugars * 100.0, boil_volume)
+        plato = gravity(grain_sugars * eff, other_sugars * 100.0, initial_volume)
+
+        y_index, y_attenuation = ingredients("yeasts", float)
+        min_attenuation = np.full(count, 101.0)
+        np.minimum.at(min_attenuation, y_index, y_attenuation)
+        max_attenuation = np.where(min_attenuation > 100, 75.0, min_attenuation) / 100
+        final_plato = plato * (1 - max_attenuation)
+        og = vectorized.to_sg(plato)
+        fg = vectorized.to_sg(final_plato)
+
+        colored = (f_srm > 0) & (f_kg > 0)
+        mcu = total(
+            f_index[colored],
+            vectorized.calculate_mcu(f_srm[colored], f_kg[colored], volume[f_index[colored]]),
+        )
+        srm = vectorized.morey_equation(mcu)
+
+        h_index, h_boiled, h_g, h_time, h_alpha = ingredients(
+            "hops",
+            lambda h: h[3] in cls.IBU_HOP_USES,
+            lambda h: h[0],
+            lambda h: h[2],
+            lambda h: h[1],
+        )
+        bittering = (h_boiled > 0) & (h_g > 0) & (h_time > 0) & (h_alpha > 0)
+        h_index = h_index[bittering]
+        ibu = total(
+            h_index,
+            vectorized.calculate_ibu_tinseth(
+                og=og[h_index],
+                time=h_time[bittering],
+                type="PELLETS",
+                alpha=h_alpha[bittering],
+                weight=h_g[bittering],
+                volume=initial_volume[h_index],
+            ),
+        )
+        abv = vectorized.get_abv(og, fg)
+        points = (og - 1) * 1e3
+
+        return [
+            RecipeMetrics(*values)
+            for values in zip(
+                _measures(Volume, "l", initial_volume),
+                _measures(Volume, "l", boil_volume),
+                _measures(Volume, "l", volumes["primary_volume"]),
+                _measures(Volume, "l", volumes["secondary_volume"]),
+                _measures(Weight, "kg", grain_sugars),
+                _measures(Weight, "kg", other_sugars),
+                _measures(BeerGravity, "plato", preboil_gravity),
+                _measures(BeerGravity, "plato", plato),
+                _measures(BeerGravity, "plato", final_plato),
+                max_attenuation.tolist(),
+                _measures(BeerColor, "srm", srm),
+                [functions.get_hex_color_from_srm(value) for value in srm.tolist()],
+                abv.tolist(),
+                ibu.tolist(),
+                [
+                    value / point if point else None
+                    for value, point in zip(ibu.tolist(), points.tolist())
+                ],
+            )
+        ]
+
+
+def _measures(mclass, unit, values):
+    """Return measures of the values (array) given in `unit`."""
+    unit = mclass(**{unit: 0})._default_unit
+    to_standard = to_standard_function(mclass, unit)
+    return [make_measure(mclass, unit, to_standard(value)) for value in values.tolist()]
+
+
+_metrics_state = threading.local()
+
+
+def update_recipes_metrics(recipes, touched=()):
+    """Update stored metrics of the given recipes or recipe ids.
+
+    Recipes are always read again with their ingredients, so stale
+    related caches of the given instances are not used. The given
+    instances get the new values as well. Recipes with ids in `touched`
+    get a new `updated_at`.
+    """
+    instances = {r.pk: r for r in recipes if isinstance(r, Recipe)}
+    ids = {getattr(r, "pk", r) for r in recipes}
+    fresh = Recipe.objects.filter(pk__in=ids).prefetch_related(
+        "fermentables", "hops", "yeasts"
+    )
+    for recipe in fresh:
+        recipe.update_metrics(touch=recipe.pk in touched)
+        instance = instances.get(recipe.pk)
+        if instance is not None:
+            instance.clear_metrics()
+            for field in Recipe.METRICS_FIELDS + ["updated_at"]:
+                setattr(instance, field, getattr(recipe, field))
+
+
+def schedule_metrics_update(recipe, touch=False):
+    """Update stored metrics now, or at the end of `defer_metrics_update`.
+
+    With `touch` (the ingredients changed) `updated_at` is set as well.
+    """
+    recipe_id = getattr(recipe, "pk", recipe)
+    pending = getattr(_metrics_state, "pending", None)
+    if pending is None:
+        update_recipes_metrics([recipe], {recipe_id} if touch else ())
+        return
+    if isinstance(recipe, Recipe):
+        pending[recipe_id] = recipe
+    else:
+        pending.setdefault(recipe_id, recipe)
+    if touch:
+        _metrics_state.touched.add(recipe_id)
+
+
+@contextmanager
+def defer_metrics_update():
+    """Update metrics of all recipes changed in the block once, at its end."""
+    if getattr(_metrics_state, "pending", None) is not None:
+        # nested, the outermost block does the update
+        yield
+        return
+    _metrics_state.pending = {}
+    _metrics_state.touched = set()
+    try:
+        yield
+    finally:
+        pending, _metrics_state.pending = _metrics_state.pending, None
+        touched, _metrics_state.touched = _metrics_state.touched, None
+    update_recipes_metrics(list(pending.values()), touched)
@@ -0,0 +1,149 @@
+"""
+Live preview of recipe metrics for the recipe form.
+
+The form is sent on every change. Metrics are calculated from plain
+numbers parsed from the payload (see `RecipeCalculator.calculate_values`),
+without model instances, serializers or queries: the style is checked in
+the catalog snapshot and the units of the user are cached (see
+`functions.get_user_units`). Parsed ingredient rows are cached per
+process, so a change parses only the edited row again.
+"""
+from functools import lru_cache
+
+from measurement.measures import Volume, Weight
+
+from brivo.brewery import catalog, models
+from brivo.brewery.api.serializers import get_measurement_parser
+from brivo.utils.measures import BeerColor, to_standard_function
+
+
+INGREDIENTS = ("fermentables", "hops", "yeasts")
+
+# standard values of one liter, kilogram and SRM
+_LITER = to_standard_function(Volume, "l")(1.0)
+_KILOGRAM = to_standard_function(Weight, "kg")(1.0)
+_SRM = to_standard_function(BeerColor, "srm")(1.0)
+
+
+def _number(value, minimum=0.0, maximum=None):
+    """Return the value as float, None if not a number in the range."""
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if number != number or number < minimum:
+        return None
+    if maximum is not None and number > maximum:
+        return None
+    return number
+
+
+def _parse_fermentable(row, units):
+    kg = get_measurement_parser(Weight).standard(row.get("amount"), units[0])
+    srm = get_measurement_parser(BeerColor).standard(row.get("color"), units[1])
+    extraction = _number(row.get("extraction"), maximum=100)
+    if kg is None or srm is None or extraction is None or not row.get("type"):
+        return None
+    return kg / _KILOGRAM, extraction, row["type"] == "GRAIN", srm / _SRM
+
+
+def _parse_hop(row, units):
+    grams = get_measurement_parser(Weight).standard(row.get("amount"), units[0])
+    alpha_acids = _number(row.get("alpha_acids"), maximum=100)
+    time = _number(row.get("time"))
+    if grams is None or alpha_acids is None or time is None or not row.get("use"):
+        return None
+    return grams, alpha_acids, time, row["use"]
+
+
+def _parse_yeast(row, units):
+    if get_measurement_parser(Weight).standard(row.get("amount"), units[0]) is None:
+        return None
+    attenuation = row.get("attenuation")
+    if attenuation in (None, ""):
+        return 75.0
+    return _number(attenuation, maximum=100)
+
+
+_PARSERS = {
+    "fermentables": _parse_fermentable,
+    "hops": _parse_hop,
+    "yeasts": _parse_yeast,
+}
+
+
+@lru_cache(maxsize=4096)
+def parse_row(kind, items, units):
+    """Return the values of an ingredient row used by the metrics.
+
+    `items` are the (field, value) pairs of the row, `units` the mass and
+    color units of numbers without a unit. Returns None for rows which
+    are not complete or not valid, those are left out like before.
+    """
+    row = dict(items)
+    if not row.get("name"):
+        return None
+    return _PARSERS[kind](row, units)
+
+
+def _rows(kind, data, units):
+    rows = data.get(kind) or {}
+    if isinstance(rows, dict):
+        rows = rows.values()
+    parsed = []
+    for row in rows:
+        if not isinstance(row, dict):
+            continue
+        try:
+            values = parse_row(kind, tuple(sorted(row.items())), units)
+        except TypeError:  # unhashable values
+            values = None
+        if values is not None:
+            parsed.append(values)
+    return parsed
+
+
+def _style_exists(pk):
+    snapshot = catalog.get_snapshot(models.Style)
+    if snapshot is None:
+        return models.Style.objects.filter(pk=pk).exists()
+    return pk in snapshot.by_pk
+
+
+def parse(data, user_units):
+    """Return the plain values of the recipe form payload.
+
+    Returns None if the recipe can not be calculated yet (no style or
+    type, or invalid batch info).
+    """
+    try:
+        style = int(data.get("style") or 0)
+    except (TypeError, ValueError):
+        return None
+    if not style or not data.get("type") or not _style_exists(style):
+        return None
+    volume = get_measurement_parser(Volume).standard(
+        data.get("expected_beer_volume"), user_units["volume_units"]
+    )
+    values = {"volume": volume / _LITER if volume is not None else None}
+    for name, maximum in [
+        ("boil_loss", 100),
+        ("trub_loss", 100),
+        ("dry_hopping_loss", 100),
+        ("evaporation_rate", 100),
+        ("mash_efficiency", None),
+    ]:
+        values[name] = _number(data.get(name), maximum=maximum)
+    if None in values.values() or not values["volume"]:
+        return None
+    units = (user_units["mass_units"], user_units["color_units"])
+    for kind in INGREDIENTS:
+        values[kind] = _rows(kind, data, units)
+    return values
+
+
+def calculate(values):
+    """Return `RecipeMetrics` of the values returned by `parse`."""
+    return models.RecipeCalculator.calculate_values([values])[0]
@@ -0,0 +1,102 @@
+"""
+PDF version of recipes, rendered by a Celery task and kept in storage.
+
+A PDF is stored under a path derived from everything it shows: the
+recipe (its `updated_at`), the ingredient rows, the style name, the units
+of the user and the language. Repeat downloads of an unchanged recipe are
+served from storage, any change gives a new path.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.loader import render_to_string
+
+from brivo.brewery import models
+from brivo.utils import functions
+
+
+PDF_PATH = "recipes/pdf/{pk}/{digest}.pdf"
+PDF_TASK_CACHE_KEY = "brewery:recipe-pdf:{}:task"
+PDF_TEMPLATE = "brewery/recipe/print.html"
+
+INGREDIENT_MODELS = (
+    models.IngredientFermentable,
+    models.IngredientHop,
+    models.IngredientYeast,
+    models.IngredientExtra,
+    models.MashStep,
+)
+
+
+def pdf_path(recipe, user, language):
+    """Return storage path of the PDF of the recipe, for the user."""
+    rows = [
+        list(model.objects.filter(recipe=recipe).order_by("pk").values_list())
+        for model in INGREDIENT_MODELS
+    ]
+    key = repr(
+        (
+            recipe.pk,
+            recipe.updated_at,
+            recipe.style.name,
+            rows,
+            tuple(functions.get_unit_preferences(user)),
+            language,
+        )
+    )
+    return PDF_PATH.format(pk=recipe.pk, digest=hashlib.md5(key.encode()).hexdigest())
+
+
+def claim_task(path, task_id):
+    """Return id of the task rendering the PDF, `task_id` if there is none.
+
+    Concurrent requests of the same PDF wait for the same task.
+    """
+    key = PDF_TASK_CACHE_KEY.format(path)
+    cache.add(key, task_id, timeout=settings.CELERY_TASK_TIME_LIMIT)
+    return cache.get(key, task_id)
+
+
+def release_task(path):
+    cache.delete(PDF_TASK_CACHE_KEY.format(path))
+
+
+def store_pdf(path, content):
+    """Save the PDF and delete older PDFs of the recipe."""
+    directory = path.rsplit("/", 1)[0]
+    if not default_storage.exists(path):
+        default_storage.save(path, ContentFile(content))
+    try:
+        files = default_storage.listdir(directory)[1]
+    except FileNotFoundError:
+        files = []
+    for name in files:
+        if f"{directory}/{name}" != path:
+            default_storage.delete(f"{directory}/{name}")
+
+
+def render_html(recipe, user):
+    """Render the print template of the recipe, like `RecipePrintView` did."""
+    context = {
+        "recipe": recipe,
+        "object": recipe,
+        "user": user,
+        "user_units": functions.get_unit_preferences(user),
+    }
+    context.update(functions.get_user_units_with_repr(user))
+    return render_to_string(PDF_TEMPLATE, context)
+
+
+def write_pdf(html, base_url):
+    # weasyprint needs system libraries, imported only where PDFs are made
+    import weasyprint
+    from django_weasyprint.utils import django_url_fetcher
+
+    return weasyprint.HTML(
+        string=html,
+        base_url=getattr(settings, "WEASYPRINT_BASEURL", base_url),
+        url_fetcher=django_url_fetcher,
+    ).write_pdf()
@@ -0,0 +1,69 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from brivo.brewery import catalog
+from brivo.brewery.models import (
+    Country,
+    Extra,
+    Fermentable,
+    Hop,
+    IngredientExtra,
+    IngredientFermentable,
+    IngredientHop,
+    IngredientYeast,
+    MashStep,
+    Recipe,
+    Style,
+    Tag,
+    Yeast,
+    schedule_metrics_update,
+)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    schedule_metrics_update(instance)
+
+
+@receiver(post_save, sender=IngredientFermentable)
+@receiver(post_save, sender=IngredientHop)
+@receiver(post_save, sender=IngredientYeast)
+@receiver(post_save, sender=IngredientExtra)
+@receiver(post_save, sender=MashStep)
+@receiver(post_delete, sender=IngredientFermentable)
+@receiver(post_delete, sender=IngredientHop)
+@receiver(post_delete, sender=IngredientYeast)
+@receiver(post_delete, sender=IngredientExtra)
+@receiver(post_delete, sender=MashStep)
+def ingredient_changed(sender, instance, raw=False, **kwargs):
+    if raw or instance.recipe_id is None:
+        return
+    # touch the recipe, its ETag is derived from updated_at
+    schedule_metrics_update(instance.recipe_id, touch=True)
+
+
+@receiver(post_save, sender=Fermentable)
+@receiver(post_save, sender=Hop)
+@receiver(post_save, sender=Yeast)
+@receiver(post_save, sender=Extra)
+@receiver(post_save, sender=Style)
+@receiver(post_save, sender=Country)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Fermentable)
+@receiver(post_delete, sender=Hop)
+@receiver(post_delete, sender=Yeast)
+@receiver(post_delete, sender=Extra)
+@receiver(post_delete, sender=Style)
+@receiver(post_delete, sender=Country)
+@receiver(post_delete, sender=Tag)
+def catalog_changed(sender, **kwargs):
+    catalog.invalidate(sender)
+
+
+@receiver(m2m_changed, sender=Hop.substitute.through)
+@receiver(m2m_changed, sender=Style.tags.through)
+def catalog_relations_changed(sender, action, instance, model, **kwargs):
+    if action.startswith("post_"):
+        catalog.invalidate(Hop if sender is Hop.substitute.through else Style)
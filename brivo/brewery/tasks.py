@@ -1,66 +1,121 @@
-from django.contrib.auth import get_user_model
+import datetime
+
+from celery import group
 from celery.schedules import crontab
-from brivo.brewery.models import (
-    Batch,
-)
+from django.utils import timezone
+
+from brivo.brewery.models import Batch
 from brivo.utils import functions
 
 from config import celery_app
 
-User = get_user_model()
-users = User.objects.all()
+
+# Batches get a reminder this many days after the primary fermentation start
+FERMENTATION_REMINDER_DAYS = (7, 14)
+FERMENTATION_STAGES = ("PRIMARY_FERMENTATION", "SECONDARY_FERMENTATION")
+REMINDER_TEMPLATE = "brewery/emails/batch_fermentation.html"
+# digests sent by one task, over one SMTP connection
+DIGEST_CHUNK_SIZE = 100
 
 
 @celery_app.on_after_finalize.connect
 def setup_periodic_tasks(sender, **kwargs):
-    for user in users:
-        print(f"Adding celery task for {user}")
-        sender.add_periodic_task(
-            crontab(minute=0, hour=18),
-            check_fermenting_batches.s(user.username, user.email),
-            name=f"{user} batch check",
+    # one sweep for all users, new users need no new schedule
+    sender.add_periodic_task(
+        crontab(minute=0, hour=18),
+        send_fermentation_reminders.s(),
+        name="fermentation reminders",
+    )
+
+
+def get_fermentation_reminders(today=None):
+    """Return reminders of all batches fermenting for a reminder day count.
+
+    Batches are selected by their start day with a single query, the
+    reminders are dicts with the e-mail context and address.
+    """
+    today = today or timezone.localdate()
+    days = {
+        today - datetime.timedelta(days=ndays): ndays
+        for ndays in FERMENTATION_REMINDER_DAYS
+    }
+    rows = (
+        Batch.objects.filter(
+            stage__in=FERMENTATION_STAGES, primary_fermentation_start_day__in=days
+        )
+        .exclude(user__email="")
+        .order_by("user_id", "batch_number")
+        .values_list(
+            "name",
+            "batch_number",
+            "primary_fermentation_start_day",
+            "user__username",
+            "user__email",
         )
+    )
+    return [
+        {
+            "email": email,
+            "ndays": days[start_day],
+            "name": name,
+            "batch_number": batch_number,
+            "username": username,
+        }
+        for name, batch_number, start_day, username, email in rows
+    ]
+
+
+def get_fermentation_digests(reminders):
+    """Group the reminders by the e-mail address, one digest per user."""
+    digests = {}
+    for reminder in reminders:
+        digest = digests.setdefault(
+            reminder["email"],
+            {"email": reminder["email"], "username": reminder["username"], "batches": []},
+        )
+        digest["batches"].append(
+            {
+                "name": reminder["name"],
+                "batch_number": reminder["batch_number"],
+                "ndays": reminder["ndays"],
+            }
+        )
+    return list(digests.values())
+
+
+def render_digest(digest):
+    batches = digest["batches"]
+    if len(batches) == 1:
+        subject = f"{batches[0]['name']} is fermenting for {batches[0]['ndays']}"
+    else:
+        subject = f"{len(batches)} batches are fermenting"
+    return functions.render_mail(
+        template=REMINDER_TEMPLATE,
+        subject=subject,
+        email=digest["email"],
+        context={"username": digest["username"], "batches": batches},
+    )
+
+
+@celery_app.task()
+def send_fermentation_reminders(today=None):
+    """Send a digest of fermenting batches to each user.
+
+    Digests are sent in chunks by parallel tasks on the mail queue.
+    Returns the number of digests.
+    """
+    if today is not None:
+        today = datetime.date.fromisoformat(today)
+    digests = get_fermentation_digests(get_fermentation_reminders(today))
+    if digests:
+        group(
+            send_reminder_digests.s(digests[i:i + DIGEST_CHUNK_SIZE])
+            for i in range(0, len(digests), DIGEST_CHUNK_SIZE)
+        ).apply_async()
+    return len(digests)
 
 
 @celery_app.task()
-def check_fermenting_batches(user, email):
-    """A pointless Celery task to demonstrate usage."""
-    print(f"Checking batches for {user}")
-    batches = Batch.objects.filter(user__username=user)
-    for batch in batches:
-
-        if batch.stage not in ["PRIMARY_FERMENTATION", "SECONDARY_FERMENTATION"]:
-            continue
-        ndays = batch.get_ndays_since_brewing()
-        if ndays < 7:
-            # print(f" - {batch.name} is fermenting for less than a week")
-            pass
-        elif ndays == 7:
-            functions.send_mail(
-                template="brewery/emails/batch_fermentation.html",
-                subject=f"{batch.name} is fermenting for {ndays}",
-                email=email,
-                context={
-                    "ndays": ndays,
-                    "name": batch.name,
-                    "batch_number": batch.batch_number,
-                    "username": user,
-                },
-            )
-        elif ndays == 14:
-            functions.send_mail(
-                template="brewery/emails/batch_fermentation.html",
-                subject=f"{batch.name} is fermenting for {ndays}",
-                email=email,
-                context={
-                    "ndays": ndays,
-                    "name": batch.name,
-                    "batch_number": batch.batch_number,
-                    "username": user,
-                },
-            )
-        elif ndays > 30:
-            # print(f" - {batch.name} is fermenting for a long time")
-            pass
-        else:
-            pass
\ No newline at end of file
+def send_reminder_digests(digests):
+    """Send the digests through one mail connection."""
+    return functions.send_mails([render_digest(digest) for digest in digests])
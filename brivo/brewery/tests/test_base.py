@@ -0,0 +1,102 @@
+import pytest
+from measurement.measures import Volume, Weight
+from rest_framework import serializers as drf_serializers
+
+from brivo.brewery.api.serializers import (
+    get_measurement_parser,
+    measurement_field_factory,
+)
+from brivo.brewery.models import Country, bulk_uuslug, uuslug
+from brivo.brewery.models.base import _slug_regex, _taken_slugs
+from brivo.utils.measures import BeerGravity
+
+
+pytestmark = pytest.mark.django_db
+
+
+class TestSlugs:
+    def test_uuslug_single_query(self, django_assert_num_queries):
+        for i in range(5):
+            Country.objects.create(name="Poland", code="PL")
+        assert sorted(Country.objects.values_list("slug", flat=True)) == [
+            "poland",
+            "poland-1",
+            "poland-2",
+            "poland-3",
+            "poland-4",
+        ]
+        with django_assert_num_queries(1):
+            assert uuslug("Poland", instance=Country()) == "poland-5"
+
+    def test_uuslug_excludes_instance(self):
+        country = Country.objects.create(name="Poland", code="PL")
+        assert uuslug("Poland", instance=country) == "poland"
+
+    def test_bulk_uuslug(self, django_assert_num_queries):
+        Country.objects.create(name="Poland", code="PL")
+        Country.objects.create(name="Poland", code="PL")
+        countries = [Country(name=name) for name in ["Poland", "Germany", "Poland", "Poland-1"]]
+        with django_assert_num_queries(1):
+            bulk_uuslug(countries)
+        assert [c.slug for c in countries] == ["poland-2", "germany", "poland-3", "poland-1-1"]
+        Country.objects.bulk_create(countries)
+        assert Country.objects.values("slug").distinct().count() == 6
+
+    def test_only_candidates_fetched(self):
+        for name in ["Pale", "Pale", "Pale Ale", "Pale Lager", "Pale 2020"]:
+            Country.objects.create(name=name, code="PL")
+        regex = _slug_regex("pale", 1000, "-")
+        taken = _taken_slugs(Country.objects.all(), "slug", [regex])
+        # "pale-2020" could be a numbered "pale", other names are not read
+        assert taken == {"pale", "pale-1", "pale-2020"}
+
+    def test_long_slugs(self):
+        name = "x" * 1000
+        first = Country.objects.create(name=name, code="PL")
+        second = Country.objects.create(name=name, code="PL")
+        assert first.slug == name
+        assert second.slug == "x" * 998 + "-1"
+        assert uuslug(name, instance=Country()) == "x" * 998 + "-2"
+
+
+class MeasurementSerializer(drf_serializers.Serializer):
+    gravity = measurement_field_factory(BeerGravity, "gravity_units")()
+    volume = measurement_field_factory(Volume, "volume_units")()
+    amount = measurement_field_factory(Weight, "mass_units")()
+
+    def __init__(self, *args, user=None, **kwargs):
+        self.user = user
+        super().__init__(*args, **kwargs)
+
+
+class TestMeasurementField:
+    def test_parser_built_once(self):
+        assert get_measurement_parser(Volume) is get_measurement_parser(Volume)
+
+    def test_units(self):
+        serializer = MeasurementSerializer(
+            data={"gravity": "1.048 sg", "volume": "20 US Gallon", "amount": "2.5kg"}
+        )
+        assert serializer.is_valid(), serializer.errors
+        data = serializer.validated_data
+        assert data["gravity"].sg == pytest.approx(1.048)
+        assert data["volume"].us_g == pytest.approx(20)
+        assert data["amount"].g == pytest.approx(2500)
+
+    def test_numbers_in_user_units(self, user):
+        serializer = MeasurementSerializer(
+            data={"gravity": 12, "volume": "20.5", "amount": 0.5}, user=user
+        )
+        assert serializer.is_valid(), serializer.errors
+        data = serializer.validated_data
+        assert data["gravity"].plato == pytest.approx(12)
+        assert data["volume"].l == pytest.approx(20.5)
+        assert data["amount"].g == pytest.approx(0.5)
+
+    @pytest.mark.parametrize("value", ["12", "-1 l", "1 parsec", "1.l", True, None, [1]])
+    def test_invalid(self, value):
+        serializer = MeasurementSerializer(
+            data={"gravity": "12 plato", "volume": value, "amount": "1 g"}
+        )
+        assert not serializer.is_valid()
+        assert list(serializer.errors) == ["volume"]
@@ -1,9 +1,18 @@
+import datetime
+import numpy
 import pytest
 import json
+from unittest import mock
 
 from model_bakery import baker
+from rest_framework.authtoken.models import Token
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-from brivo.brewery.models import Batch
+from brivo.brewery import importers, tasks, timeseries
+from brivo.utils import functions
+from brivo.brewery.models import Batch, FermentationCheck, ReadingChunk
 
 pytestmark = pytest.mark.django_db
 
@@ -75,6 +84,50 @@ class TestBatchEndpoints:
         assert response.status_code == 201, json.loads(response.content)
         assert json.loads(response.content)["stage"] == "MASHING"
 
+    def test_create_batch_numbers(self, api_client, recipes):
+        user, infos = recipes
+        recipe_id = list(infos.keys())[0]
+        client = api_client()
+        client.force_authenticate(user)
+        data = {
+            "name": "Session IPA",
+            "brewing_day": "2020-05-06",
+            "grain_temperature": "20.0 c",
+            "sparging_temperature": "78.0 c",
+            "recipe": recipe_id,
+            "stage": "MASHING",
+        }
+        numbers = []
+        for batch_number in [None, None, 5, 5, None]:
+            if batch_number is not None:
+                data["batch_number"] = batch_number
+            else:
+                data.pop("batch_number", None)
+            response = client.post(f"{self.endpoint}", data=data, format="json")
+            assert response.status_code == 201, json.loads(response.content)
+            numbers.append(json.loads(response.content)["batch_number"])
+        assert numbers == [1, 2, 5, 6, 7]
+        user.brewery_profile.refresh_from_db()
+        assert user.brewery_profile.last_batch_number == 7
+
+    def test_batch_number_counter(self, user):
+        batch = baker.make(Batch, user=user, batch_number=1)
+        # a number edited by hand moves the counter up
+        batch.batch_number = 10
+        batch.save()
+        # the counter is the only source of the next number, no MAX query
+        with CaptureQueriesContext(connection) as queries:
+            assert Batch.allocate_batch_number(user) == 11
+        assert not [q for q in queries.captured_queries if "MAX(" in q["sql"]]
+        user.brewery_profile.refresh_from_db()
+        assert user.brewery_profile.last_batch_number == 11
+        # saves which keep the number do not touch the counter
+        batch = Batch.objects.get(pk=batch.pk)
+        batch.stage = "PRIMARY_FERMENTATION"
+        with CaptureQueriesContext(connection) as queries:
+            batch.save()
+        assert not [q for q in queries.captured_queries if "userbrewery" in q["sql"]]
+
     def test_create_in_boil(self, api_client, recipes):
         user, infos = recipes
         recipe_id = list(infos.keys())[0]
@@ -221,6 +274,20 @@ class TestBatchEndpoints:
         assert response.status_code == 200, json.loads(response.content)
         assert json.loads(response.content)["stage"] == "MASHING"
 
+    def test_retrieve_not_modified(self, api_client, user):
+        batch = baker.make(Batch, user=user)
+        client = api_client()
+        client.force_authenticate(user)
+        url = f"{self.endpoint}{batch.id}/"
+        etag = client.get(url)["ETag"]
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        batch.name = "Renamed"
+        batch.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.json()["name"] == "Renamed"
+
     def test_updates(self, api_client, recipes):
         user, infos = recipes
         recipe_id = list(infos.keys())[0]
@@ -331,3 +398,288 @@ class TestBatchEndpoints:
         assert json.loads(response.content)["stage"] == "FINISHED", json.loads(
             response.content
         )
+
+
+class TestBatchListView:
+    def test_constant_queries(self, client, user, django_assert_num_queries):
+        client.force_login(user)
+        url = reverse("brewery:batch-list")
+        baker.make(Batch, user=user)
+        # first request caches the user units
+        client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        assert response.status_code == 200
+        baker.make(Batch, user=user, _quantity=9)
+        with django_assert_num_queries(len(context.captured_queries)):
+            response = client.get(url)
+        assert len(response.context["batches"]) == 10
+
+
+class TestBatchImport:
+    def test_import(self, recipes):
+        user, infos = recipes
+        rows = [
+            {
+                "name": f"Batch {i}",
+                "recipe": "testallgrain",
+                "stage": "MASHING",
+                "brewing_day": "2020-05-06",
+                "grain_temperature": "20.0 c",
+                "sparging_temperature": "78.0 c",
+                "batch_number": number,
+            }
+            for i, number in enumerate([3, 3, 1, 10])
+        ]
+        assert importers.import_batches(rows, user.username, chunk_size=3) == 4
+        batches = Batch.objects.filter(user=user).order_by("pk")
+        assert [b.batch_number for b in batches] == [3, 4, 1, 10]
+        assert {b.recipe.name for b in batches} == {"TestAllGrain"}
+
+    def test_export_roundtrip(self, client, recipes, other_user):
+        user, infos = recipes
+        self.test_import(recipes)
+        client.force_login(user)
+        response = client.get(reverse("brewery:batch-export"))
+        assert response.status_code == 200
+        assert response["Content-Disposition"] == 'attachment; filename="batches.json"'
+        exported = json.loads(b"".join(response.streaming_content))
+        assert [row["batch_number"] for row in exported] == [3, 4, 1, 10]
+        assert importers.import_batches(exported, other_user) == 4
+        assert Batch.objects.filter(user=other_user).count() == 4
+
+
+class TestFermentationReminders:
+    @pytest.fixture
+    def today(self):
+        return datetime.date(2021, 6, 15)
+
+    @pytest.fixture
+    def batches(self, user, other_user, today):
+        def make(user, stage, ndays):
+            return baker.make(
+                Batch,
+                user=user,
+                stage=stage,
+                primary_fermentation_start_day=today - datetime.timedelta(days=ndays),
+            )
+
+        return [
+            make(user, "PRIMARY_FERMENTATION", 7),
+            make(user, "SECONDARY_FERMENTATION", 14),
+            make(other_user, "PRIMARY_FERMENTATION", 14),
+            make(user, "PRIMARY_FERMENTATION", 8),
+            make(user, "PACKAGING", 7),
+            make(other_user, "SECONDARY_FERMENTATION", 30),
+        ]
+
+    def test_reminders(self, batches, today, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            reminders = tasks.get_fermentation_reminders(today)
+        assert sorted((r["name"], r["ndays"]) for r in reminders) == sorted(
+            (batch.name, ndays) for batch, ndays in zip(batches[:3], [7, 14, 14])
+        )
+        reminder = next(r for r in reminders if r["name"] == batches[0].name)
+        assert reminder["email"] == batches[0].user.email
+        assert reminder["username"] == batches[0].user.username
+        assert reminder["batch_number"] == batches[0].batch_number
+
+    def test_digests(self, batches, today):
+        digests = tasks.get_fermentation_digests(tasks.get_fermentation_reminders(today))
+        assert len(digests) == 2
+        digest = next(d for d in digests if d["email"] == batches[0].user.email)
+        assert digest["username"] == batches[0].user.username
+        assert {(b["name"], b["ndays"]) for b in digest["batches"]} == {
+            (batches[0].name, 7),
+            (batches[1].name, 14),
+        }
+
+    def test_send(self, batches, today, mailoutbox):
+        with mock.patch.object(
+            functions, "get_connection", wraps=functions.get_connection
+        ) as connection:
+            with mock.patch.object(tasks.group, "apply_async", autospec=True) as apply_async:
+                assert tasks.send_fermentation_reminders(today.isoformat()) == 2
+            # one group of chunks, sent by the workers
+            (signatures,), _ = apply_async.call_args
+            for signature in signatures.tasks:
+                signature.type(*signature.args)
+        assert connection.call_count == 1
+        # one digest per user
+        assert len(mailoutbox) == 2
+        assert {tuple(message.to) for message in mailoutbox} == {
+            (batch.user.email,) for batch in batches[:3]
+        }
+        subjects = {message.subject for message in mailoutbox}
+        assert subjects == {
+            "BRIVO: 2 batches are fermenting",
+            f"BRIVO: {batches[2].name} is fermenting for 14",
+        }
+        digest = next(m for m in mailoutbox if m.to == [batches[0].user.email])
+        assert batches[0].name in digest.body and batches[1].name in digest.body
+
+    def test_digest_routed_to_mail_queue(self, settings):
+        route = settings.CELERY_TASK_ROUTES[tasks.send_reminder_digests.name]
+        assert route == {"queue": "mail"}
+
+    def test_mail_template_compiled_once(self, batches, today):
+        functions.get_mail_template.cache_clear()
+        digests = tasks.get_fermentation_digests(tasks.get_fermentation_reminders(today))
+        with mock.patch.object(
+            functions, "get_template", wraps=functions.get_template
+        ) as get_template:
+            tasks.send_reminder_digests(digests)
+        assert get_template.call_count == 1
+
+
+class TestFermentationReadings:
+    start = datetime.datetime(2021, 6, 15, tzinfo=datetime.timezone.utc)
+
+    @pytest.fixture
+    def batch(self, user):
+        return baker.make(Batch, user=user, stage="PRIMARY_FERMENTATION")
+
+    @pytest.fixture
+    def client(self, api_client, user):
+        token = Token.objects.create(user=user)
+        client = api_client()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        return client
+
+    def url(self, batch):
+        return f"/api/brewery/batches/{batch.id}/readings/"
+
+    def readings(self, count, offset=0):
+        return [
+            {
+                "sample_time": (
+                    self.start + datetime.timedelta(minutes=15 * i)
+                ).isoformat(),
+                "gravity": f"{1.050 - i / 10000:.4f} sg",
+                "beer_temperature": "20 c",
+            }
+            for i in range(offset, offset + count)
+        ]
+
+    def test_create(self, client, batch, django_assert_max_num_queries):
+        # token, batch, units, creating missing chunks, one read and one
+        # write of all chunks
+        with django_assert_max_num_queries(10):
+            response = client.post(self.url(batch), self.readings(96), format="json")
+        assert response.status_code == 201
+        assert response.json() == {"count": 96}
+        assert not FermentationCheck.objects.exists()
+        # one day of readings, a week of hours and a year of days per row
+        chunks = {chunk.resolution: chunk for chunk in batch.reading_chunks.all()}
+        assert {r: c.count for r, c in chunks.items()} == {"RAW": 96, "HOUR": 24, "DAY": 1}
+        assert len(chunks["RAW"].data) == 96 * 16
+
+        series = timeseries.get_series(batch)
+        assert len(series["time"]) == 96
+        assert round(functions.to_sg(series["gravity"][1]), 4) == 1.0499
+        assert series["beer_temperature"][0] == pytest.approx(293.15, abs=1e-3)
+        assert numpy.isnan(series["ambient_temperature"]).all()
+
+    def test_numbers_in_user_units(self, client, batch, user):
+        units = functions.get_user_units(user)
+        data = [
+            {"sample_time": "2021-06-15T12:00:00Z", "gravity": 12, "beer_temperature": 18}
+        ]
+        response = client.post(self.url(batch), data, format="json")
+        assert response.status_code == 201
+        response = client.get(self.url(batch))
+        assert response.json()["gravity"] == [12]
+        assert response.json()["beer_temperature"] == [18]
+        assert response.json()["units"] == {
+            "gravity": units["gravity_units"],
+            "temperature": units["temperature_units"],
+        }
+
+    def test_sent_again(self, client, batch):
+        client.post(self.url(batch), self.readings(4), format="json")
+        response = client.post(self.url(batch), self.readings(8), format="json")
+        assert response.json() == {"count": 4}
+        series = timeseries.get_series(batch, "HOUR")
+        assert series["gravity_count"].tolist() == [4, 4]
+
+    def test_concurrent_first_readings(self, client, batch, monkeypatch):
+        # another request stores the first readings of the day meanwhile
+        objects = ReadingChunk.objects
+        bulk_create = objects.bulk_create
+        concurrent = [{"sample_time": self.start + datetime.timedelta(minutes=5)}]
+
+        def create_concurrently(*args, **kwargs):
+            if concurrent:
+                timeseries.append(batch, [concurrent.pop()])
+            return bulk_create(*args, **kwargs)
+
+        monkeypatch.setattr(objects, "bulk_create", create_concurrently)
+        response = client.post(self.url(batch), self.readings(4), format="json")
+        assert response.status_code == 201
+        assert response.json() == {"count": 4}
+        chunks = {chunk.resolution: chunk.count for chunk in batch.reading_chunks.all()}
+        assert chunks == {"RAW": 5, "HOUR": 1, "DAY": 1}
+        assert batch.reading_chunks.count() == 3
+        series = timeseries.get_series(batch, "HOUR")
+        assert series["beer_temperature_count"].tolist() == [4]
+
+    def test_rollups_updated(self, client, batch):
+        # the second day comes in two requests
+        client.post(self.url(batch), self.readings(100), format="json")
+        client.post(self.url(batch), self.readings(92, offset=100), format="json")
+        readings = timeseries.get_series(batch)
+        for resolution, bucket in [("HOUR", 4), ("DAY", 96)]:
+            series = timeseries.get_series(batch, resolution)
+            gravity = readings["gravity"].reshape(-1, bucket)
+            assert series["gravity_count"].tolist() == [bucket] * (192 // bucket)
+            assert series["gravity"] == pytest.approx(gravity.mean(axis=1), abs=1e-4)
+            assert series["gravity_min"] == pytest.approx(gravity.min(axis=1))
+            assert series["gravity_max"] == pytest.approx(gravity.max(axis=1))
+
+    def test_time_range(self, client, batch):
+        client.post(self.url(batch), self.readings(192), format="json")
+        response = client.get(
+            self.url(batch),
+            {
+                "resolution": "hour",
+                "start": "2021-06-15T22:00:00Z",
+                "end": "2021-06-16T02:00:00Z",
+            },
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["time"] == [
+            "2021-06-15T22:00:00Z",
+            "2021-06-15T23:00:00Z",
+            "2021-06-16T00:00:00Z",
+            "2021-06-16T01:00:00Z",
+        ]
+        assert data["gravity_count"] == [4] * 4
+        assert data["ambient_temperature"] == [None] * 4
+        response = client.get(self.url(batch), {"resolution": "week"})
+        assert response.status_code == 400
+
+    def test_invalid(self, client, batch):
+        data = self.readings(3)
+        data[1]["gravity"] = "heavy"
+        del data[2]["sample_time"]
+        response = client.post(self.url(batch), data, format="json")
+        assert response.status_code == 400
+        errors = response.json()
+        assert errors[0] == {}
+        assert list(errors[1]) == ["gravity"]
+        assert list(errors[2]) == ["sample_time"]
+        assert not batch.reading_chunks.exists()
+
+    def test_too_many(self, client, batch, settings):
+        settings.BREWERY_MAX_FERMENTATION_READINGS = 2
+        response = client.post(self.url(batch), self.readings(3), format="json")
+        assert response.status_code == 400
+        assert not batch.reading_chunks.exists()
+
+    def test_other_users_batch(self, client, other_user):
+        batch = baker.make(Batch, user=other_user)
+        response = client.post(self.url(batch), self.readings(1), format="json")
+        assert response.status_code == 404
+        assert client.get(self.url(batch)).status_code == 404
+        assert not batch.reading_chunks.exists()
@@ -0,0 +1,141 @@
+import pytest
+
+from model_bakery import baker
+from django.core.cache.backends.dummy import DummyCache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from brivo.brewery import catalog, filters
+from brivo.brewery.models import Country, Fermentable, Hop, Style, Tag
+from brivo.utils.measures import BeerColor
+
+pytestmark = pytest.mark.django_db
+
+
+def catalog_queries(context):
+    return [
+        query["sql"] for query in context.captured_queries if "brewery_" in query["sql"]
+    ]
+
+
+@pytest.fixture
+def fermentables():
+    czech = baker.make(Country, code="CZ")
+    return [
+        baker.make(Fermentable, name="Pilsner Malt", type="GRAIN", color=BeerColor(srm=2), country=czech),
+        baker.make(Fermentable, name="Munich Malt", type="GRAIN", color=BeerColor(srm=9)),
+        baker.make(Fermentable, name="Cane Sugar", type="SUGAR", color=BeerColor(srm=0.5)),
+    ]
+
+
+class TestCatalog:
+    def test_snapshot_is_reused(self, fermentables, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            objects = catalog.get_objects(Fermentable)
+        assert [obj.pk for obj in objects] == [obj.pk for obj in fermentables]
+        with django_assert_num_queries(0):
+            assert catalog.get_objects(Fermentable) is objects
+            assert objects[0].country.code == "CZ"
+
+    def test_save_and_delete_invalidate(self, fermentables):
+        catalog.get_objects(Fermentable)
+        fermentables[0].name = "Bohemian Pilsner Malt"
+        fermentables[0].save()
+        assert catalog.get_objects(Fermentable)[0].name == "Bohemian Pilsner Malt"
+        fermentables[1].delete()
+        assert len(catalog.get_objects(Fermentable)) == 2
+        Country.objects.get(code="CZ").save()
+        assert catalog.get_objects(Fermentable)[0].country is not fermentables[0].country
+
+    def test_relations_invalidate(self):
+        style = baker.make(Style)
+        assert list(catalog.get_objects(Style)[0].tags.all()) == []
+        style.tags.add(baker.make(Tag, name="pale-color"))
+        assert [tag.name for tag in catalog.get_objects(Style)[0].tags.all()] == ["pale-color"]
+
+    def test_without_cache(self, fermentables, monkeypatch, django_assert_num_queries):
+        monkeypatch.setattr(catalog, "cache", DummyCache("", {}))
+        with django_assert_num_queries(2):
+            assert catalog.get_snapshot(Fermentable) is None
+            catalog.get_objects(Fermentable)
+            catalog.get_objects(Fermentable)
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            {},
+            {"name": "malt"},
+            {"type": "GRAIN"},
+            {"color__gt": "5"},
+            {"color__lt": "5", "name": "S"},
+            {"page": "2"},
+        ],
+    )
+    def test_filter_catalog(self, fermentables, data):
+        objects = catalog.filter_catalog(filters.FermentableFilter, data)
+        assert isinstance(objects, list)
+        expected = filters.FermentableFilter(data, queryset=Fermentable.objects.order_by("pk")).qs
+        assert objects == list(expected)
+
+    def test_filter_catalog_relation(self):
+        czech = baker.make(Country)
+        hops = baker.make(Hop, _quantity=2)
+        hops[1].country = czech
+        hops[1].save()
+        assert catalog.filter_catalog(filters.HopFilter, {"country": czech.pk}) == [hops[1]]
+
+    def test_filter_catalog_invalid(self, fermentables):
+        objects = catalog.filter_catalog(filters.FermentableFilter, {"color__gt": "dark"})
+        assert list(objects) == fermentables
+
+    def test_autocomplete(self, client, user, fermentables):
+        client.force_login(user)
+        url = reverse("brewery:fermentable-autocomplete")
+        client.get(url, {"q": "malt"})
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, {"q": "malt"})
+        assert not catalog_queries(context)
+        assert [s["value"] for s in response.json()["suggestions"]] == [
+            "Pilsner Malt",
+            "Munich Malt",
+        ]
+
+    def test_api(self, api_client, user, fermentables):
+        client = api_client()
+        client.force_authenticate(user)
+        client.get("/api/brewery/fermentables/")
+        with CaptureQueriesContext(connection) as context:
+            response = client.get("/api/brewery/fermentables/")
+            assert response.json()["count"] == 3
+            response = client.get(f"/api/brewery/fermentables/{fermentables[0].pk}/")
+            assert response.json()["country"]["code"] == "CZ"
+        assert not catalog_queries(context)
+        response = client.get("/api/brewery/fermentables/", {"pagination": "cursor"})
+        assert len(response.json()["results"]) == 3
+
+    def test_api_not_modified(self, api_client, user, fermentables):
+        client = api_client()
+        client.force_authenticate(user)
+        url = "/api/brewery/fermentables/"
+        etag = client.get(url)["ETag"]
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        assert client.get(url, {"page": 1}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+        detail_url = f"{url}{fermentables[1].pk}/"
+        detail_etag = client.get(detail_url)["ETag"]
+        assert client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag).status_code == 304
+        fermentables[1].name = "Vienna Malt"
+        fermentables[1].save()
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+        response = client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        assert response.status_code == 200
+        assert response.json()["name"] == "Vienna Malt"
+
+    def test_detail_view_not_modified(self, client, user, fermentables):
+        client.force_login(user)
+        url = reverse("brewery:fermentable-detail", args=[fermentables[0].pk])
+        etag = client.get(url)["ETag"]
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        fermentables[0].country.name = "Czechia"
+        fermentables[0].country.save()
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
@@ -0,0 +1,103 @@
+import json
+from unittest import mock
+
+import pytest
+
+from brivo.brewery import catalog
+from brivo.brewery.loaders import CatalogLoader
+from brivo.brewery.models import Country, Fermentable, Hop, Style, Tag, Yeast
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data = {
+        "countries": [
+            {"code": "CZ", "name": "Czech Republic"},
+            {"code": "DE", "name": "Germany"},
+        ],
+        "fermentables": [
+            {"name": "Pilsner Malt", "country": "CZ", "color": "2", "type": "GRAIN",
+             "extraction": "80"},
+            {"name": "Pilsner Malt", "country": "DE", "color": "2", "type": "GRAIN",
+             "extraction": "81"},
+            {"name": "Pilsner Malt", "country": "DE", "color": "3", "type": "GRAIN",
+             "extraction": "79"},
+            {"name": "Cane Sugar", "country": "", "color": "0", "type": "SUGAR",
+             "extraction": "100"},
+        ],
+        "styles": [
+            {"name": "Czech Pale Lager", "category_id": "3A", "category": "Czech Lager",
+             "og_min": "1.028", "color_min": "3", "tags": "pale-color, lagered"},
+            {"name": "Munich Helles", "category_id": "4A", "category": "Pale Malty",
+             "tags": "pale-color"},
+        ],
+        "hops": [
+            {"name": "Saaz", "country": "Czech Republic", "alpha_min": "2.5",
+             "alpha_max": "4.5", "type": "AROMA", "substitute": "Tettnang, Lublin"},
+            {"name": "Tettnang", "country": "Germany", "alpha_min": "3.5",
+             "alpha_max": "5.5", "type": "AROMA", "substitute": ""},
+        ],
+        "yeasts": [
+            {"name": "British Ale Yeast", "lab": "White Labs", "lab_id": "WLP005",
+             "type": "ALE", "form": "LIQUID", "temp_min": "18", "temp_max": "21"},
+            {"name": "British Ale Yeast", "lab": "Mangrove Jack's", "lab_id": "M07",
+             "type": "ALE", "form": "DRY", "temp_min": "18", "temp_max": "22"},
+        ],
+        "extras": [{"name": "Irish Moss", "type": "FINING", "use": "BOIL"}],
+    }
+    for name, rows in data.items():
+        tmp_path.joinpath(f"{name}.json").write_text(json.dumps(rows))
+    return tmp_path
+
+
+class TestCatalogLoader:
+    def test_load(self, data_dir):
+        loader = CatalogLoader(data_dir=data_dir)
+        loader.load()
+        assert Country.objects.count() == 2
+        # the first row of a duplicated (name, country) wins
+        assert Fermentable.objects.count() == 3
+        assert Fermentable.objects.get(country__code="DE").extraction == 81
+        assert Yeast.objects.count() == 2
+        style = Style.objects.get(name="Czech Pale Lager")
+        assert style.og_min.sg == pytest.approx(1.028)
+        assert set(style.tags.values_list("name", flat=True)) == {"pale-color", "lagered"}
+        assert Tag.objects.count() == 2
+        saaz = Hop.objects.get(name="Saaz")
+        assert saaz.alpha_acids == 3.5
+        assert saaz.country.code == "CZ"
+        assert list(saaz.substitute.values_list("name", flat=True)) == ["Tettnang"]
+        assert not Hop.objects.get(name="Tettnang").substitute.exists()
+        assert loader.warnings == ["Could not find all substitute hops of Saaz: ['Lublin']"]
+        assert len({f.slug for f in Fermentable.objects.all()}) == 3
+
+    def test_catalogs_invalidated_once(self, data_dir):
+        with mock.patch.object(catalog, "bump_version") as bump_version:
+            CatalogLoader(data_dir=data_dir).load()
+        bumped = [call[0][0] for call in bump_version.call_args_list]
+        assert sorted(bumped, key=str) == sorted(catalog.CATALOG_MODELS, key=str)
+
+    def test_reload(self, data_dir):
+        CatalogLoader(data_dir=data_dir).load()
+        results = CatalogLoader(data_dir=data_dir).load()
+        assert [result.created for result in results] == [0] * 7
+        assert [result.updated for result in results] == [2, 3, 2, 2, 2, 2, 1]
+        assert Fermentable.objects.count() == 3
+        assert Style.tags.through.objects.count() == 3
+        assert Hop.substitute.through.objects.count() == 1
+
+    def test_incremental(self, data_dir):
+        CatalogLoader(data_dir=data_dir).load()
+        path = data_dir.joinpath("styles.json")
+        styles = json.loads(path.read_text())
+        styles[1]["category"] = "Pale Malty European Lager"
+        path.write_text(json.dumps(styles))
+        loader = CatalogLoader(data_dir=data_dir, incremental=True)
+        results = loader.load()
+        assert [result.updated for result in results] == [0, 0, 0, 1, 0, 0, 0]
+        assert [result.unchanged for result in results] == [2, 3, 2, 1, 2, 2, 1]
+        helles = Style.objects.get(name="Munich Helles")
+        assert helles.category == "Pale Malty European Lager"
+        assert helles.updated_at > helles.created_at
@@ -1,10 +1,23 @@
+import io
 import pytest
 import json
+from pathlib import Path
+from unittest import mock
 
 from model_bakery import baker
-
+from measurement.measures import Volume
+from django.contrib.messages import get_messages
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from brivo.brewery import exporters, importers, preview, printing, views
+from brivo.utils import functions
 from brivo.brewery.models import (
     Recipe,
+    RecipeCalculator,
     IngredientExtra,
     IngredientFermentable,
     IngredientHop,
@@ -175,6 +188,22 @@ class TestRecipeEndpoints:
         assert response.status_code == 200
         assert len(json.loads(response.content)["results"]) == 3
 
+    def test_list_cursor(self, api_client, user):
+        recipes = baker.make(Recipe, _quantity=5, user=user)
+        client = api_client()
+        client.force_authenticate(user)
+        url = f"{self.endpoint}?pagination=cursor&limit=2"
+        ids = []
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200
+            data = json.loads(response.content)
+            assert "count" not in data
+            assert len(data["results"]) <= 2
+            ids.extend(item["id"] for item in data["results"])
+            url = data["next"]
+        assert ids == [r.id for r in sorted(recipes, key=lambda r: (r.updated_at, r.id))]
+
     def test_list_many_users(self, api_client, user, other_user):
         user1_objects = baker.make(Recipe, _quantity=3, user=user)
         user2_objects = baker.make(Recipe, _quantity=2, user=other_user)
@@ -359,6 +388,33 @@ class TestRecipeEndpoints:
         assert len(mod_recipe["mash_steps"]) == 5
         assert mod_recipe["mash_steps"][-1]["temperature"] == "80.0 c"
 
+    def test_update_ingredients_queries(
+        self, api_client, user, recipe_with_ingredients_json
+    ):
+        client = api_client()
+        client.force_authenticate(user)
+
+        def count_update_queries(copies):
+            data = dict(recipe_with_ingredients_json)
+            for attr in ["fermentables", "hops", "yeasts", "extras", "mash_steps"]:
+                data[attr] = recipe_with_ingredients_json[attr] * copies
+            response = client.post(self.endpoint, data=data, format="json")
+            assert response.status_code == 201, response.content
+            recipe = json.loads(response.content)
+            for hop in recipe["hops"]:
+                hop["name"] = "Lublin"
+            for step in recipe["mash_steps"]:
+                step["time"] = "15.00"
+            with CaptureQueriesContext(connection) as context:
+                response = client.put(
+                    f"{self.endpoint}{recipe['id']}/", data=recipe, format="json"
+                )
+            assert response.status_code == 200, response.content
+            assert {h["name"] for h in json.loads(response.content)["hops"]} == {"Lublin"}
+            return len(context.captured_queries)
+
+        assert count_update_queries(1) == count_update_queries(6)
+
     # def test_parallel_update(self, api_client, user):
         # pass
 
@@ -369,4 +425,589 @@ class TestRecipeEndpoints:
         assert Recipe.objects.all().count() == 1
         response = client.delete(f"{self.endpoint}{obj.id}/")
         assert response.status_code == 204, response.content
-        assert Recipe.objects.all().count() == 0
\ No newline at end of file
+        assert Recipe.objects.all().count() == 0
+
+
+class TestRecipeConditionalGet:
+    endpoint = "/api/brewery/recipes/"
+
+    @pytest.fixture
+    def recipe(self, recipes):
+        user, infos = recipes
+        return Recipe.objects.filter(user=user, ibu__gt=0).first()
+
+    def test_retrieve_not_modified(self, api_client, recipe):
+        client = api_client()
+        client.force_authenticate(recipe.user)
+        url = f"{self.endpoint}{recipe.id}/"
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response["ETag"]
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response["ETag"] == etag
+        # only updated_at of the recipe is read
+        assert len([q for q in context.captured_queries if "brewery_" in q["sql"]]) == 1
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        assert response.status_code == 304
+
+    def test_ingredient_changes(self, api_client, recipe):
+        client = api_client()
+        client.force_authenticate(recipe.user)
+        url = f"{self.endpoint}{recipe.id}/"
+        etag = client.get(url)["ETag"]
+        recipe.hops.first().delete()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+        etag = response["ETag"]
+        baker.make(IngredientExtra, recipe=recipe)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+    def test_units_change(self, api_client, recipe):
+        client = api_client()
+        client.force_authenticate(recipe.user)
+        url = f"{self.endpoint}{recipe.id}/"
+        etag = client.get(url)["ETag"]
+        recipe.user.profile.gravity_units = "SG"
+        recipe.user.profile.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.json()["gravity"].endswith("sg")
+
+    def test_detail_view(self, client, recipe):
+        client.force_login(recipe.user)
+        url = reverse("brewery:recipe-detail", args=[recipe.pk])
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response["ETag"]
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        recipe.mash_steps.all().delete()
+        baker.make(IngredientExtra, recipe=recipe)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+
+class TestRecipeSparseFields:
+    endpoint = "/api/brewery/recipes/"
+
+    def test_list_fields(self, api_client, recipes):
+        user, infos = recipes
+        client = api_client()
+        client.force_authenticate(user)
+        client.get(self.endpoint)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(self.endpoint, {"fields": "id,name,style,abv"})
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert len(results) == len(infos)
+        stored = dict(Recipe.objects.filter(user=user).values_list("id", "abv"))
+        for item in results:
+            assert set(item) == {"id", "name", "style", "abv"}
+            assert float(item["abv"]) == pytest.approx(stored[item["id"]], abs=1e-1)
+        sql = " ".join(q["sql"] for q in context.captured_queries)
+        assert "brewery_ingredient" not in sql
+
+    def test_retrieve_fields(self, api_client, recipes):
+        user, infos = recipes
+        recipe = Recipe.objects.filter(user=user).first()
+        client = api_client()
+        client.force_authenticate(user)
+        with mock.patch.object(Recipe, "get_metrics") as get_metrics:
+            response = client.get(f"{self.endpoint}{recipe.id}/", {"fields": "id,name"})
+        assert response.status_code == 200
+        assert response.json() == {"id": recipe.id, "name": recipe.name}
+        get_metrics.assert_not_called()
+
+    def test_expand(self, api_client, recipes):
+        user, infos = recipes
+        recipe = Recipe.objects.filter(user=user).first()
+        client = api_client()
+        client.force_authenticate(user)
+        response = client.get(f"{self.endpoint}{recipe.id}/", {"expand": "hops"})
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["hops"]) == recipe.hops.count()
+        assert "fermentables" not in data
+        assert "ibu" in data
+        etag = response["ETag"]
+        response = client.get(f"{self.endpoint}{recipe.id}/", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert "fermentables" in response.json()
+
+    def test_unknown_field(self, api_client, user):
+        client = api_client()
+        client.force_authenticate(user)
+        response = client.get(self.endpoint, {"fields": "name,password"})
+        assert response.status_code == 400
+        assert "password" in response.json()["fields"]
+
+
+class TestRecipeCalculator:
+
+    def test_metrics_single_fetch(self, recipes, django_assert_num_queries):
+        user, infos = recipes
+        for recipe in Recipe.objects.filter(user=user):
+            info = infos[recipe.id]
+            # fermentables, hops and yeasts are fetched only once
+            with django_assert_num_queries(3):
+                metrics = recipe.get_metrics()
+            with django_assert_num_queries(0):
+                assert recipe.get_gravity() is metrics.gravity
+                recipe.get_ibu()
+                recipe.get_abv()
+                recipe.get_bitterness_ratio()
+            assert pytest.approx(metrics.boil_volume.l, rel=1e-4, abs=1e-1) == info["boil_volume"]
+            assert pytest.approx(metrics.gravity.plato, rel=1e-4, abs=1e-1) == info["gravity"]
+
+    def test_metrics_prefetched(self, recipes, django_assert_num_queries):
+        user, infos = recipes
+        recipes = list(
+            Recipe.objects.filter(user=user).prefetch_related("fermentables", "hops", "yeasts")
+        )
+        with django_assert_num_queries(0):
+            for recipe in recipes:
+                recipe.get_metrics()
+
+    def test_calculate_many(self, recipes):
+        user, infos = recipes
+        recipes = list(
+            Recipe.objects.filter(user=user).prefetch_related("fermentables", "hops", "yeasts")
+        )
+        calculators = [RecipeCalculator(recipe) for recipe in recipes]
+        for recipe, metrics in zip(recipes, RecipeCalculator.calculate_many(calculators)):
+            expected = RecipeCalculator(recipe).calculate()
+            for field in expected._fields:
+                value, expected_value = getattr(metrics, field), getattr(expected, field)
+                if hasattr(expected_value, "standard"):
+                    value, expected_value = value.standard, expected_value.standard
+                if field == "hex_color":
+                    assert value == expected_value
+                else:
+                    assert value == pytest.approx(expected_value, rel=1e-9), field
+        assert RecipeCalculator.calculate_many([]) == []
+
+    def test_calculate_many_zero_volume(self, recipes):
+        user, infos = recipes
+        recipes = list(Recipe.objects.filter(user=user))
+        recipes[1].expected_beer_volume = Volume(l=0)
+        calculators = [RecipeCalculator(recipe) for recipe in recipes]
+        with pytest.raises(ArithmeticError):
+            RecipeCalculator.calculate_many(calculators)
+
+
+class TestRecipeBulkCalculation:
+    endpoint = "/api/brewery/calc/recipes/"
+
+    @pytest.fixture
+    def rows(self):
+        with open(Path(__file__).parent.joinpath("data/recipes_with_info.json")) as fin:
+            data = json.load(fin)
+        for recipe in data:
+            recipe.pop("extra_info")
+        return data
+
+    def test_calculate(self, api_client, recipes, rows):
+        user, infos = recipes
+        client = api_client()
+        client.force_authenticate(user)
+        # first request caches the user units
+        client.post(self.endpoint, data=rows[:1], format="json")
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(self.endpoint, data=rows, format="json")
+        assert response.status_code == 200, response.content
+        # only the savepoint of the request transaction
+        assert all("SAVEPOINT" in q["sql"] for q in context.captured_queries)
+        results = response.json()
+        assert len(results) == len(rows)
+        for result, recipe in zip(results, Recipe.objects.filter(user=user).order_by("pk")):
+            assert result["name"] == recipe.name
+            assert "fermentables" not in result
+            assert result["gravity"] == f"{recipe.get_metrics().gravity.plato} plato"
+            assert float(result["ibu"]) == pytest.approx(recipe.get_ibu(), abs=1e-1)
+            assert float(result["abv"]) == pytest.approx(recipe.get_abv(), abs=1e-1)
+        assert Recipe.objects.filter(user=user).count() == len(infos)
+
+    def test_invalid(self, api_client, user, rows):
+        client = api_client()
+        client.force_authenticate(user)
+        rows[1]["expected_beer_volume"] = "many liters"
+        response = client.post(self.endpoint, data=rows, format="json")
+        assert response.status_code == 400
+        assert "expected_beer_volume" in response.json()[1]
+
+    def test_zero_volume(self, api_client, user, rows):
+        client = api_client()
+        client.force_authenticate(user)
+        rows[1]["expected_beer_volume"] = "0 l"
+        response = client.post(self.endpoint, data=rows, format="json")
+        assert response.status_code == 400
+        assert "expected_beer_volume" in response.json()[1]
+
+    def test_too_many(self, api_client, user, rows, settings):
+        settings.BREWERY_CALCULATOR_MAX_RECIPES = 1
+        client = api_client()
+        client.force_authenticate(user)
+        response = client.post(self.endpoint, data=rows[:2], format="json")
+        assert response.status_code == 400
+
+
+class TestRecipePreview:
+    @pytest.fixture
+    def forms(self, recipes, style):
+        """Recipe form payloads of the test recipes, by recipe."""
+        user, infos = recipes
+        with open(Path(__file__).parent.joinpath("data/recipes_with_info.json")) as fin:
+            data = json.load(fin)
+        forms = {}
+        for recipe, row in zip(Recipe.objects.filter(user=user).order_by("pk"), data):
+            row.pop("extra_info")
+            row["style"] = str(style.pk)
+            for attr in ["fermentables", "hops", "yeasts", "extras", "mash_steps"]:
+                row[attr] = {str(i): item for i, item in enumerate(row[attr])}
+            forms[recipe] = row
+        return forms
+
+    def test_metrics(self, user, forms):
+        user_units = functions.get_user_units(user)
+        for recipe, form in forms.items():
+            metrics = preview.calculate(preview.parse(form, user_units))
+            expected = recipe.get_metrics()
+            for field in expected._fields:
+                value, expected_value = getattr(metrics, field), getattr(expected, field)
+                if hasattr(expected_value, "standard"):
+                    value, expected_value = value.standard, expected_value.standard
+                if field == "hex_color":
+                    assert value == expected_value
+                else:
+                    assert value == pytest.approx(expected_value, rel=1e-9), field
+
+    def test_view(self, client, user, forms):
+        client.force_login(user)
+        url = reverse("brewery:recipe-info")
+        recipe, form = next(iter(forms.items()))
+        client.post(url, {"form": json.dumps(form)})
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(url, {"form": json.dumps(form)})
+        assert response.status_code == 200
+        # neither the style nor ingredients are read
+        assert not [q for q in context.captured_queries if "brewery_" in q["sql"]]
+        data = response.json()
+        assert data["gravity"] == f"{round(recipe.get_gravity().plato, 1)} °P"
+        assert data["ibu"] == f"{round(recipe.get_ibu(), 1)} IBU"
+        assert data["color_hex"] == recipe.get_metrics().hex_color
+
+    def test_incomplete(self, client, user, forms):
+        client.force_login(user)
+        url = reverse("brewery:recipe-info")
+        recipe, form = next(iter(forms.items()))
+        form["style"] = ""
+        response = client.post(url, {"form": json.dumps(form)})
+        assert set(response.json().values()) == {"---"}
+        form["style"] = str(recipe.style_id)
+        form["expected_beer_volume"] = "a lot"
+        response = client.post(url, {"form": json.dumps(form)})
+        assert set(response.json().values()) == {"---"}
+        response = client.post(url, {"form": "{"})
+        assert set(response.json().values()) == {"---"}
+
+    def test_invalid_rows_skipped(self, user, forms):
+        user_units = functions.get_user_units(user)
+        recipe, form = next(iter(forms.items()))
+        metrics = preview.calculate(preview.parse(form, user_units))
+        form["hops"]["new"] = {"name": "Marynka", "amount": "", "use": "BOIL"}
+        form["fermentables"]["new"] = {"name": "", "amount": "3 kg"}
+        assert preview.calculate(preview.parse(form, user_units)) == metrics
+
+
+class TestRecipeStoredMetrics:
+    endpoint = "/api/brewery/recipes/"
+
+    def test_stored_on_create(self, recipes):
+        user, infos = recipes
+        for recipe in Recipe.objects.filter(user=user):
+            info = infos[recipe.id]
+            metrics = recipe.get_metrics()
+            assert pytest.approx(recipe.og.plato, rel=1e-4, abs=1e-1) == info["gravity"]
+            assert pytest.approx(recipe.boil_volume.l, rel=1e-4, abs=1e-1) == info["boil_volume"]
+            assert pytest.approx(recipe.fg.plato) == metrics.final_gravity.plato
+            assert pytest.approx(recipe.color.ebc) == metrics.color.ebc
+            assert pytest.approx(recipe.abv) == metrics.abv
+            assert pytest.approx(recipe.ibu) == metrics.ibu
+            assert recipe.get_stored_metrics().hex_color == metrics.hex_color
+
+    def test_stored_on_update(self, api_client, recipes):
+        user, infos = recipes
+        recipe = Recipe.objects.filter(user=user, ibu__gt=0).first()
+        client = api_client()
+        client.force_authenticate(user)
+        response = client.patch(
+            f"{self.endpoint}{recipe.id}/", data={"hops": []}, format="json"
+        )
+        assert response.status_code == 200, response.content
+        recipe.refresh_from_db()
+        assert recipe.ibu == 0
+        assert json.loads(response.content)["ibu"] == "0.0"
+
+    def test_stored_on_ingredient_delete(self, recipes):
+        user, infos = recipes
+        recipe = Recipe.objects.filter(user=user, ibu__gt=0).first()
+        for hop in recipe.hops.all():
+            hop.delete()
+        recipe.refresh_from_db()
+        assert recipe.ibu == 0
+
+    @pytest.mark.parametrize("ingredients", [True, False])
+    def test_zero_volume(self, recipes, ingredients):
+        user, infos = recipes
+        recipe = Recipe.objects.filter(user=user, ibu__gt=0).first()
+        if not ingredients:
+            for attr in ["fermentables", "hops", "yeasts"]:
+                getattr(recipe, attr).all().delete()
+        Recipe.objects.filter(pk=recipe.pk).update(expected_beer_volume=Volume(l=0))
+        recipe.refresh_from_db()
+        recipe.update_metrics()
+        recipe.refresh_from_db()
+        assert [getattr(recipe, field) for field in Recipe.METRICS_FIELDS] == [
+            None
+        ] * len(Recipe.METRICS_FIELDS)
+
+    def test_backfill_command(self, recipes):
+        from django.core.management import call_command
+
+        user, infos = recipes
+        Recipe.objects.update(og=None, abv=None, ibu=None)
+        call_command("backfill_recipe_metrics", "--chunk-size", "2", "--missing")
+        for recipe in Recipe.objects.filter(user=user):
+            info = infos[recipe.id]
+            assert pytest.approx(recipe.og.plato, rel=1e-4, abs=1e-1) == info["gravity"]
+            assert pytest.approx(recipe.abv) == recipe.get_metrics().abv
+            assert pytest.approx(recipe.ibu) == recipe.get_metrics().ibu
+
+
+class TestRecipePrint:
+    @pytest.fixture
+    def recipe(self, recipes, settings, tmp_path):
+        settings.MEDIA_ROOT = str(tmp_path)
+        user, infos = recipes
+        return Recipe.objects.filter(user=user).first()
+
+    @pytest.fixture
+    def render_task(self):
+        """Run the render task in the test, with a fake PDF writer."""
+
+        def apply_async(args, task_id):
+            return views.render_recipe_pdf(*args)
+
+        with mock.patch.object(
+            views.render_recipe_pdf, "apply_async", side_effect=apply_async
+        ) as task, mock.patch.object(
+            printing, "write_pdf", return_value=b"%PDF-1.4 test"
+        ) as write_pdf, mock.patch.object(views, "ProgressRecorder") as recorder:
+            yield task, write_pdf, recorder
+
+    def test_rendered_once(self, client, recipe, render_task):
+        task, write_pdf, recorder = render_task
+        client.force_login(recipe.user)
+        url = reverse("brewery:recipe-print", args=[recipe.pk])
+        response = client.get(url)
+        assert response.status_code == 200
+        assert "brewery/recipe/print_progress.html" in [t.name for t in response.templates]
+        assert task.call_count == 1
+        assert recorder.return_value.set_progress.call_args[0][:2] == (3, 3)
+        html = write_pdf.call_args[0][0]
+        assert recipe.name in html
+        response = client.get(url)
+        assert response["Content-Type"] == "application/pdf"
+        assert b"".join(response.streaming_content) == b"%PDF-1.4 test"
+        assert task.call_count == 1
+
+    def test_rendered_again_on_change(self, client, recipe, render_task, tmp_path):
+        task, write_pdf, recorder = render_task
+        client.force_login(recipe.user)
+        url = reverse("brewery:recipe-print", args=[recipe.pk])
+        client.get(url)
+        baker.make(IngredientExtra, recipe=recipe)
+        response = client.get(url)
+        assert response.status_code == 200
+        assert task.call_count == 2
+        # the outdated PDF is deleted
+        assert len(list(tmp_path.joinpath(f"recipes/pdf/{recipe.pk}").iterdir())) == 1
+
+    def test_pending_task_shared(self, client, recipe):
+        client.force_login(recipe.user)
+        url = reverse("brewery:recipe-print", args=[recipe.pk])
+        with mock.patch.object(views.render_recipe_pdf, "apply_async") as task:
+            first = client.get(url)
+            second = client.get(url)
+        assert task.call_count == 1
+        assert first.context["task_id"] == second.context["task_id"]
+
+
+class TestRecipeListView:
+    def test_constant_queries(self, client, user, django_assert_num_queries):
+        client.force_login(user)
+        url = reverse("brewery:recipe-list")
+        baker.make(Recipe, user=user)
+        # first request caches the user units
+        client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        assert response.status_code == 200
+        baker.make(Recipe, user=user, _quantity=9)
+        with django_assert_num_queries(len(context.captured_queries)):
+            response = client.get(url)
+        assert len(response.context["recipes"]) == 10
+
+    def test_out_of_range_page(self, client, user):
+        client.force_login(user)
+        baker.make(Recipe, user=user, _quantity=12)
+        response = client.get(reverse("brewery:recipe-list"), {"page": 5})
+        assert response.status_code == 200
+        assert response.context["page_obj"].number == 2
+
+
+class TestRecipeImport:
+    @pytest.fixture
+    def rows(self):
+        with open(Path(__file__).parent.joinpath("data/recipes_with_info.json")) as fin:
+            data = json.load(fin)
+        for recipe in data:
+            recipe.pop("extra_info")
+            recipe["style"] = "pale lager"
+        return data
+
+    def test_import(self, user, style, rows):
+        rows = rows * 3
+        assert importers.import_recipes(rows, user.username, chunk_size=4) == 15
+        recipes = Recipe.objects.filter(user=user)
+        assert recipes.count() == 15
+        assert recipes.filter(style=style, og__isnull=False).count() == 15
+        assert recipes.values("slug").distinct().count() == 15
+        assert IngredientHop.objects.filter(recipe__user=user).count() == 3 * sum(
+            len(row["hops"]) for row in rows[:5]
+        )
+
+    def test_import_beerxml_stream(self, user, style):
+        path = Path(__file__).parent.joinpath("data/recipes.xml")
+        with open(path, "rb") as xml_file:
+            beers = functions.iter_beerxml(xml_file)
+            assert next(beers)["name"] == "Bohemian Pilsner"
+            assert importers.import_recipes(beers, user.username, chunk_size=1) == 1
+        recipe = Recipe.objects.get(user=user)
+        assert recipe.name == "Dark Lager"
+        assert recipe.style == style
+        assert recipe.fermentables.count() == 2
+
+    @pytest.mark.parametrize(
+        "content, started",
+        [
+            (b"<RECIPES><RECIPE><NAME>Pils</NAME></RECIPE></RECIPES>", True),
+            (b"name,style\nPils,lager\n", False),
+            (b"<STYLES><STYLE/></STYLES>", False),
+        ],
+    )
+    def test_import_beerxml_upload(self, client, user, content, started):
+        client.force_login(user)
+        upload = SimpleUploadedFile("recipes.xml", content)
+        with mock.patch.object(views.import_beerxml_recipes, "delay") as delay:
+            response = client.post(
+                reverse("brewery:recipe-import"),
+                {"file": upload, "filetype": "beerxml"},
+            )
+        assert response.status_code == 302
+        assert delay.called == started
+        errors = [
+            str(message)
+            for message in get_messages(response.wsgi_request)
+            if message.level_tag == "error"
+        ]
+        assert bool(errors) != started
+        if started:
+            default_storage.delete(delay.call_args[0][0])
+
+    @pytest.mark.parametrize("min_rows, progress", [(0, True), (2, False)])
+    def test_import_json_upload(self, client, user, rows, settings, min_rows, progress):
+        settings.BREWERY_PARALLEL_IMPORT_MIN_ROWS = min_rows
+        client.force_login(user)
+        upload = SimpleUploadedFile("recipes.json", json.dumps(rows).encode())
+        with mock.patch.object(views.import_recipes, "delay") as delay, mock.patch.object(
+            views, "import_recipes_in_parallel"
+        ) as parallel:
+            response = client.post(
+                reverse("brewery:recipe-import"), {"file": upload, "filetype": "json"}
+            )
+        assert response.status_code == 302
+        assert delay.called == progress
+        assert parallel.called != progress
+        # only a task recording progress gets a progress bar
+        tags = [message.extra_tags for message in get_messages(response.wsgi_request)]
+        assert ("task_id" in tags) == progress
+
+    def test_import_invalid_chunk(self, user, style, rows):
+        rows[3]["style"] = "no such style"
+        with pytest.raises(Exception):
+            importers.import_recipes(rows, user.username, chunk_size=2)
+        # the first chunk is imported, the failing one is not
+        assert Recipe.objects.filter(user=user).count() == 2
+
+
+class TestRecipeExport:
+    @pytest.fixture
+    def rows(self, user, style):
+        with open(Path(__file__).parent.joinpath("data/recipes_with_info.json")) as fin:
+            data = json.load(fin)
+        for recipe in data:
+            recipe.pop("extra_info")
+            recipe["style"] = "pale lager"
+        importers.import_recipes(data, user, chunk_size=2)
+        return data
+
+    def export(self, client, user, filetype):
+        client.force_login(user)
+        response = client.get(reverse("brewery:recipe-export"), {"filetype": filetype})
+        assert response.status_code == 200
+        assert response.streaming
+        return b"".join(response.streaming_content)
+
+    def test_export_json(self, client, user, other_user, rows):
+        content = self.export(client, user, "json")
+        exported = json.loads(content)
+        assert [recipe["name"] for recipe in exported] == [row["name"] for row in rows]
+        assert "abv" not in exported[0]
+        assert importers.import_recipes(exported, other_user) == len(rows)
+        for recipe, copy in zip(
+            Recipe.objects.filter(user=user).order_by("pk"),
+            Recipe.objects.filter(user=other_user).order_by("pk"),
+        ):
+            assert copy.og == pytest.approx(recipe.og)
+            assert copy.ibu == pytest.approx(recipe.ibu)
+
+    def test_export_beerxml(self, client, user, other_user, rows):
+        content = self.export(client, user, "beerxml")
+        exported = list(functions.iter_beerxml(io.BytesIO(content)))
+        assert [recipe["name"] for recipe in exported] == [row["name"] for row in rows]
+        assert importers.import_recipes(exported, other_user) == len(rows)
+        for recipe, copy in zip(
+            Recipe.objects.filter(user=user).order_by("pk"),
+            Recipe.objects.filter(user=other_user).order_by("pk"),
+        ):
+            for attr in ("fermentables", "hops", "yeasts", "extras", "mash_steps"):
+                assert getattr(copy, attr).count() == getattr(recipe, attr).count()
+            for hop, hop_copy in zip(recipe.hops.all(), copy.hops.all()):
+                assert hop_copy.amount.kg == pytest.approx(hop.amount.kg)
+                assert hop_copy.time == hop.time
+                assert hop_copy.time_unit == hop.time_unit
+
+    def test_export_chunks_queries(self, user, rows, django_assert_num_queries):
+        recipes = exporters.get_recipes(user)
+        # pks + per chunk: recipes with users and styles, five prefetches
+        with django_assert_num_queries(1 + 3 * 6):
+            chunks = list(exporters.iter_chunks(recipes, chunk_size=2))
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
@@ -0,0 +1,222 @@
+"""
+Compact time series of fermentation readings sent by digital hydrometers.
+
+Readings of a batch are kept in chunks (`ReadingChunk`), one per time
+window, with the values packed in little-endian arrays: a reading takes
+16 bytes, a day of readings every 15 minutes is one row of 1.5 kB.
+Hourly and daily rollups (count, sum, minimum and maximum of every value)
+are chunks as well, `append` updates them with the new readings only.
+
+Values are standard values of the measures, times are seconds since the
+epoch. Windows and buckets are aligned in UTC.
+"""
+import datetime
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from brivo.brewery import models
+
+
+VALUES = ("gravity", "beer_temperature", "ambient_temperature")
+
+# seconds covered by one chunk of a resolution
+WINDOWS = {"RAW": 24 * 3600, "HOUR": 7 * 24 * 3600, "DAY": 364 * 24 * 3600}
+# seconds covered by one bucket of a rollup
+BUCKETS = {"HOUR": 3600, "DAY": 24 * 3600}
+
+ROLLUP_FIELDS = (("count", "<u4"), ("sum", "<f8"), ("min", "<f4"), ("max", "<f4"))
+
+
+def _fields(resolution):
+    if resolution == "RAW":
+        return [(name, "<f4") for name in VALUES]
+    return [
+        (f"{name}_{field}", dtype) for name in VALUES for field, dtype in ROLLUP_FIELDS
+    ]
+
+
+# stored records, times relative to the start of the chunk
+PACKED = {
+    resolution: np.dtype([("time", "<u4")] + _fields(resolution))
+    for resolution in WINDOWS
+}
+# records in memory
+RECORDS = {
+    resolution: np.dtype(
+        [("time", "<i8")] + [(name, "<f8") for name, _ in _fields(resolution)]
+    )
+    for resolution in WINDOWS
+}
+
+
+def _datetime(timestamp):
+    return datetime.datetime.fromtimestamp(int(timestamp), tz=datetime.timezone.utc)
+
+
+def _unpack(data, start, resolution):
+    records = np.frombuffer(data, dtype=PACKED[resolution]).astype(RECORDS[resolution])
+    records["time"] += int(start.timestamp())
+    return records
+
+
+def _pack(records, start, resolution):
+    records = records.copy()
+    records["time"] -= start
+    return records.astype(PACKED[resolution]).tobytes()
+
+
+def _reduce(records):
+    """Combine rollup records of the same bucket."""
+    times, index = np.unique(records["time"], return_inverse=True)
+    reduced = np.zeros(len(times), records.dtype)
+    reduced["time"] = times
+    for name in VALUES:
+        for field in ("count", "sum"):
+            key = f"{name}_{field}"
+            reduced[key] = np.bincount(index, weights=records[key], minlength=len(times))
+        for field, ufunc in (("min", np.fmin), ("max", np.fmax)):
+            key = f"{name}_{field}"
+            column = np.full(len(times), np.nan)
+            ufunc.at(column, index, records[key])
+            reduced[key] = column
+    return reduced
+
+
+def _rollup(raw, resolution):
+    """Return rollup records of readings."""
+    records = np.zeros(len(raw), RECORDS[resolution])
+    records["time"] = raw["time"] - raw["time"] % BUCKETS[resolution]
+    for name in VALUES:
+        known = ~np.isnan(raw[name])
+        records[f"{name}_count"] = known
+        records[f"{name}_sum"] = np.where(known, raw[name], 0.0)
+        records[f"{name}_min"] = raw[name]
+        records[f"{name}_max"] = raw[name]
+    return _reduce(records)
+
+
+def _merge_readings(stored, new):
+    """Return all readings by time and the new ones, stored times are kept."""
+    added = new[~np.isin(new["time"], stored["time"])]
+    merged = np.concatenate([stored, added])
+    return merged[np.argsort(merged["time"], kind="stable")], added
+
+
+def _merge_rollups(stored, new):
+    return _reduce(np.concatenate([stored, new])), new
+
+
+def _get_chunks(batch, times):
+    """Return chunks of all resolutions with the times, by resolution and start.
+
+    Missing chunks are created empty first, so concurrent requests wait
+    for each other on the row locks instead of inserting the same chunk.
+    """
+    keys = [
+        (resolution, _datetime(start))
+        for resolution, window in WINDOWS.items()
+        for start in np.unique(times - times % window).tolist()
+    ]
+    models.ReadingChunk.objects.bulk_create(
+        [
+            models.ReadingChunk(batch=batch, resolution=resolution, start=start)
+            for resolution, start in keys
+        ],
+        ignore_conflicts=True,
+    )
+    condition = Q()
+    for resolution, start in keys:
+        condition |= Q(resolution=resolution, start=start)
+    chunks = models.ReadingChunk.objects.select_for_update().filter(
+        condition, batch=batch
+    )
+    return {(chunk.resolution, int(chunk.start.timestamp())): chunk for chunk in chunks}
+
+
+def _merge(chunks, resolution, records, merge):
+    """Merge records of a resolution into the chunks.
+
+    Returns the changed chunks and the records which were added.
+    """
+    window = WINDOWS[resolution]
+    starts = records["time"] - records["time"] % window
+    changed = []
+    added = [records[:0]]
+    for start in np.unique(starts).tolist():
+        chunk = chunks[(resolution, start)]
+        stored = _unpack(chunk.data, chunk.start, resolution)
+        merged, new = merge(stored, records[starts == start])
+        if not len(new):
+            continue
+        chunk.count = len(merged)
+        chunk.data = _pack(merged, start, resolution)
+        changed.append(chunk)
+        added.append(new)
+    return changed, np.concatenate(added)
+
+
+@transaction.atomic
+def append(batch, readings):
+    """Add readings to the time series of the batch.
+
+    `readings` are dicts of the `sample_time` and the standard values of
+    `VALUES`, missing values are None or left out. Readings at a time
+    which is already stored are ignored, the rollups are updated with
+    the new readings. Returns the number of new readings.
+    """
+    if not readings:
+        return 0
+    raw = np.zeros(len(readings), RECORDS["RAW"])
+    raw["time"] = [int(reading["sample_time"].timestamp()) for reading in readings]
+    for name in VALUES:
+        raw[name] = np.array([reading.get(name) for reading in readings], dtype=float)
+    raw = raw[np.unique(raw["time"], return_index=True)[1]]
+    # chunks of all resolutions are read and written together
+    chunks = _get_chunks(batch, raw["time"])
+    changed, added = _merge(chunks, "RAW", raw, _merge_readings)
+    if len(added):
+        for resolution in BUCKETS:
+            changed += _merge(
+                chunks, resolution, _rollup(added, resolution), _merge_rollups
+            )[0]
+    models.ReadingChunk.objects.bulk_update(changed, ["count", "data"])
+    return len(added)
+
+
+def get_series(batch, resolution="RAW", start=None, end=None):
+    """Return the readings or the rollups of the batch from `start` to `end`.
+
+    The result are columns of numpy arrays: `time` and, for readings, the
+    values of `VALUES`. Rollups have the mean, minimum, maximum and count
+    of every value (`gravity`, `gravity_min`, `gravity_max`,
+    `gravity_count`, ...). Missing values are NaN, `end` is excluded.
+    """
+    chunks = models.ReadingChunk.objects.filter(batch=batch, resolution=resolution)
+    if start is not None:
+        window = datetime.timedelta(seconds=WINDOWS[resolution])
+        chunks = chunks.filter(start__gt=start - window)
+    if end is not None:
+        chunks = chunks.filter(start__lt=end)
+    records = [
+        _unpack(data, chunk_start, resolution)
+        for chunk_start, data in chunks.order_by("start").values_list("start", "data")
+    ]
+    records = np.concatenate(records) if records else np.zeros(0, RECORDS[resolution])
+    if start is not None:
+        records = records[records["time"] >= start.timestamp()]
+    if end is not None:
+        records = records[records["time"] < end.timestamp()]
+    columns = {"time": records["time"]}
+    for name in VALUES:
+        if resolution == "RAW":
+            columns[name] = records[name]
+            continue
+        count = records[f"{name}_count"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            columns[name] = records[f"{name}_sum"] / count
+        columns[f"{name}_min"] = records[f"{name}_min"]
+        columns[f"{name}_max"] = records[f"{name}_max"]
+        columns[f"{name}_count"] = count.astype(int)
+    return columns
@@ -107,6 +107,8 @@ urlpatterns = [
     ),
     path('recipe/import', views.RecipeImportView.as_view(),
          name='recipe-import'),
+    path('recipe/export', views.RecipeExportView.as_view(),
+         name='recipe-export'),
 
     # Batches
     path('batch', views.BatchListView.as_view(),
@@ -121,6 +123,8 @@ urlpatterns = [
          name='batch-delete'),
     path('batch/import', views.BatchImportView.as_view(),
          name='batch-import'),
+    path('batch/export', views.BatchExportView.as_view(),
+         name='batch-export'),
     path('batch/<int:batch_pk>/fermentation_check', views.FermentationCheckCreateView.as_view(),
          name='batch-fermentation_check-create'),
     path('batch/<int:batch_pk>/fermentation_check/<int:pk>/update', views.FermentationCheckUpdateView.as_view(),
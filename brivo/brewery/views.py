@@ -1,18 +1,29 @@
 import re
 import time
 import json
+import uuid
 import datetime, pytz
 from django.conf import settings
+from django.core.files.storage import default_storage
 from django.templatetags.static import static
 from django.db import transaction
-from django.http import request, JsonResponse, HttpResponseNotAllowed
+from django.db.models import prefetch_related_objects
+from django.http import (
+    request,
+    FileResponse,
+    JsonResponse,
+    HttpResponseNotAllowed,
+    StreamingHttpResponse,
+)
+from django.utils import translation
 from django.utils.decorators import method_decorator
+from django.utils.translation import get_language
 from django.forms import modelform_factory
 from django.shortcuts import redirect, render
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.urls import reverse, reverse_lazy
-from django.views.generic import FormView, TemplateView, ListView
+from django.views.generic import FormView, TemplateView, ListView, View
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.views.generic.detail import DetailView
@@ -24,8 +35,7 @@ from bootstrap_modal_forms.generic import (
     BSModalReadView,
     BSModalDeleteView,
 )
-from django_weasyprint import WeasyTemplateResponseMixin
-from celery import shared_task
+from celery import chord, shared_task
 from celery_progress.backend import ProgressRecorder
 from celery.exceptions import SoftTimeLimitExceeded
 
@@ -57,36 +67,11 @@ from brivo.brewery.models import (
     Extra,
     Style,
     Recipe,
-    IngredientFermentable,
-    IngredientHop,
-    IngredientYeast,
-    IngredientExtra,
-    MashStep,
+    defer_metrics_update,
 )
-from brivo.brewery.api import serializers
 from brivo.users.models import User
 from brivo.brewery import filters
-
-
-ingredients_map = {
-    "fermentables": IngredientFermentable,
-    "hops": IngredientHop,
-    "extras": IngredientExtra,
-    "mash_steps": MashStep,
-    "yeasts": IngredientYeast,
-}
-
-serializers_map = {
-    "fermentables": serializers.IngredientFermentableSerializer,
-    "hops": serializers.IngredientHopSerializer,
-    "extras": serializers.IngredientExtraSerializer,
-    "mash_steps": serializers.MashStepSerializer,
-    "yeasts": serializers.IngredientYeastSerializer,
-}
-
-
-def _is_valid(v, c):
-    return c(data=v).is_valid()
+from brivo.brewery import catalog, conditional, exporters, importers, preview, printing
 
 
 def get_repr(obj, attr=None, prec=1, repr_="", default="---"):
@@ -100,78 +85,72 @@ def get_repr(obj, attr=None, prec=1, repr_="", default="---"):
     return data
 
 
+EMPTY_RECIPE_INFO = {
+    "boil_volume": "---",
+    "primary_volume": "---",
+    "secondary_volume": "---",
+    "color": "---",
+    "color_hex": "---",
+    "preboil_gravity": "---",
+    "gravity": "---",
+    "abv": "---",
+    "ibu": "---",
+    "bitterness_ratio": "---",
+}
+
+
 def get_recipe_data(request):
-    form = request.POST.get("form", None)
-    data = functions.clean_data(json.loads(form))
-    for f in ingredients_map.keys():
-        data[f] = [v for v in data[f].values() if _is_valid(v, serializers_map[f])]
-    if not data["name"]:
-        data["name"] = "tmpname"
-    if not data["style"] or not data["type"]:
-        return JsonResponse(
-            {
-                "boil_volume": "---",
-                "primary_volume": "---",
-                "secondary_volume": "---",
-                "color": "---",
-                "color_hex": "---",
-                "preboil_gravity": "---",
-                "gravity": "---",
-                "abv": "---",
-                "ibu": "---",
-                "bitterness_ratio": "---",
-            }
-        )
-    serializer = serializers.RecipeSerializer(data=data, user=request.user)
-    if not serializer.is_valid():
-        raise Exception(serializer.errors)
-    ingredients = {}
-    for f, c in ingredients_map.items():
-        serializer.validated_data[f] = [c(**v) for v in serializer.validated_data[f]]
-        # del serializer.validated_data[f]
-    recipe = Recipe(user=request.user, **serializer.validated_data)
+    """Metrics of the recipe form, sent on every change (see `preview`)."""
+    try:
+        data = json.loads(request.POST.get("form", ""))
+    except ValueError:
+        data = None
     user_units = functions.get_user_units(request.user)
+    values = preview.parse(data, user_units) if isinstance(data, dict) else None
+    if values is None:
+        return JsonResponse(EMPTY_RECIPE_INFO)
+    try:
+        metrics = preview.calculate(values)
+    except ArithmeticError:
+        return JsonResponse(EMPTY_RECIPE_INFO)
     boil_volume = get_repr(
-        obj=recipe.get_boil_volume(),
+        obj=metrics.boil_volume,
         attr=user_units["volume_units"],
         prec=2,
         repr_=user_units["volume_units"],
     )
     primary_volume = get_repr(
-        obj=recipe.get_primary_volume(),
+        obj=metrics.primary_volume,
         attr=user_units["volume_units"],
         prec=2,
         repr_=user_units["volume_units"],
     )
     secondary_volume = get_repr(
-        obj=recipe.get_secondary_volume(),
+        obj=metrics.secondary_volume,
         attr=user_units["volume_units"],
         prec=2,
         repr_=user_units["volume_units"],
     )
     color = get_repr(
-        obj=recipe.get_color(),
+        obj=metrics.color,
         attr=user_units["color_units"],
         prec=1,
         repr_=user_units["color_units"].upper(),
     )
-    try:
-        color_hex = functions.get_hex_color_from_srm(recipe.get_color().srm)
-    except Exception as exc:
-        color_hex = "#FFFFFF"
+    color_hex = metrics.hex_color
     if user_units["gravity_units"] == "plato":
         preboil_gravity = get_repr(
-            obj=recipe.get_preboil_gravity(), attr="plato", prec=1, repr_="°P"
+            obj=metrics.preboil_gravity, attr="plato", prec=1, repr_="°P"
         )
-        gravity = get_repr(obj=recipe.get_gravity(), attr="plato", prec=1, repr_="°P")
+        gravity = get_repr(obj=metrics.gravity, attr="plato", prec=1, repr_="°P")
     else:
         preboil_gravity = get_repr(
-            obj=recipe.get_preboil_gravity(), attr="sg", prec=1, repr_="SG"
+            obj=metrics.preboil_gravity, attr="sg", prec=1, repr_="SG"
         )
-        gravity = get_repr(obj=recipe.get_gravity(), attr="sg", prec=1, repr_="")
-    abv = get_repr(obj=recipe.get_abv(), prec=1, repr_="%")
-    ibu = get_repr(obj=recipe.get_ibu(), prec=1, repr_="IBU")
-    bitterness_ratio = get_repr(obj=recipe.get_bitterness_ratio(), prec=1, repr_="")
+        gravity = get_repr(obj=metrics.gravity, attr="sg", prec=1, repr_="")
+    abv = get_repr(obj=metrics.abv, prec=1, repr_="%")
+    ibu = get_repr(obj=metrics.ibu, prec=1, repr_="IBU")
+    bitterness_ratio = get_repr(obj=metrics.bitterness_ratio, prec=1, repr_="")
     data = {
         "boil_volume": boil_volume,
         "primary_volume": primary_volume,
@@ -193,11 +172,79 @@ class StaffRequiredMixin(UserPassesTestMixin):
 
 
 class LoginAndOwnershipRequiredMixin(UserPassesTestMixin, LoginRequiredMixin):
+    def get_object(self, queryset=None):
+        # test_func and the view both need the object, fetch it only once
+        if queryset is not None:
+            return super().get_object(queryset)
+        if getattr(self, "_owned_object", None) is None:
+            self._owned_object = super().get_object()
+        return self._owned_object
+
     def test_func(self):
         obj = self.get_object()
         return self.request.user == obj.user
 
 
+class ConditionalDetailMixin:
+    """Answer GET of an unchanged object with 304 Not Modified.
+
+    Only the object is read (see `brivo.brewery.conditional`), the page
+    is rendered only when the client does not have it.
+    """
+
+    def get_etag_parts(self):
+        """Other data than the object shown on the page."""
+        return ()
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+
+        def render():
+            return self.render_to_response(self.get_context_data(object=self.object))
+
+        return conditional.conditional_response(
+            request,
+            render,
+            conditional.object_etag(request, self.object, *self.get_etag_parts()),
+            self.object.updated_at,
+        )
+
+
+class CatalogDetailMixin(ConditionalDetailMixin):
+    def get_etag_parts(self):
+        return (catalog.get_version(self.model),)
+
+
+class FilteredListMixin:
+    """ListView paginating the filtered queryset only once.
+
+    The filterset is kept for the context and out-of-range pages show
+    the last page instead of 404.
+    """
+
+    filterset_class = None
+
+    def get_base_queryset(self):
+        return self.model.objects.filter(user=self.request.user)
+
+    def get_queryset(self):
+        self.filterset = self.filterset_class(
+            self.request.GET, queryset=self.get_base_queryset()
+        )
+        return self.filterset.qs.order_by(self.ordering)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.get_paginator(queryset, page_size)
+        page = paginator.get_page(self.request.GET.get(self.page_kwarg))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["user"] = self.request.user
+        context["filter"] = self.filterset
+        return context
+
+
 class BaseAutocomplete(LoginRequiredMixin, ListView):
     http_method_allowed = ("GET", "POST")
 
@@ -209,12 +256,9 @@ class BaseAutocomplete(LoginRequiredMixin, ListView):
         return super(ListView, self).dispatch(request, *args, **kwargs)
 
     def get_queryset(self):
-        qs = self.model.objects.all()
-
         if self.q:
-            qs = qs.filter(name__icontains=self.q)
-
-        return qs
+            return catalog.search(self.model, self.q)
+        return catalog.get_objects(self.model)
 
     def render_to_response(self, context):
         """Return a JSON response in correct format."""
@@ -234,14 +278,13 @@ class FermentableAutocomplete(BaseAutocomplete):
 
     def get_results(self, context):
         """Return data for the 'results' key of the response."""
+        color_units = functions.get_user_units(self.request.user)["color_units"]
         return [
             {
                 "data": {
                     "name": result.name,
                     "type": result.type,
-                    "color": round(getattr(
-                        result.color, self.request.user.profile.color_units.lower()
-                    ), 1),
+                    "color": round(getattr(result.color, color_units), 1),
                     "extraction": round(result.extraction, 2),
                 },
                 "value": result.name,
@@ -348,19 +391,9 @@ class BatchView(UserPassesTestMixin, FormView):
         if not form.instance.name:
             form.instance.name = form.instance.recipe.name
         if not form.instance.batch_number:
-
-            def _get_batch_number():
-                batches = Batch.objects.filter(user=self.request.user).order_by(
-                    "-batch_number"
-                )
-                if len(batches) > 0:
-                    num = batches[0].batch_number
-                    return num + 1
-                else:
-                    # this is the first batch ever
-                    return 1
-
-            form.instance.batch_number = _get_batch_number()
+            form.instance.batch_number = Batch.allocate_batch_number(
+                self.request.user
+            )
         if not previous_stage:
             form.save()  # This will save the underlying instance.
         else:
@@ -479,33 +512,17 @@ class FermentationCheckDeleteView(LoginRequiredMixin, BSModalDeleteView):
         return reverse("brewery:batch-update", args=[self.batch.pk])
 
 
-class BatchListView(LoginRequiredMixin, ListView):
+class BatchListView(LoginRequiredMixin, FilteredListMixin, ListView):
     model = Batch
     template_name = "brewery/batch/list.html"
     context_object_name = "batches"
     paginate_by = 10
+    filterset_class = filters.BatchFilter
+    ordering = "-updated_at"
 
-    def get_context_data(self, **kwargs):
-        context = super(BatchListView, self).get_context_data(**kwargs)
-        batches = self.get_queryset()
-        page = self.request.GET.get("page")
-        paginator = Paginator(batches, self.paginate_by)
-        try:
-            batches = paginator.page(page)
-        except PageNotAnInteger:
-            batches = paginator.page(1)
-        except EmptyPage:
-            batches = paginator.page(paginator.num_pages)
-        context["batches"] = batches
-        context["user"] = User.objects.get(id=self.request.user.id)
-        context["filter"] = filters.BatchFilter(self.request.GET)
-        return context
-
-    def get_queryset(self):
-        qs = self.model.objects.filter(user=self.request.user)
-        filtered_batches = filters.BatchFilter(self.request.GET, queryset=qs)
-        qs = filtered_batches.qs.order_by("-updated_at")
-        return qs
+    def get_base_queryset(self):
+        # recipe color is read from the stored recipe metrics
+        return super().get_base_queryset().select_related("recipe")
 
 
 class BatchDetailView(LoginAndOwnershipRequiredMixin, BSModalReadView):
@@ -527,38 +544,12 @@ class BatchDeleteView(LoginAndOwnershipRequiredMixin, BSModalDeleteView):
     success_url = reverse_lazy("brewery:batch-list")
 
 
-def import_batch(batch, user):
-    batch_data = functions.clean_data(batch)
-    user = User.objects.get(username=user)
-    recipe = []
-    if isinstance(batch_data["recipe"], str):  # this is probably name not pk
-        recipe = Recipe.objects.filter(name__icontains=batch_data["recipe"])
-    else:
-        recipe = Recipe.objects.filter(pk=batch_data["recipe"])
-    if recipe.count() == 0:
-        raise Exception(
-            f"Did not fount a recipe '{batch_data['recipe']}' for '{batch_data['name']}'"
-        )
-    batch_data["recipe"] = recipe[0].id
-    serializer = serializers.BatchSerializer(data=batch_data, user=user)
-    if serializer.is_valid():
-        serializer.save()
-    else:
-        raise Exception(serializer.errors)
-
-
 @shared_task(bind=True)
-def import_batches(self, batches, user):
-    progress_recorder = ProgressRecorder(self)
-    uploaded = 0
-    number_of_batches = len(batches)
-    for batch in batches:
-        import_batch(batch, user)
-        uploaded += 1
-        progress_recorder.set_progress(
-            uploaded, number_of_batches, f"Uploaded {batch['name']}"
-        )
-    return uploaded
+def import_batches(self, batches, user, chunk_size=importers.IMPORT_CHUNK_SIZE):
+    progress = importers.ThrottledProgress(ProgressRecorder(self), len(batches))
+    return importers.import_batches(
+        batches, user, chunk_size=chunk_size, progress=progress
+    )
 
 
 class BatchImportView(LoginRequiredMixin, FormView):
@@ -584,6 +575,42 @@ class BatchImportView(LoginRequiredMixin, FormView):
             return render(request, self.template_name, {"form": form})
 
 
+class ExportView(LoginRequiredMixin, View):
+    """Stream the user's objects as a file download."""
+
+    filename = None
+    content_types = {
+        "json": "application/json",
+        "beerxml": "application/xml",
+    }
+    extensions = {"json": "json", "beerxml": "xml"}
+
+    def get_filetype(self):
+        filetype = self.request.GET.get("filetype", "json")
+        return filetype if filetype in self.content_types else "json"
+
+    def get_content(self, filetype):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        filetype = self.get_filetype()
+        response = StreamingHttpResponse(
+            self.get_content(filetype), content_type=self.content_types[filetype]
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{self.filename}.{self.extensions[filetype]}"'
+        )
+        return response
+
+
+class BatchExportView(ExportView):
+    filename = "batches"
+    content_types = {"json": "application/json"}
+
+    def get_content(self, filetype):
+        return exporters.export_batches(self.request.user)
+
+
 class FermentableListView(LoginRequiredMixin, ListView):
     model = Fermentable
     template_name = "brewery/fermentable/list.html"
@@ -607,9 +634,7 @@ class FermentableListView(LoginRequiredMixin, ListView):
         return context
 
     def get_queryset(self):
-        qs = self.model.objects.all()
-        filtered_hops = filters.FermentableFilter(self.request.GET, queryset=qs)
-        return filtered_hops.qs
+        return catalog.filter_catalog(filters.FermentableFilter, self.request.GET)
 
 
 class FermentableCreateView(LoginRequiredMixin, StaffRequiredMixin, BSModalCreateView):
@@ -619,7 +644,7 @@ class FermentableCreateView(LoginRequiredMixin, StaffRequiredMixin, BSModalCreat
     success_url = reverse_lazy("brewery:fermentable-list")
 
 
-class FermentableDetailView(LoginRequiredMixin, BSModalReadView):
+class FermentableDetailView(LoginRequiredMixin, CatalogDetailMixin, BSModalReadView):
     model = Fermentable
     template_name = "brewery/fermentable/detail.html"
     context_object_name = "fermentable"
@@ -669,9 +694,7 @@ class HopListView(LoginRequiredMixin, ListView):
         return context
 
     def get_queryset(self):
-        qs = self.model.objects.all()
-        filtered_hops = filters.HopFilter(self.request.GET, queryset=qs)
-        return filtered_hops.qs
+        return catalog.filter_catalog(filters.HopFilter, self.request.GET)
 
 
 class HopCreateView(LoginRequiredMixin, StaffRequiredMixin, BSModalCreateView):
@@ -681,7 +704,7 @@ class HopCreateView(LoginRequiredMixin, StaffRequiredMixin, BSModalCreateView):
     success_url = reverse_lazy("brewery:hop-list")
 
 
-class HopDetailView(LoginRequiredMixin, BSModalReadView):
+class HopDetailView(LoginRequiredMixin, CatalogDetailMixin, BSModalReadView):
     model = Hop
     template_name = "brewery/hop/detail.html"
     context_object_name = "hop"
@@ -729,9 +752,7 @@ class YeastListView(LoginRequiredMixin, ListView):
         return context
 
     def get_queryset(self):
-        qs = self.model.objects.all()
-        filtered_yeasts = filters.YeastFilter(self.request.GET, queryset=qs)
-        return filtered_yeasts.qs
+        return catalog.filter_catalog(filters.YeastFilter, self.request.GET)
 
 
 class YeastCreateView(LoginRequiredMixin, StaffRequiredMixin, BSModalCreateView):
@@ -741,7 +762,7 @@ class YeastCreateView(LoginRequiredMixin, StaffRequiredMixin, BSModalCreateView)
     success_url = reverse_lazy("brewery:yeast-list")
 
 
-class YeastDetailView(LoginRequiredMixin, BSModalReadView):
+class YeastDetailView(LoginRequiredMixin, CatalogDetailMixin, BSModalReadView):
     model = Yeast
     template_name = "brewery/yeast/detail.html"
     context_object_name = "yeast"
@@ -789,9 +810,7 @@ class ExtraListView(LoginRequiredMixin, ListView):
         return context
 
     def get_queryset(self):
-        qs = self.model.objects.all()
-        filtered_extras = filters.ExtraFilter(self.request.GET, queryset=qs)
-        return filtered_extras.qs
+        return catalog.filter_catalog(filters.ExtraFilter, self.request.GET)
 
 
 class ExtraCreateView(LoginRequiredMixin, StaffRequiredMixin, BSModalCreateView):
@@ -801,7 +820,7 @@ class ExtraCreateView(LoginRequiredMixin, StaffRequiredMixin, BSModalCreateView)
     success_url = reverse_lazy("brewery:extra-list")
 
 
-class ExtraDetailView(LoginRequiredMixin, BSModalReadView):
+class ExtraDetailView(LoginRequiredMixin, CatalogDetailMixin, BSModalReadView):
     model = Extra
     template_name = "brewery/extra/detail.html"
     context_object_name = "extra"
@@ -849,9 +868,7 @@ class StyleListView(LoginRequiredMixin, ListView):
         return context
 
     def get_queryset(self):
-        qs = self.model.objects.all()
-        filtered_styles = filters.StyleFilter(self.request.GET, queryset=qs)
-        return filtered_styles.qs
+        return catalog.filter_catalog(filters.StyleFilter, self.request.GET)
 
 
 class StyleCreateView(LoginRequiredMixin, StaffRequiredMixin, BSModalCreateView):
@@ -861,7 +878,7 @@ class StyleCreateView(LoginRequiredMixin, StaffRequiredMixin, BSModalCreateView)
     success_url = reverse_lazy("brewery:style-list")
 
 
-class StyleDetailView(LoginRequiredMixin, BSModalReadView):
+class StyleDetailView(LoginRequiredMixin, CatalogDetailMixin, BSModalReadView):
     model = Style
     template_name = "brewery/style/detail.html"
     context_object_name = "style"
@@ -872,27 +889,36 @@ class StyleInfoView(LoginRequiredMixin, BSModalReadView):
     model = Style
     context_object_name = "style"
 
+    def get_object(self, queryset=None):
+        snapshot = catalog.get_snapshot(Style)
+        if snapshot is not None and self.kwargs["pk"] in snapshot.by_pk:
+            return snapshot.by_pk[self.kwargs["pk"]]
+        return super().get_object(queryset)
+
     def get_context_data(self, **kwargs):
         context = super(StyleInfoView, self).get_context_data(**kwargs)
         return context
 
     def render_to_response(self, context):
         """Return a JSON response in correct format."""
-        if self.request.user.profile.gravity_units.lower() == "plato":
+        units = functions.get_user_units(self.request.user)
+        gravity_units = units["gravity_units"]
+        color_units = units["color_units"]
+        if gravity_units == "plato":
             gprec = 1
         else:
             gprec = 4
         return JsonResponse(
             {
                 "name": context["style"].name,
-                "og_min": f'{round(getattr(context["style"].og_min, self.request.user.profile.gravity_units.lower()), gprec)}',
-                "og_max": f'{round(getattr(context["style"].og_max, self.request.user.profile.gravity_units.lower()), gprec)}',
-                "fg_min": f'{round(getattr(context["style"].fg_min, self.request.user.profile.gravity_units.lower()), gprec)}',
-                "fg_max": f'{round(getattr(context["style"].fg_max, self.request.user.profile.gravity_units.lower()), gprec)}',
+                "og_min": f'{round(getattr(context["style"].og_min, gravity_units), gprec)}',
+                "og_max": f'{round(getattr(context["style"].og_max, gravity_units), gprec)}',
+                "fg_min": f'{round(getattr(context["style"].fg_min, gravity_units), gprec)}',
+                "fg_max": f'{round(getattr(context["style"].fg_max, gravity_units), gprec)}',
                 "ibu_min": f'{round(float(context["style"].ibu_min), 1)}',
                 "ibu_max": f'{round(float(context["style"].ibu_max), 1)}',
-                "color_min": f'{round(getattr(context["style"].color_min, self.request.user.profile.color_units.lower()), 1)}',
-                "color_max": f'{round(getattr(context["style"].color_max, self.request.user.profile.color_units.lower()), 1)}',
+                "color_min": f'{round(getattr(context["style"].color_min, color_units), 1)}',
+                "color_max": f'{round(getattr(context["style"].color_max, color_units), 1)}',
                 "alcohol_min": f'{round(float(context["style"].alcohol_min), 1)}',
                 "alcohol_max": f'{round(float(context["style"].alcohol_max), 1)}',
             }
@@ -918,33 +944,20 @@ class StyleDeleteView(LoginRequiredMixin, StaffRequiredMixin, BSModalDeleteView)
 #
 # Recipes
 #
-class RecipeListView(LoginRequiredMixin, ListView):
+class RecipeListView(LoginRequiredMixin, FilteredListMixin, ListView):
     model = Recipe
     template_name = "brewery/recipe/list.html"
     context_object_name = "recipes"
     paginate_by = 10
-
-    def get_context_data(self, **kwargs):
-        context = super(RecipeListView, self).get_context_data(**kwargs)
-        recipes = self.get_queryset()
-        page = self.request.GET.get("page")
-        paginator = Paginator(recipes, self.paginate_by)
-        try:
-            recipes = paginator.page(page)
-        except PageNotAnInteger:
-            recipes = paginator.page(1)
-        except EmptyPage:
-            recipes = paginator.page(paginator.num_pages)
-        context["recipes"] = recipes
-        context["user"] = User.objects.get(id=self.request.user.id)
-        context["filter"] = filters.RecipeFilter(self.request.GET)
-        return context
-
-    def get_queryset(self):
-        qs = self.model.objects.filter(user=self.request.user)
-        filtered_recipes = filters.RecipeFilter(self.request.GET, queryset=qs)
-        qs = filtered_recipes.qs.order_by("-created_at")
-        return qs
+    filterset_class = filters.RecipeFilter
+    ordering = "-created_at"
+
+    def get_base_queryset(self):
+        # row metrics come from the stored recipe metrics, so the
+        # ingredients are not needed here
+        return (
+            super().get_base_queryset().select_related("style", "user__profile")
+        )
 
 
 class RecipeCreateView(LoginRequiredMixin, CreateView):
@@ -995,7 +1008,7 @@ class RecipeCreateView(LoginRequiredMixin, CreateView):
         yeasts = context["yeasts"]
         mash_steps = context["mash_steps"]
         formsets = [fermentables, hops, yeasts, mash_steps, extras]
-        with transaction.atomic():
+        with transaction.atomic(), defer_metrics_update():
             form.instance.user = self.request.user
             self.object = form.save()
             formsets_valid = True
@@ -1073,7 +1086,7 @@ class RecipeUpdateView(LoginAndOwnershipRequiredMixin, UpdateView):
         yeasts = context["yeasts"]
         mash_steps = context["mash_steps"]
         formsets = [fermentables, hops, yeasts, extras, mash_steps]
-        with transaction.atomic():
+        with transaction.atomic(), defer_metrics_update():
             form.instance.user = self.request.user
             self.object = form.save()
             formsets_valid = True
@@ -1092,12 +1105,25 @@ class RecipeUpdateView(LoginAndOwnershipRequiredMixin, UpdateView):
         return self.render_to_response(self.get_context_data(form=form))
 
 
-class RecipeDetailView(LoginAndOwnershipRequiredMixin, BSModalReadView):
+class RecipeDetailView(
+    LoginAndOwnershipRequiredMixin, ConditionalDetailMixin, BSModalReadView
+):
     model = Recipe
     template_name = "brewery/recipe/detail.html"
     context_object_name = "recipe"
 
+    def get_queryset(self):
+        return super(RecipeDetailView, self).get_queryset().select_related("style")
+
+    def get_etag_parts(self):
+        # ingredients touch the recipe, the style is shown by name
+        return (catalog.get_version(Style),)
+
     def get_context_data(self, **kwargs):
+        # ingredients are not needed by the ownership test or a 304
+        prefetch_related_objects(
+            [self.object], "fermentables", "hops", "yeasts", "extras", "mash_steps"
+        )
         data = super(RecipeDetailView, self).get_context_data(**kwargs)
         units = functions.get_user_units_with_repr(self.request.user)
         data.update(units)
@@ -1113,51 +1139,124 @@ class RecipeDeleteView(
     success_url = reverse_lazy("brewery:recipe-list")
 
 
-class RecipePrintView(WeasyTemplateResponseMixin, RecipeDetailView):
-    # pdf_stylesheets = [
-    #     static('/css/bootstrap.min.css'),
-    #     static('/fontawesome_free/css/all.min.css'),
-    #     static('/css/project.css'),
-    # ]
-    template_name = "brewery/recipe/print.html"
-    pdf_attachment = False
+class RecipePrintView(RecipeDetailView):
+    """PDF of the recipe, served from storage.
 
+    A missing PDF is rendered by the `render_recipe_pdf` task, meanwhile
+    the page shows its progress and reloads when it is done.
+    """
 
-def import_recipe(recipe, user):
-    """Import recipe to DB"""
-    recipe_data = functions.clean_data(recipe)
-    user = User.objects.get(username=user)
-    style = []
-    if isinstance(recipe_data["style"], str):  # this is probably name not pk
-        style = Style.objects.filter(name__icontains=recipe_data["style"])
-        if style.count() == 0:  # check also category
-            style = Style.objects.filter(category_id__icontains=recipe_data["style"])
-    else:
-        style = Style.objects.filter(pk=recipe_data["style"])
-    if style.count() == 0:
-        raise Exception(
-            f"Did not fount a syle '{recipe_data['style']}' for '{recipe_data['name']}'"
+    template_name = "brewery/recipe/print_progress.html"
+    pdf_attachment = False
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        language = get_language()
+        path = printing.pdf_path(self.object, request.user, language)
+        if default_storage.exists(path):
+            return FileResponse(
+                default_storage.open(path, "rb"),
+                as_attachment=self.pdf_attachment,
+                filename=f"{self.object.slug}.pdf",
+            )
+        task_id = str(uuid.uuid4())
+        claimed = printing.claim_task(path, task_id)
+        if claimed == task_id:
+            render_recipe_pdf.apply_async(
+                (
+                    self.object.pk,
+                    request.user.username,
+                    path,
+                    request.build_absolute_uri("/"),
+                    language,
+                ),
+                task_id=task_id,
+            )
+        return render(
+            request, self.template_name, {"recipe": self.object, "task_id": claimed}
         )
-    recipe_data["style"] = style[0].id
-    serializer = serializers.RecipeSerializer(data=recipe_data, user=user)
-    if serializer.is_valid():
-        serializer.save()
-    else:
-        raise Exception(serializer.errors)
 
 
 @shared_task(bind=True)
-def import_recipes(self, recipes, user):
-    progress_recorder = ProgressRecorder(self)
-    uploaded = 0
-    number_of_recipes = len(recipes)
-    for recipe in recipes:
-        import_recipe(recipe, user)
-        uploaded += 1
-        progress_recorder.set_progress(
-            uploaded, number_of_recipes, f"Uploaded {recipe['name']}"
+def render_recipe_pdf(self, recipe_id, username, path, base_url, language):
+    """Render PDF of the recipe for the user and store it under `path`."""
+    progress = ProgressRecorder(self)
+    try:
+        progress.set_progress(0, 3, "Rendering recipe")
+        recipe = Recipe.objects.select_related("style").get(pk=recipe_id)
+        prefetch_related_objects(
+            [recipe], "fermentables", "hops", "yeasts", "extras", "mash_steps"
         )
-    return uploaded
+        user = User.objects.get(username=username)
+        with translation.override(language):
+            html = printing.render_html(recipe, user)
+        progress.set_progress(1, 3, "Writing PDF")
+        content = printing.write_pdf(html, base_url)
+        progress.set_progress(2, 3, "Storing PDF")
+        printing.store_pdf(path, content)
+        progress.set_progress(3, 3, "Done")
+    finally:
+        printing.release_task(path)
+    return path
+
+
+@shared_task(bind=True)
+def import_recipes(self, recipes, user, chunk_size=importers.IMPORT_CHUNK_SIZE):
+    progress = importers.ThrottledProgress(ProgressRecorder(self), len(recipes))
+    return importers.import_recipes(
+        recipes, user, chunk_size=chunk_size, progress=progress
+    )
+
+
+@shared_task(bind=True)
+def import_beerxml_recipes(self, path, user, chunk_size=importers.IMPORT_CHUNK_SIZE):
+    """Import recipes streamed from an uploaded beerxml file, then delete it."""
+    try:
+        with default_storage.open(path, "rb") as xml_file:
+            progress = importers.FileProgress(
+                importers.ThrottledProgress(
+                    ProgressRecorder(self), default_storage.size(path)
+                ),
+                xml_file,
+            )
+            return importers.import_recipes(
+                functions.iter_beerxml(xml_file),
+                user,
+                chunk_size=chunk_size,
+                progress=progress,
+            )
+    finally:
+        default_storage.delete(path)
+
+
+@shared_task
+def import_recipes_chunk(recipes, user):
+    return importers.import_recipes(recipes, user, chunk_size=len(recipes))
+
+
+@shared_task
+def sum_imported(counts):
+    return sum(counts)
+
+
+def import_recipes_in_parallel(recipes, user, chunk_size=importers.IMPORT_CHUNK_SIZE):
+    """Import chunks of recipes in parallel workers.
+
+    Returns the `AsyncResult` of the chord callback summing the imported
+    rows. Chunks are independent, a failing chunk does not roll back the
+    others.
+    """
+    return chord(
+        import_recipes_chunk.s(chunk, user)
+        for chunk in importers.chunks(recipes, chunk_size)
+    )(sum_imported.s())
+
+
+class RecipeExportView(ExportView):
+    filename = "recipes"
+
+    def get_content(self, filetype):
+        return exporters.export_recipes(self.request.user, filetype)
 
 
 class RecipeImportView(LoginRequiredMixin, FormView):
@@ -1173,11 +1272,26 @@ class RecipeImportView(LoginRequiredMixin, FormView):
     def post(self, request, *args, **kwargs):
         form = self.form_class(request.POST, request.FILES)
         if form.is_valid():
+            if request.POST["filetype"] == "beerxml":
+                try:
+                    functions.check_beerxml(request.FILES["file"])
+                except ValueError:
+                    messages.add_message(
+                        request, messages.ERROR, "Cannot parse file. Check if you provided valid BEERXML file."
+                    )
+                    return redirect(self.success_url)
+                # parsed in the task, recipe by recipe
+                path = default_storage.save(
+                    f"imports/{uuid.uuid4().hex}.xml", request.FILES["file"]
+                )
+                result = import_beerxml_recipes.delay(path, request.user.username)
+                messages.add_message(
+                    request, messages.SUCCESS, result.task_id, extra_tags="task_id"
+                )
+                return redirect(self.success_url)
             try:
                 if request.POST["filetype"] == "json":
                     recipes = json.load(request.FILES["file"])
-                elif request.POST["filetype"] == "beerxml":
-                    recipes = functions.beerxml_to_json(request.FILES["file"])
                 else:
                     return render(request, self.template_name, {"form": form})
             except Exception as exc:
@@ -1186,6 +1300,12 @@ class RecipeImportView(LoginRequiredMixin, FormView):
                     request, messages.ERROR, f"Cannot parse file. Check if you provided valid {request.POST['filetype'].upper()} file."
                 )
                 return redirect(self.success_url)
+            min_rows = settings.BREWERY_PARALLEL_IMPORT_MIN_ROWS
+            if min_rows and len(recipes) >= min_rows:
+                # chunk tasks record no progress, there is no progress bar
+                import_recipes_in_parallel(recipes, request.user.username)
+                messages.add_message(request, messages.SUCCESS, self.success_message)
+                return redirect(self.success_url)
             result = import_recipes.delay(recipes, request.user.username)
             messages.add_message(
                 request, messages.SUCCESS, result.task_id, extra_tags="task_id"
@@ -2,6 +2,7 @@ import json
 from pathlib import Path
 import pytest
 
+from django.core.cache import cache
 from rest_framework.test import APIClient
 from model_bakery import baker
 from model_bakery.generators import random_gen
@@ -28,6 +29,12 @@ def media_storage(settings, tmpdir):
     settings.MEDIA_ROOT = tmpdir.strpath
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # catalog versions must not outlive the test database rollback
+    cache.clear()
+
+
 @pytest.fixture
 def user():
     user = UserFactory()
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.12 on 2026-10-18 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userbrewery',
+            name='last_batch_number',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Last Batch Number'),
+        ),
+    ]
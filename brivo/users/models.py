@@ -116,6 +116,10 @@ class UserBrewery(models.Model):
     name = models.CharField(_("Brewery Name"), max_length=50, blank=True, null=True)
     external_link = models.URLField(_("External URL"), max_length=200, blank=True, null=True)
     number_of_batches = models.IntegerField(_("Number of Batches"), default=0)
+    # Highest batch number given out, see Batch.allocate_batch_number
+    last_batch_number = models.IntegerField(
+        _("Last Batch Number"), default=0, editable=False
+    )
 
     def __str__(self):
         return f"{self.user.email} Brewery"
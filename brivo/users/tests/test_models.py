@@ -1,9 +1,37 @@
 import pytest
 
 from brivo.users.models import User
+from brivo.utils.functions import (
+    get_unit_preferences,
+    get_user_units,
+    get_user_units_with_repr,
+)
 
 pytestmark = pytest.mark.django_db
 
 
 def test_user_get_absolute_url(user: User):
     assert user.get_absolute_url() == f"/users/{user.username}/"
+
+
+def test_user_units_cached(user: User, django_assert_num_queries):
+    units = get_user_units(user)
+    assert units["gravity_units"] == "plato"
+    with django_assert_num_queries(0):
+        assert get_user_units(user) is units
+    # other requests get a new user object, the profile is not read again
+    fresh = User.objects.get(pk=user.pk)
+    with django_assert_num_queries(0):
+        assert get_user_units(fresh) == units
+        assert get_unit_preferences(fresh).gravity_units == "Plato"
+
+
+def test_user_units_cleared_on_profile_save(user: User):
+    fresh = User.objects.get(pk=user.pk)
+    assert get_user_units(fresh)["color_units"] == "srm"
+    assert get_user_units_with_repr(fresh)["color_units"] == ("SRM", "SRM")
+    fresh.profile.color_units = "EBC"
+    fresh.profile.save()
+    assert get_user_units(fresh)["color_units"] == "ebc"
+    assert get_user_units_with_repr(fresh)["color_units"] == ("EBC", "EBC")
+    assert get_user_units(User.objects.get(pk=user.pk))["color_units"] == "ebc"
@@ -1,4 +1,7 @@
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from brivo.utils.functions import get_unit_preferences
 
 
 def settings_context(_request):
@@ -6,3 +9,11 @@ def settings_context(_request):
     # Note: we intentionally do NOT expose the entire settings
     # to prevent accidental leaking of sensitive information
     return {"DEBUG": settings.DEBUG}
+
+
+def user_units(request):
+    """Unit settings of the user's profile, read once per request."""
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {"user_units": SimpleLazyObject(lambda: get_unit_preferences(user))}
@@ -1,15 +1,18 @@
 import re
 import os
 import math
+from collections import namedtuple
+from functools import lru_cache
 from pybeerxml.parser import Parser
 from pybeerxml.utils import to_lower
 from xml.etree import ElementTree
 
 from django.utils.encoding import smart_str
 from django.template import TemplateDoesNotExist
-from django.template.loader import render_to_string
+from django.template.loader import get_template
 from django.conf import settings
-from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.core.cache import cache
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
 
 from measurement.measures import Volume, Mass
 
@@ -18,6 +21,12 @@ _INT_REGEX = re.compile(r"^(?<![\d.])[0-9]+(?![\d.])$")
 _EMAIL_REGEX = re.compile(r"(.+@[a-zA-Z0-9\.]+,?){1,}")
 
 
+@lru_cache(maxsize=None)
+def get_mail_template(template):
+    """Return the compiled e-mail template, loaded once per process."""
+    return get_template(template)
+
+
 def render_mail(template, subject, email, context):
     to = [email] if isinstance(email, str) else email
     # remove superfluous line breaks
@@ -26,10 +35,7 @@ def render_mail(template, subject, email, context):
 
     from_email = settings.DEFAULT_FROM_EMAIL
     ext = os.path.splitext(template)[-1][1:]
-    body = render_to_string(
-        template,
-        context
-    ).strip()
+    body = get_mail_template(template).render(context).strip()
     if ext == "txt":
         msg = EmailMultiAlternatives(subject, body, from_email, to)
     elif ext == "html":
@@ -45,6 +51,13 @@ def send_mail(template, subject, email, context):
     msg.send()
 
 
+def send_mails(messages):
+    """Send the messages through one connection, return the number sent."""
+    if not messages:
+        return 0
+    return get_connection().send_messages(messages)
+
+
 def convert_type(data):
     """Check and convert the type of variable"""
     if isinstance(data, dict):
@@ -78,9 +91,51 @@ def clean_data(data):
     return new_data
 
 
+USER_UNITS_CACHE_KEY = "users:{}:units"
+
+UnitPreferences = namedtuple(
+    "UnitPreferences",
+    ["general_units", "gravity_units", "color_units", "temperature_units"],
+)
+
+
+def get_unit_preferences(user):
+    """Return unit settings of the user's profile (as `UnitPreferences`).
+
+    Kept on the user object for the request and in the cache between
+    requests, so the profile is not read. See `clear_user_units`.
+    """
+    try:
+        return user._unit_preferences
+    except AttributeError:
+        pass
+    key = USER_UNITS_CACHE_KEY.format(user.pk)
+    preferences = cache.get(key)
+    if preferences is None:
+        preferences = UnitPreferences(
+            *(getattr(user.profile, name) for name in UnitPreferences._fields)
+        )
+        cache.set(key, preferences, timeout=None)
+    user._unit_preferences = preferences
+    return preferences
+
+
+def clear_user_units(user):
+    """Forget unit settings cached by `get_unit_preferences`."""
+    cache.delete(USER_UNITS_CACHE_KEY.format(user.pk))
+    for attr in ("_unit_preferences", "_user_units", "_user_units_with_repr"):
+        user.__dict__.pop(attr, None)
+
+
 def get_user_units_with_repr(user):
+    """Return (unit, label) of user units, the dict is shared, do not modify."""
+    try:
+        return user._user_units_with_repr
+    except AttributeError:
+        pass
+    preferences = get_unit_preferences(user)
     data = {}
-    if user.profile.general_units.lower() == "metric":
+    if preferences.general_units.lower() == "metric":
         data["small_weight"] = ("g", "g")
         data["big_weight"] = ("kg", "kg")
         data["volume"] = ("l", "l")
@@ -88,45 +143,53 @@ def get_user_units_with_repr(user):
         data["small_weight"] = ("oz", "oz")
         data["big_weight"] = ("lb", "lb")
         data["volume"] = ("us_g", "US Gal")
-    if user.profile.gravity_units.lower() == "plato":
+    if preferences.gravity_units.lower() == "plato":
         data["gravity_units"] = ("Plato", "°P")
     else:
         data["gravity_units"] = ("SG", "SG")
-    if user.profile.color_units.lower() == "ebc":
+    if preferences.color_units.lower() == "ebc":
         data["color_units"] = ("EBC", "EBC")
     else:
         data["color_units"] = ("SRM", "SRM")
-    if user.profile.temperature_units.lower() == "celsius":
+    if preferences.temperature_units.lower() == "celsius":
         data["temp_units"] = ("c", "°C")
-    elif user.profile.temperature_units.lower() == "fahrenheit":
+    elif preferences.temperature_units.lower() == "fahrenheit":
         data["temp_units"] = ("f", "°F")
     else:
         data["temp_units"] = ("k", "K")
+    user._user_units_with_repr = data
     return data
 
 
 def get_user_units(user):
+    """Return units of the user, the dict is shared, do not modify."""
+    try:
+        return user._user_units
+    except AttributeError:
+        pass
+    preferences = get_unit_preferences(user)
     data = {}
-    if user.profile.general_units.lower() == "metric":
+    if preferences.general_units.lower() == "metric":
         data["mass_units"] = "g"
         data["volume_units"] = "l"
     else:
         data["mass_units"] = "oz"
         data["volume_units"] = "us_g"
-    if user.profile.gravity_units.lower() == "plato":
+    if preferences.gravity_units.lower() == "plato":
         data["gravity_units"] = "plato"
     else:
         data["gravity_units"] = "sg"
-    if user.profile.color_units.lower() == "ebc":
+    if preferences.color_units.lower() == "ebc":
         data["color_units"] = "ebc"
     else:
         data["color_units"] = "srm"
-    if user.profile.temperature_units.lower() == "celsius":
+    if preferences.temperature_units.lower() == "celsius":
         data["temperature_units"] = "c"
-    elif user.profile.temperature_units.lower() == "fahrenheit":
+    elif preferences.temperature_units.lower() == "fahrenheit":
         data["temperature_units"] = "f"
     else:
         data["temperature_units"] = "k"
+    user._user_units = data
     return data
 
 
@@ -258,8 +321,9 @@ def calculate_ibu_tinseth(og, time, type, alpha, weight, volume):
     :param float volume: Volume of the batch in liters
     :return float:        Added IBU for given hop and batch
     """
+    # expm1 keeps 1 - e**x exact for short times, as the vectorized version
     utilization = ((1.65 * (0.000125**(og - 1))) *
-        ((1 - (math.e**(-0.04 * time))) / (4.15)))
+        ((-math.expm1(-0.04 * time)) / (4.15)))
     if (type == 'PELLETS'):
         utilization = utilization + (utilization * 0.1)
 
@@ -427,126 +491,292 @@ def get_hex_color_from_srm(srm):
         return "#36080A"
 
 
-def beerxml_to_json(xml_file):
-    """Convert beerxml recipe to JSON."""
-    fermentable_type_map = {
-        "grain": "GRAIN",
-        "sugar": "SUGAR",
-        "extract": "LIQUID EXTRACT",
-        "dry extract": "DRY EXTRACT",
-        "adjunct": "SUGAR",
-    }
-
-    yeast_type_map = {
-        "ale": "ALE",
-        "lager": "LAGER",
-        "wheat": "WHEAT",
-        "wine": "CHAMPAGNE",
-        "champagne": "CHAMPAGNE",
+BEERXML_FERMENTABLE_TYPES = {
+    "grain": "GRAIN",
+    "sugar": "SUGAR",
+    "extract": "LIQUID EXTRACT",
+    "dry extract": "DRY EXTRACT",
+    "adjunct": "SUGAR",
+}
+
+BEERXML_YEAST_TYPES = {
+    "ale": "ALE",
+    "lager": "LAGER",
+    "wheat": "WHEAT",
+    "wine": "CHAMPAGNE",
+    "champagne": "CHAMPAGNE",
+}
+
+BEERXML_YEAST_FORMS = {
+    "liquid": "LIQUID",
+    "dry": "DRY",
+    "slant": "SLURRY",
+    "culture": "CULTURE",
+}
+
+
+def beerxml_recipe_to_json(recipe):
+    """Convert parsed `pybeerxml` recipe to JSON."""
+    beer = {
+        "fermentables": [],
+        "hops": [],
+        "yeasts": [],
+        "extras": [],
+        "mash_steps": [],
+        "extra_info": {},
     }
+    beer["boil_time"] = math.ceil(recipe.boil_time)
+    beer["boil_loss"] = round(recipe.equipment.evap_rate, 2)
+    beer["trub_loss"] = math.ceil(
+        100 * (recipe.equipment.trub_chiller_loss / recipe.batch_size)
+    )
+    beer["dry_hopping_loss"] = 10
+    beer["type"] = recipe.type.upper()
+    beer["expected_beer_volume"] = f"{recipe.batch_size} l"
+    # Mashing
+    beer["mash_efficiency"] = recipe.efficiency
+    beer["liquor_to_grist_ratio"] = 4
+    for fermentable in recipe.fermentables:
+        beer["fermentables"].append(
+            {
+                "type": BEERXML_FERMENTABLE_TYPES[fermentable.type.lower()],
+                "name": fermentable.name.strip(".").strip(),
+                "amount": f"{fermentable.amount} kg",
+                "extraction": fermentable._yield,
+                "color": f"{fermentable.color} srm",
+                "use": "MASHING"
+                if getattr(fermentable, "is_mashed", "true").lower() == "true"
+                else "BOIL",
+            }
+        )
+    for hop in recipe.hops:
+        if hop.use.upper() == "DRY HOP":
+            hoptime = math.ceil((hop.time / 60) / 24)
+            time_unit = "DAY"
+        else:
+            hoptime = hop.time
+            time_unit = "MINUTE"
+
+        beer["hops"].append(
+            {
+                "use": hop.use.upper(),
+                "name": hop.name.strip(".").strip(),
+                "amount": f"{hop.amount} kg",
+                "time": hoptime,
+                "time_unit": time_unit,
+                "alpha_acids": hop.alpha,
+            }
+        )
+    for yeast in recipe.yeasts:
+        beer["yeasts"].append(
+            {
+                "name": yeast.name.strip(".").strip(),
+                "type": BEERXML_YEAST_TYPES[yeast.type.lower()],
+                "form": BEERXML_YEAST_FORMS[yeast.form.lower()],
+                "amount": f"{yeast.amount} kg",  # it could be liters but we keep only one
+                "lab": yeast.laboratory,
+            }
+        )
+    for extra in recipe.miscs:
+        beer["extras"].append(
+            {
+                "type": extra.type.upper(),
+                "name": extra.name.strip(".").strip(),
+                "use": extra.use.upper(),
+                "amount": f"{extra.amount} kg",
+                "time": extra.time,
+                "time_unit": "MINUTE",
+            }
+        )
+    for mash_step in recipe.mash.steps:
+        beer["mash_steps"].append(
+            {
+                "temperature": f"{mash_step.step_temp} c",
+                "time": mash_step.step_time,
+            }
+        )
+    beer["name"] = recipe.name
+    beer[
+        "style"
+    ] = f"{int(recipe.style.category_number)}{recipe.style.style_letter}"  # 2015 BJCP Category
+    return beer
 
 
-    yeast_form_map = {
-        "liquid": "LIQUID",
-        "dry": "DRY",
-        "slant": "SLURRY",
-        "culture": "CULTURE",
-    }
+def iter_beerxml(xml_file):
+    """Yield beerxml recipes converted to JSON one by one.
 
-    beers = []
+    The file is parsed incrementally and every recipe element is removed
+    from the tree once converted, so memory does not grow with the
+    number of recipes in the file.
+    """
     parser = Parser()
-    # with open(xml_file, "rt") as file:
-    tree = ElementTree.parse(xml_file)
-
-    for recipe_node in tree.iter():
-        if to_lower(recipe_node.tag) != "recipe":
+    parents = []
+    for event, node in ElementTree.iterparse(xml_file, events=("start", "end")):
+        if event == "start":
+            parents.append(node)
+            continue
+        parents.pop()
+        if to_lower(node.tag) != "recipe":
             continue
-        recipe = parser.parse_recipe(recipe_node)
-        
-        print("Working on", recipe.name)
-        beer = {
-            "fermentables": [],
-            "hops": [],
-            "yeasts": [],
-            "extras": [],
-            "mash_steps": [],
-            "extra_info": {},
-        }
-        beer["boil_time"] = math.ceil(recipe.boil_time)
-        beer["boil_loss"] = round(recipe.equipment.evap_rate, 2)
-        beer["trub_loss"] = math.ceil(
-            100 * (recipe.equipment.trub_chiller_loss / recipe.batch_size)
+        beer = beerxml_recipe_to_json(parser.parse_recipe(node))
+        node.clear()
+        if parents:
+            parents[-1].remove(node)
+        yield beer
+
+
+def check_beerxml(xml_file):
+    """Raise `ValueError` if the file does not start like a beerxml file.
+
+    Only the root element is parsed, the recipes are read later by
+    `iter_beerxml`. The file is rewound.
+    """
+    try:
+        _, root = next(ElementTree.iterparse(xml_file, events=("start",)))
+    except (ElementTree.ParseError, StopIteration) as exc:
+        raise ValueError("Not an XML file") from exc
+    finally:
+        xml_file.seek(0)
+    if to_lower(root.tag) not in ("recipes", "recipe"):
+        raise ValueError(f"Unexpected root element {root.tag}")
+
+
+def beerxml_to_json(xml_file):
+    """Convert beerxml recipes to JSON."""
+    return list(iter_beerxml(xml_file))
+
+
+BEERXML_TIME_MINUTES = {
+    "MINUTE": 1,
+    "HOUR": 60,
+    "DAY": 24 * 60,
+    "WEEK": 7 * 24 * 60,
+    "MONTH": 30 * 24 * 60,
+    "YEAR": 365 * 24 * 60,
+}
+
+
+def _beerxml_node(parent, tag, **children):
+    if parent is None:
+        node = ElementTree.Element(tag)
+    else:
+        node = ElementTree.SubElement(parent, tag)
+    ElementTree.SubElement(node, "VERSION").text = "1"
+    for child, value in children.items():
+        if value is not None:
+            # "_yield" as yield is a keyword
+            ElementTree.SubElement(node, child.strip("_").upper()).text = str(value)
+    return node
+
+
+def _beerxml_choice(mapping, value, default):
+    for beerxml_value, choice in mapping.items():
+        if choice == value:
+            return beerxml_value.title()
+    return default
+
+
+def recipe_to_beerxml(recipe):
+    """Convert recipe with its ingredients to beerxml RECIPE element.
+
+    Values are written in beerxml units (kg, l, °C, minutes, SRM) and are
+    read back by `iter_beerxml`.
+    """
+    batch_size = recipe.expected_beer_volume.l
+    boil_size = recipe.boil_volume.l if recipe.boil_volume else batch_size
+    node = _beerxml_node(
+        None,
+        "RECIPE",
+        name=recipe.name,
+        type=recipe.type.title(),
+        brewer=recipe.user.username,
+        batch_size=batch_size,
+        boil_size=boil_size,
+        boil_time=recipe.boil_time,
+        efficiency=recipe.mash_efficiency,
+        notes=recipe.note or None,
+    )
+    category_number, style_letter = re.match(
+        r"(\d*)(.*)", recipe.style.category_id
+    ).groups()
+    _beerxml_node(
+        node,
+        "STYLE",
+        name=recipe.style.name,
+        category=recipe.style.category,
+        category_number=category_number or 0,
+        style_letter=style_letter,
+        style_guide="BJCP",
+        type="Ale",
+    )
+    _beerxml_node(
+        node,
+        "EQUIPMENT",
+        name=recipe.name,
+        batch_size=batch_size,
+        boil_size=boil_size,
+        evap_rate=recipe.evaporation_rate,
+        trub_chiller_loss=float(recipe.trub_loss) * batch_size / 100,
+    )
+    fermentables = ElementTree.SubElement(node, "FERMENTABLES")
+    for fermentable in recipe.fermentables.all():
+        _beerxml_node(
+            fermentables,
+            "FERMENTABLE",
+            name=fermentable.name,
+            type=_beerxml_choice(
+                BEERXML_FERMENTABLE_TYPES, fermentable.type, "Adjunct"
+            ),
+            amount=fermentable.amount.kg,
+            _yield=fermentable.extraction,
+            color=fermentable.color.srm,
+            is_mashed="TRUE" if fermentable.use == "MASHING" else "FALSE",
+        )
+    hops = ElementTree.SubElement(node, "HOPS")
+    for hop in recipe.hops.all():
+        _beerxml_node(
+            hops,
+            "HOP",
+            name=hop.name,
+            alpha=hop.alpha_acids,
+            amount=hop.amount.kg,
+            use=hop.use.title(),
+            time=float(hop.time) * BEERXML_TIME_MINUTES[hop.time_unit],
+        )
+    yeasts = ElementTree.SubElement(node, "YEASTS")
+    for yeast in recipe.yeasts.all():
+        _beerxml_node(
+            yeasts,
+            "YEAST",
+            name=yeast.name,
+            type=_beerxml_choice(BEERXML_YEAST_TYPES, yeast.type, "Ale"),
+            form=_beerxml_choice(BEERXML_YEAST_FORMS, yeast.form, "Culture"),
+            amount=yeast.amount.kg,
+            amount_is_weight="TRUE",
+            laboratory=yeast.lab,
+            attenuation=yeast.attenuation,
+        )
+    miscs = ElementTree.SubElement(node, "MISCS")
+    for extra in recipe.extras.all():
+        _beerxml_node(
+            miscs,
+            "MISC",
+            name=extra.name,
+            type=extra.type.title(),
+            use=extra.use.title(),
+            amount=extra.amount.kg,
+            amount_is_weight="TRUE",
+            time=float(extra.time) * BEERXML_TIME_MINUTES[extra.time_unit],
+        )
+    mash = _beerxml_node(node, "MASH", name=recipe.name, grain_temp=20)
+    mash_steps = ElementTree.SubElement(mash, "MASH_STEPS")
+    for number, mash_step in enumerate(recipe.mash_steps.all(), start=1):
+        _beerxml_node(
+            mash_steps,
+            "MASH_STEP",
+            name=f"Step {number}",
+            type="Infusion",
+            step_temp=mash_step.temperature.c,
+            step_time=mash_step.time,
         )
-        beer["dry_hopping_loss"] = 10
-        beer["type"] = recipe.type.upper()
-        beer["expected_beer_volume"] = f"{recipe.batch_size} l"
-        # Mashing
-        beer["mash_efficiency"] = recipe.efficiency
-        beer["liquor_to_grist_ratio"] = 4
-        for fermentable in recipe.fermentables:
-            print(fermentable)
-            beer["fermentables"].append(
-                {
-                    "type": fermentable_type_map[fermentable.type.lower()],
-                    "name": fermentable.name.strip(".").strip(),
-                    "amount": f"{fermentable.amount} kg",
-                    "extraction": fermentable._yield,
-                    "color": f"{fermentable.color} srm",
-                    "use": "MASHING"
-                    if getattr(fermentable, "is_mashed", "true").lower() == "true"
-                    else "BOIL",
-                }
-            )
-        for hop in recipe.hops:
-            if hop.use.upper() == "DRY HOP":
-                hoptime = math.ceil((hop.time / 60) / 24)
-                time_unit = "DAY"
-            else:
-                hoptime = hop.time
-                time_unit = "MINUTE"
-
-            beer["hops"].append(
-                {
-                    "use": hop.use.upper(),
-                    "name": hop.name.strip(".").strip(),
-                    "amount": f"{hop.amount} kg",
-                    "time": hoptime,
-                    "time_unit": time_unit,
-                    "alpha_acids": hop.alpha,
-                }
-            )
-        for yeast in recipe.yeasts:
-            beer["yeasts"].append(
-                {
-                    "name": yeast.name.strip(".").strip(),
-                    "type": yeast_type_map[yeast.type.lower()],
-                    "form": yeast_form_map[yeast.form.lower()],
-                    "amount": f"{yeast.amount} kg",  # it could be liters but we keep only one
-                    "lab": yeast.laboratory,
-                }
-            )
-        for extra in recipe.miscs:
-            beer["extras"].append(
-                {
-                    "type": extra.type.upper(),
-                    "name": extra.name.strip(".").strip(),
-                    "use": extra.use.upper(),
-                    "amount": f"{extra.amount} kg",
-                    "time": extra.time,
-                    "time_unit": "MINUTE",
-                }
-            )
-        for mash_step in recipe.mash.steps:
-            beer["mash_steps"].append(
-                {
-                    "temperature": f"{mash_step.step_temp} c",
-                    "time": mash_step.step_time,
-                }
-            )
-        beer["name"] = recipe.name
-        beer[
-            "style"
-        ] = f"{int(recipe.style.category_number)}{recipe.style.style_letter}"  # 2015 BJCP Category
-        beers.append(beer)
-    print(beers)
-    return beers
\ No newline at end of file
+    return node
@@ -1,12 +1,53 @@
-from sympy import S, Symbol
+import sympy
 from measurement.base import MeasureBase
 
-class BeerGravity(MeasureBase):
-    SU = Symbol('Plato')
+from brivo.utils.functions import to_sg
+
+
+def to_plato_exact(sg):
+    """Convert SG to plato - exact inverse of `functions.to_sg`.
+
+    `functions.to_plato` is a polynomial approximation and would shift
+    values stored in `BeerGravityField`, so it is not used here.
+    """
+    points = sg - 1
+    return (258.6 * points) / (1 + (227.1 / 258.2) * points)
+
+
+class NonLinearUnit:
+    """Unit converted to and from the standard unit by closed-form functions."""
+
+    def __init__(self, from_standard, to_standard):
+        self.from_standard = from_standard
+        self.to_standard = to_standard
+
+
+class NonLinearMeasureBase(MeasureBase):
+    """MeasureBase accepting `NonLinearUnit` entries in `UNITS`.
+
+    Linear units keep the default `MeasureBase` behaviour.
+    """
+
+    @MeasureBase.value.setter
+    def value(self, value):
+        self.standard = self._convert_value_from(self.get_units()[self.unit], value)
+
+    def _convert_value_to(self, unit, value):
+        if isinstance(unit, NonLinearUnit):
+            return unit.from_standard(float(value))
+        return super()._convert_value_to(unit, value)
+
+    def _convert_value_from(self, unit, value):
+        if isinstance(unit, NonLinearUnit):
+            return unit.to_standard(float(value))
+        return super()._convert_value_from(unit, value)
+
+
+class BeerGravity(NonLinearMeasureBase):
     STANDARD_UNIT = 'plato'
     UNITS = {
         'plato': 1.0,
-        'sg': (SU / (258.6 - ((SU / 258.2) * 227.1))) + 1
+        'sg': NonLinearUnit(from_standard=to_sg, to_standard=to_plato_exact),
     }
     ALIAS = {
         'Plato': 'plato',
@@ -21,3 +62,44 @@ class BeerColor(MeasureBase):
         'ebc': 1.0,
         'srm': 1.968503937007874,
     }
+
+
+def to_standard_function(mclass, unit):
+    """Return function converting values in `unit` to the standard unit.
+
+    Same result as `mclass(**{unit: value}).standard`, but sympy
+    expressions (e.g. temperatures) are solved only once here instead of
+    for every value.
+    """
+    definition = mclass.get_units()[unit]
+    if isinstance(definition, NonLinearUnit):
+        return definition.to_standard
+    if isinstance(definition, sympy.Expr):
+        value = sympy.Symbol("value")
+        standard = sympy.solve(definition - value, mclass.SU)[0]
+        return sympy.lambdify(value, standard, modules="math")
+    return lambda value: definition * value
+
+
+def from_standard_function(mclass, unit):
+    """Return function converting standard values to values in `unit`.
+
+    The inverse of `to_standard_function`, it accepts numpy arrays.
+    """
+    definition = mclass.get_units()[unit]
+    if isinstance(definition, NonLinearUnit):
+        return definition.from_standard
+    if isinstance(definition, sympy.Expr):
+        return sympy.lambdify(mclass.SU, definition, modules="numpy")
+    return lambda standard: standard / definition
+
+
+def make_measure(mclass, unit, standard):
+    """Return measure of the standard value shown in `unit`.
+
+    Skips the unit lookups of `MeasureBase.__init__`.
+    """
+    measure = mclass.__new__(mclass)
+    measure._default_unit = unit
+    measure.standard = standard
+    return measure
@@ -0,0 +1,43 @@
+import pytest
+from measurement.measures import Mass, Temperature, Volume
+
+from brivo.utils import functions
+from brivo.utils.measures import (
+    BeerColor,
+    BeerGravity,
+    make_measure,
+    to_standard_function,
+)
+
+
+@pytest.mark.parametrize("plato", [0.0, 5.0, 12.0, 18.5, 30.0])
+def test_gravity_roundtrip(plato):
+    gravity = BeerGravity(plato=plato)
+    assert gravity.sg == pytest.approx(functions.to_sg(plato))
+    assert BeerGravity(sg=gravity.sg).plato == pytest.approx(plato)
+
+
+def test_gravity_standard_value():
+    # Value stored in BeerGravityField must not change for SG input
+    assert BeerGravity(sg=1.05).standard == pytest.approx(12.3853239598598)
+    assert isinstance(BeerGravity(sg=1.05).standard, float)
+
+
+def test_gravity_aliases_and_value():
+    assert BeerGravity(SG=1.048).plato == BeerGravity(sg=1.048).plato
+    gravity = BeerGravity(sg=1.04)
+    gravity.value = 1.06
+    assert gravity.unit == "sg"
+    assert gravity.sg == pytest.approx(1.06)
+
+
+@pytest.mark.parametrize("mclass", [BeerGravity, BeerColor, Temperature, Volume, Mass])
+def test_make_measure(mclass):
+    for unit in mclass.UNITS:
+        to_standard = to_standard_function(mclass, unit)
+        for value in [0.0, 1.048, 20.0]:
+            expected = mclass(**{unit: value})
+            measure = make_measure(mclass, unit, to_standard(value))
+            assert measure.standard == pytest.approx(float(expected.standard))
+            assert measure.unit == expected.unit
+            assert getattr(measure, unit) == pytest.approx(value)
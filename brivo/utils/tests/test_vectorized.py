@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from hypothesis import given, strategies as st
+
+from brivo.utils import functions, vectorized
+
+
+sg = st.floats(min_value=1.0, max_value=1.15)
+og_fg = st.tuples(
+    st.floats(min_value=1.02, max_value=1.15), st.floats(min_value=0.99, max_value=1.02)
+)
+plato = st.floats(min_value=0.0, max_value=35.0)
+positive = st.floats(min_value=0.01, max_value=1000.0)
+percent = st.floats(min_value=0.1, max_value=100.0)
+minutes = st.floats(min_value=0.0, max_value=120.0)
+hop_type = st.sampled_from(["PELLETS", "LEAF", "PLUG"])
+
+
+def assert_same(scalar_function, vectorized_function, *columns):
+    expected = [scalar_function(*args) for args in zip(*columns)]
+    result = vectorized_function(*columns)
+    assert result.shape == (len(expected),)
+    np.testing.assert_allclose(result, expected, rtol=1e-9, atol=1e-12)
+
+
+@given(st.lists(sg, min_size=1, max_size=50))
+def test_to_plato(values):
+    assert_same(functions.to_plato, vectorized.to_plato, values)
+
+
+@given(st.lists(plato, min_size=1, max_size=50))
+def test_to_sg(values):
+    assert_same(functions.to_sg, vectorized.to_sg, values)
+
+
+@pytest.mark.parametrize(
+    "name", ["get_abv", "get_abw", "get_attenuation", "get_real_extract", "get_beer_calories"]
+)
+@given(values=st.lists(og_fg, min_size=1, max_size=50))
+def test_og_fg_functions(name, values):
+    og, fg = zip(*values)
+    assert_same(getattr(functions, name), getattr(vectorized, name), og, fg)
+
+
+@given(st.lists(st.tuples(percent, positive, positive), min_size=1, max_size=50))
+def test_color(values):
+    color, weight, volume = zip(*values)
+    assert_same(functions.calculate_mcu, vectorized.calculate_mcu, color, weight, volume)
+    mcu = vectorized.calculate_mcu(color, weight, volume)
+    assert_same(functions.morey_equation, vectorized.morey_equation, mcu)
+
+
+@given(st.lists(st.tuples(positive, percent, percent, positive), min_size=1, max_size=50))
+def test_gravity_points(values):
+    assert_same(
+        functions.calculate_gravity_points,
+        vectorized.calculate_gravity_points,
+        *zip(*values)
+    )
+
+
+@pytest.mark.parametrize("name", ["calculate_ibu_tinseth", "calculate_ibu_rager"])
+@given(
+    values=st.lists(
+        st.tuples(sg, minutes, hop_type, percent, positive, positive),
+        min_size=1,
+        max_size=50,
+    )
+)
+def test_ibu(name, values):
+    assert_same(getattr(functions, name), getattr(vectorized, name), *zip(*values))
+
+
+def test_broadcasting():
+    # one recipe gravity and volume for many hop additions
+    result = vectorized.calculate_ibu_tinseth(
+        1.05, [60, 15, 0], "PELLETS", [12.0, 5.0, 5.0], [30, 20, 50], 20
+    )
+    expected = [
+        functions.calculate_ibu_tinseth(1.05, time, "PELLETS", alpha, weight, 20)
+        for time, alpha, weight in [(60, 12.0, 30), (15, 5.0, 20), (0, 5.0, 50)]
+    ]
+    np.testing.assert_allclose(result, expected)
@@ -0,0 +1,128 @@
+"""
+Array versions of the brewing formulas from `brivo.utils.functions`.
+
+Every function accepts scalars, sequences or numpy arrays (broadcast
+against each other) and returns a numpy array, so values for thousands of
+ingredients or recipes are computed in a single call. Units and formulas
+are the same as in the scalar versions.
+"""
+import numpy as np
+
+
+def _array(value):
+    return np.asarray(value, dtype=float)
+
+
+def to_plato(sg):
+    """Convert SG to plato"""
+    sg = _array(sg)
+    return ((182.4601 * sg - 775.6821) * sg + 1262.7794) * sg - 669.5622
+
+
+def to_sg(plato):
+    """Convert plato to SG"""
+    plato = _array(plato)
+    return (plato / (258.6 - ((plato / 258.2) * 227.1))) + 1
+
+
+def get_real_extract(og, fg):
+    """Real Extract - og & fg in sg"""
+    return (0.1808 * to_plato(og)) + (0.8192 * to_plato(fg))
+
+
+def get_attenuation(og, fg):
+    """Attenuation - og & fg in sg"""
+    og, fg = _array(og), _array(fg)
+    return 100 * (og - fg) / (og - 1.0)
+
+
+def get_abv(og, fg):
+    """Alcohol by Volume - og & fg in sg"""
+    og, fg = _array(og), _array(fg)
+    return 76.08 * (og - fg) / (1.775 - og) * (fg / 0.794)
+
+
+def get_abw(og, fg):
+    """Alcohol by Weight - og & fg in sg"""
+    return 0.79336 * get_abv(og, fg)
+
+
+def get_beer_calories(og, fg):
+    """Calories in 100 ml - og & fg in sg"""
+    fg = _array(fg)
+    calories = (
+        (6.9 * get_abw(og, fg)) + 4.0 * (get_real_extract(og, fg) - 0.1)
+    ) * fg * 3.55
+    return (((calories / 12) / 29.573529564) * 100) * 5
+
+
+def calculate_mcu(color, weigth, volume):
+    """
+    Return MCUs of fermentables
+    :param color:  color in SRM
+    :param weigth: weigth in kilograms
+    :param volume: volume in liters
+    """
+    lovibond = (_array(color) + 0.76) / 1.3546
+    return (lovibond * _array(weigth) * 2.205) / (_array(volume) * 0.264)
+
+
+def morey_equation(mcu):
+    """Convert Malt Color Units to SRM"""
+    return 1.4922 * (_array(mcu) ** 0.6859)
+
+
+def calculate_gravity_points(weigth, extraction, efficiency, volume):
+    """
+    Gravity points added by fermentables
+    :param weigth:     weigth in kilograms
+    :param extraction: ingredient extraction (%) - 0-100
+    :param efficiency: efficiency of the batch (%) - 0-100
+    :param volume:     volume of batch in liters
+    """
+    return (
+        _array(weigth)
+        * (_array(extraction) / 100)
+        * (_array(efficiency) / 100)
+        * 384
+    ) / _array(volume)
+
+
+def _pellets_factor(type):
+    return np.where(np.asarray(type) == "PELLETS", 1.1, 1.0)
+
+
+def calculate_ibu_tinseth(og, time, type, alpha, weight, volume):
+    """
+    Hop IBU - Tinseth method
+    :param og:     Gravity of the beer in SG
+    :param time:   Time of boil (minutes)
+    :param type:   Type of hops eg. PELLETS
+    :param alpha:  Percent of alpha acids (%)
+    :param weight: Weigth of hops in grams
+    :param volume: Volume of the batch in liters
+    """
+    utilization = (1.65 * np.power(0.000125, _array(og) - 1)) * (
+        -np.expm1(-0.04 * _array(time)) / 4.15
+    )
+    utilization = utilization * _pellets_factor(type)
+    return utilization * _array(alpha) / 100 * _array(weight) * 1000 / _array(volume)
+
+
+def calculate_ibu_rager(og, time, type, alpha, weight, volume):
+    """
+    Hop IBU - Rager method
+    :param og:     Gravity of the beer in SG
+    :param time:   Time of boil (minutes)
+    :param type:   Type of hops eg. PELLETS
+    :param alpha:  Percent of alpha acids (%)
+    :param weight: Weigth of hops in grams
+    :param volume: Volume of the batch in liters
+    """
+    og = _array(og)
+    utilization = 18.18 + 13.86 * np.tanh((_array(time) - 31.32) / 18.27)
+    utilization = utilization * _pellets_factor(type)
+    u = np.where(og > 1.05, (og - 1.05) / 0.2, 0.0)
+    return (
+        _array(weight) * utilization * _array(alpha) / 10 / (_array(volume) * (1 + u))
+    )
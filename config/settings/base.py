@@ -202,6 +202,7 @@ TEMPLATES = [
                 "django.template.context_processors.tz",
                 "django.contrib.messages.context_processors.messages",
                 "brivo.utils.context_processors.settings_context",
+                "brivo.utils.context_processors.user_units",
             ],
             'libraries':{
                 'brew_tags': 'brivo.brewery.templatetags.brew_tags',
@@ -298,6 +299,11 @@ CELERY_TASK_TIME_LIMIT = 5 * 60
 CELERY_TASK_SOFT_TIME_LIMIT = 60
 # http://docs.celeryproject.org/en/latest/userguide/configuration.html#beat-scheduler
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# http://docs.celeryproject.org/en/latest/userguide/configuration.html#task-routes
+# e-mails are sent by their own queue, slow SMTP does not hold up other tasks
+CELERY_TASK_ROUTES = {
+    "brivo.brewery.tasks.send_reminder_digests": {"queue": "mail"},
+}
 # django-allauth
 # ------------------------------------------------------------------------------
 ACCOUNT_ALLOW_REGISTRATION = env.bool("DJANGO_ACCOUNT_ALLOW_REGISTRATION", True)
@@ -326,7 +332,7 @@ REST_FRAMEWORK = {
         "rest_framework.authentication.TokenAuthentication",
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'brivo.brewery.api.pagination.OptionalCursorPagination',
     'PAGE_SIZE': 20,
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
 }
@@ -344,4 +350,20 @@ CORS_URLS_REGEX = r"^/api/.*$"
 
 # Your stuff...
 # ------------------------------------------------------------------------------
+# Recipes and batches are imported in chunks of this many rows
+BREWERY_IMPORT_CHUNK_SIZE = env.int("BREWERY_IMPORT_CHUNK_SIZE", default=100)
+# Recipe files with at least this many rows are imported by parallel
+# chunk tasks (0 disables it)
+BREWERY_PARALLEL_IMPORT_MIN_ROWS = env.int("BREWERY_PARALLEL_IMPORT_MIN_ROWS", default=0)
+# Recipes and batches are exported (read from the database) in chunks of
+# this many rows
+BREWERY_EXPORT_CHUNK_SIZE = env.int("BREWERY_EXPORT_CHUNK_SIZE", default=200)
+# At most this many recipes are calculated by one request to the recipe
+# calculator API
+BREWERY_CALCULATOR_MAX_RECIPES = env.int("BREWERY_CALCULATOR_MAX_RECIPES", default=1000)
+# At most this many fermentation readings are sent by one request to the
+# batch readings API
+BREWERY_MAX_FERMENTATION_READINGS = env.int(
+    "BREWERY_MAX_FERMENTATION_READINGS", default=1000
+)
 SITE_ID = 1
\ No newline at end of file